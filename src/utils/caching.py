@@ -1,52 +1,511 @@
-
-
 import hashlib
+import logging
+import os
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+from collections import OrderedDict
 from pathlib import Path
-from typing import Annotated
+from typing import Annotated, Callable, Generic, Protocol, TypeVar
 
-from openai import BaseModel
+from pydantic import BaseModel
 from pydantic import constr
 
+V = TypeVar("V")
+
+logger = logging.getLogger(__name__)
+
+
 class CacheElement(BaseModel):
     key: str
     value: str
 
+
+class CacheBackend(Protocol[V]):
+    def store(self, key: str, value: V) -> None: ...
+
+    def exists(self, key: str) -> bool: ...
+
+    def retrieve(self, key: str) -> V | None: ...
+
+    def retrieve_all(self) -> dict[str, V]: ...
+
+    def store_many(self, items: dict[str, V]) -> None: ...
+
+    def retrieve_many(self, keys: list[str]) -> dict[str, V]: ...
+
+
+def hash_key(text: str) -> str:
+    return hashlib.md5(text.encode("utf-8")).hexdigest()
+
+
+def connect_sqlite(database_path: Path, busy_timeout_seconds: float = 60.0) -> sqlite3.Connection:
+    """Opens a connection suitable for sharing one database between threads and processes:
+    WAL journal (readers never block the writer), explicit transactions and a busy timeout
+    instead of immediate "database is locked" errors."""
+    connection = sqlite3.connect(
+        database_path,
+        timeout=busy_timeout_seconds,
+        isolation_level=None,
+        check_same_thread=False,
+    )
+    connection.execute("PRAGMA journal_mode=WAL")
+    connection.execute("PRAGMA synchronous=NORMAL")
+    return connection
+
+
+class CachePolicy(BaseModel, frozen=True):
+    ttl_seconds: float | None = None
+    max_size_bytes: int | None = None
+
+    def expiry_cutoff(self) -> float:
+        return time.time() - self.ttl_seconds if self.ttl_seconds is not None else float("-inf")
+
+
+class CompactionReport(BaseModel):
+    removed_entries: int
+    size_before: int
+    size_after: int
+
+
 class FileBasedTextCache:
-    def __init__(self, prefix: Annotated[str, constr(min_length=1)], path_to_cache: Path) -> None:
+    STALE_TEMP_FILE_SECONDS = 3600
+
+    def __init__(
+        self,
+        prefix: Annotated[str, constr(min_length=1)],
+        path_to_cache: Path,
+        policy: CachePolicy = CachePolicy(),
+    ) -> None:
         self.prefix = prefix
         self.path_to_cache = path_to_cache
+        self.policy = policy
 
     def _get_cache_file_path(self, text: str) -> Path:
-        cache_file_name = hashlib.md5(text.encode("utf-8")).hexdigest()
+        cache_file_name = hash_key(text)
         cache_path = self.path_to_cache / f"{self.prefix}_{cache_file_name}"
         return cache_path
 
-    def store(self, key: str, value: str) -> None:
+    def _is_expired(self, cache_path: Path) -> bool:
+        return cache_path.stat().st_mtime < self.policy.expiry_cutoff()
+
+    def _write_entry(self, key: str, value: str) -> None:
+        """Writes into a hidden temporary file and renames it into place, so concurrent
+        readers in other processes see either the previous entry or the complete new one."""
         cache_path = self._get_cache_file_path(key)
-        cache_path.parent.mkdir(parents=True, exist_ok=True)
-        with open(cache_path, "wb") as f:
-            f.write(CacheElement(key=key, value=value).model_dump_json().encode("utf-8"))
+        fd, temp_path = tempfile.mkstemp(dir=self.path_to_cache, prefix=f".{cache_path.name}.")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(CacheElement(key=key, value=value).model_dump_json().encode("utf-8"))
+            os.replace(temp_path, cache_path)
+        except BaseException:
+            os.unlink(temp_path)
+            raise
+
+    def _read_entry(self, cache_path: Path) -> CacheElement | None:
+        try:
+            if self._is_expired(cache_path):
+                return None
+            return CacheElement.model_validate_json(cache_path.read_bytes())
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def store(self, key: str, value: str) -> None:
+        self.path_to_cache.mkdir(parents=True, exist_ok=True)
+        self._write_entry(key, value)
 
     def exists(self, key: str) -> bool:
         cache_path = self._get_cache_file_path(key)
-        return cache_path.exists()
-    
+        try:
+            return not self._is_expired(cache_path)
+        except FileNotFoundError:
+            return False
+
     def retrieve(self, key: str) -> str | None:
-        if not self.exists(key):
-            return None
+        cache_element = self._read_entry(self._get_cache_file_path(key))
+        return None if cache_element is None else cache_element.value
 
-        cache_path = self._get_cache_file_path(key)
-        with open(cache_path, "rb") as f:
-            cache_element = f.read().decode("utf-8")
-            return CacheElement.model_validate_json(cache_element).value
-        
     def retrieve_all(self) -> dict[str, str]:
         cache_files = self.path_to_cache.glob(f"{self.prefix}_*")
 
         result: dict[str, str] = {}
         for file in cache_files:
-            cache_element_str = file.read_text()
-            cache_element = CacheElement.model_validate_json(cache_element_str)
-            result[cache_element.key] = cache_element.value
+            cache_element = self._read_entry(file)
+            # the glob also matches longer prefixes, e.g. "model_256d_..." for "model"
+            if cache_element is not None and file == self._get_cache_file_path(cache_element.key):
+                result[cache_element.key] = cache_element.value
+
+        return result
+
+    def store_many(self, items: dict[str, str]) -> None:
+        self.path_to_cache.mkdir(parents=True, exist_ok=True)
+        for key, value in items.items():
+            self._write_entry(key, value)
+
+    def retrieve_many(self, keys: list[str]) -> dict[str, str]:
+        result: dict[str, str] = {}
+        for key in dict.fromkeys(keys):
+            cache_element = self._read_entry(self._get_cache_file_path(key))
+            if cache_element is not None:
+                result[key] = cache_element.value
+        return result
+
+    def size_bytes(self) -> int:
+        size = 0
+        for file in self.path_to_cache.glob(f"{self.prefix}_*"):
+            try:
+                size += file.stat().st_size
+            except FileNotFoundError:
+                continue
+        return size
+
+    def compact(self) -> CompactionReport:
+        """Deletes expired and unreadable entries, then the oldest ones until the prefix fits `policy.max_size_bytes`."""
+        size_before = self.size_bytes()
+        cutoff = self.policy.expiry_cutoff()
+
+        removed = 0
+        alive: list[tuple[float, int, Path]] = []
+        for file in self.path_to_cache.glob(f"{self.prefix}_*"):
+            try:
+                stat = file.stat()
+                CacheElement.model_validate_json(file.read_bytes())
+                is_orphaned = stat.st_mtime < cutoff
+            except FileNotFoundError:
+                # removed by a concurrent compaction or overwrite since the directory was listed
+                continue
+            except ValueError:
+                is_orphaned = True
+            if is_orphaned:
+                file.unlink(missing_ok=True)
+                removed += 1
+            else:
+                alive.append((stat.st_mtime, stat.st_size, file))
+
+        stale_temp_cutoff = time.time() - self.STALE_TEMP_FILE_SECONDS
+        for temp_file in self.path_to_cache.glob(f".{self.prefix}_*"):
+            try:
+                is_stale = temp_file.stat().st_mtime < stale_temp_cutoff
+            except FileNotFoundError:
+                # renamed into place or cleaned up by its writer
+                continue
+            if is_stale:
+                temp_file.unlink(missing_ok=True)
+
+        if self.policy.max_size_bytes is not None:
+            size = sum(file_size for _, file_size, _ in alive)
+            for _, file_size, file in sorted(alive, key=lambda entry: entry[0]):
+                if size <= self.policy.max_size_bytes:
+                    break
+                file.unlink(missing_ok=True)
+                size -= file_size
+                removed += 1
+
+        return CompactionReport(removed_entries=removed, size_before=size_before, size_after=self.size_bytes())
+
+
+class SQLiteTextCache:
+    """Single-file cache backend: all prefixes share one SQLite database in WAL mode."""
+
+    DATABASE_FILE_NAME = "text_cache.sqlite3"
+    MAX_KEYS_PER_QUERY = 500
+
+    def __init__(
+        self,
+        prefix: Annotated[str, constr(min_length=1)],
+        path_to_cache: Path,
+        policy: CachePolicy = CachePolicy(),
+    ) -> None:
+        self.prefix = prefix
+        self.path_to_cache = path_to_cache
+        self.policy = policy
+        self.path_to_cache.mkdir(parents=True, exist_ok=True)
+        self.connection = connect_sqlite(self.path_to_cache / self.DATABASE_FILE_NAME)
+        self._lock = threading.RLock()
+        self.connection.execute(
+            """CREATE TABLE IF NOT EXISTS cache (
+                prefix TEXT NOT NULL,
+                key_hash TEXT NOT NULL,
+                key TEXT NOT NULL,
+                value TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                PRIMARY KEY (prefix, key_hash)
+            ) WITHOUT ROWID"""
+        )
+
+    def store(self, key: str, value: str) -> None:
+        self.store_many({key: value})
+
+    def exists(self, key: str) -> bool:
+        with self._lock:
+            row = self.connection.execute(
+                "SELECT 1 FROM cache WHERE prefix = ? AND key_hash = ? AND created_at >= ?",
+                (self.prefix, hash_key(key), self.policy.expiry_cutoff()),
+            ).fetchone()
+            return row is not None
+
+    def retrieve(self, key: str) -> str | None:
+        with self._lock:
+            row = self.connection.execute(
+                "SELECT value FROM cache WHERE prefix = ? AND key_hash = ? AND created_at >= ?",
+                (self.prefix, hash_key(key), self.policy.expiry_cutoff()),
+            ).fetchone()
+            return None if row is None else row[0]
+
+    def retrieve_all(self) -> dict[str, str]:
+        with self._lock:
+            rows = self.connection.execute(
+                "SELECT key, value FROM cache WHERE prefix = ? AND created_at >= ?",
+                (self.prefix, self.policy.expiry_cutoff()),
+            )
+            return {key: value for key, value in rows}
+
+    def store_many(self, items: dict[str, str]) -> None:
+        with self._lock:
+            now = time.time()
+            rows = [(self.prefix, hash_key(key), key, value, now) for key, value in items.items()]
+            with self.connection:
+                self.connection.execute("BEGIN IMMEDIATE")
+                self.connection.executemany(
+                    "INSERT OR REPLACE INTO cache (prefix, key_hash, key, value, created_at) VALUES (?, ?, ?, ?, ?)",
+                    rows,
+                )
+
+    def retrieve_many(self, keys: list[str]) -> dict[str, str]:
+        with self._lock:
+            hash_to_keys: dict[str, list[str]] = {}
+            for key in dict.fromkeys(keys):
+                hash_to_keys.setdefault(hash_key(key), []).append(key)
+
+            hashes = list(hash_to_keys)
+            cutoff = self.policy.expiry_cutoff()
+            result: dict[str, str] = {}
+            for start in range(0, len(hashes), self.MAX_KEYS_PER_QUERY):
+                chunk = hashes[start : start + self.MAX_KEYS_PER_QUERY]
+                placeholders = ", ".join("?" * len(chunk))
+                rows = self.connection.execute(
+                    f"""SELECT key_hash, value FROM cache
+                    WHERE prefix = ? AND created_at >= ? AND key_hash IN ({placeholders})""",
+                    (self.prefix, cutoff, *chunk),
+                )
+                for key_hash, value in rows:
+                    for key in hash_to_keys[key_hash]:
+                        result[key] = value
+            return result
+
+    def size_bytes(self) -> int:
+        with self._lock:
+            row = self.connection.execute(
+                "SELECT SUM(length(CAST(key AS BLOB)) + length(CAST(value AS BLOB))) FROM cache WHERE prefix = ?",
+                (self.prefix,),
+            ).fetchone()
+            return row[0] or 0
+
+    def size_by_prefix(self) -> dict[str, int]:
+        with self._lock:
+            rows = self.connection.execute(
+                """SELECT prefix, SUM(length(CAST(key AS BLOB)) + length(CAST(value AS BLOB)))
+                FROM cache GROUP BY prefix"""
+            )
+            return {prefix: size for prefix, size in rows}
+
+    def compact(self) -> CompactionReport:
+        """Deletes expired entries, then the oldest ones until the prefix fits `policy.max_size_bytes`,
+        and gives the freed pages of the database file back to the file system."""
+        with self._lock:
+            size_before = self.size_bytes()
+            with self.connection:
+                self.connection.execute("BEGIN IMMEDIATE")
+                removed = self.connection.execute(
+                    "DELETE FROM cache WHERE prefix = ? AND created_at < ?",
+                    (self.prefix, self.policy.expiry_cutoff()),
+                ).rowcount
+                if self.policy.max_size_bytes is not None:
+                    removed += self.connection.execute(
+                        """DELETE FROM cache WHERE prefix = ? AND key_hash IN (
+                            SELECT key_hash FROM (
+                                SELECT key_hash, SUM(length(CAST(key AS BLOB)) + length(CAST(value AS BLOB)))
+                                    OVER (ORDER BY created_at DESC, key_hash) AS cumulative_size
+                                FROM cache WHERE prefix = ?
+                            ) WHERE cumulative_size > ?
+                        )""",
+                        (self.prefix, self.prefix, self.policy.max_size_bytes),
+                    ).rowcount
+
+            self.connection.execute("VACUUM")
+            self.connection.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+            return CompactionReport(removed_entries=removed, size_before=size_before, size_after=self.size_bytes())
+
+    def close(self) -> None:
+        self.connection.close()
+
+
+class CacheStats(BaseModel):
+    hits: int
+    misses: int
+    evictions: int
+    entries: int
+    size_bytes: int
+
+    @property
+    def hit_ratio(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+
+class LRUMemoryCache(Generic[V]):
+    """In-process memory tier over any cache backend. Keeps the most recently used entries
+    within `max_entries` and `max_bytes` (as measured by `size_of`); writes go through to the backend.
+
+    Memory hits honour the TTL of the backend's `policy`, counted from when the entry entered memory:
+    an entry read from the backend can therefore be served for up to one TTL after it was read."""
+
+    def __init__(
+        self,
+        backend: CacheBackend[V],
+        max_entries: int | None = None,
+        max_bytes: int | None = None,
+        size_of: Callable[[V], int] = sys.getsizeof,
+    ) -> None:
+        self.backend = backend
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.size_of = size_of
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.size_bytes = 0
+        # value, its size and when it was put in memory
+        self._entries: OrderedDict[str, tuple[V, int, float]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _expiry_cutoff(self) -> float:
+        policy: CachePolicy | None = getattr(self.backend, "policy", None)
+        return policy.expiry_cutoff() if policy is not None else float("-inf")
+
+    def _is_fresh(self, key: str, cutoff: float) -> bool:
+        """Whether `key` is in memory and not expired; expired entries are dropped. Call with the lock held."""
+        entry = self._entries.get(key)
+        if entry is None:
+            return False
+        if entry[2] < cutoff:
+            del self._entries[key]
+            self.size_bytes -= entry[1]
+            return False
+        return True
+
+    def _put(self, key: str, value: V) -> None:
+        size = self.size_of(value)
+        with self._lock:
+            if key in self._entries:
+                self.size_bytes -= self._entries.pop(key)[1]
+            if self.max_bytes is not None and size > self.max_bytes:
+                return
+            self._entries[key] = (value, size, time.time())
+            self.size_bytes += size
+
+            while (self.max_entries is not None and len(self._entries) > self.max_entries) or (
+                self.max_bytes is not None and self.size_bytes > self.max_bytes
+            ):
+                _, (_, evicted_size, _) = self._entries.popitem(last=False)
+                self.size_bytes -= evicted_size
+                self.evictions += 1
+
+    def _get(self, key: str) -> V | None:
+        cutoff = self._expiry_cutoff()
+        with self._lock:
+            if not self._is_fresh(key, cutoff):
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return self._entries[key][0]
+
+    def store(self, key: str, value: V) -> None:
+        self.backend.store(key, value)
+        self._put(key, value)
+
+    def store_many(self, items: dict[str, V]) -> None:
+        self.backend.store_many(items)
+        for key, value in items.items():
+            self._put(key, value)
+
+    def exists(self, key: str) -> bool:
+        cutoff = self._expiry_cutoff()
+        with self._lock:
+            if self._is_fresh(key, cutoff):
+                return True
+        return self.backend.exists(key)
+
+    def retrieve(self, key: str) -> V | None:
+        value = self._get(key)
+        if value is None:
+            value = self.backend.retrieve(key)
+            if value is not None:
+                self._put(key, value)
+        return value
+
+    def retrieve_many(self, keys: list[str]) -> dict[str, V]:
+        result: dict[str, V] = {}
+        missing: list[str] = []
+        for key in dict.fromkeys(keys):
+            value = self._get(key)
+            if value is None:
+                missing.append(key)
+            else:
+                result[key] = value
+
+        if missing:
+            retrieved = self.backend.retrieve_many(missing)
+            for key, value in retrieved.items():
+                self._put(key, value)
+            result.update(retrieved)
+        return result
+
+    def retrieve_all(self) -> dict[str, V]:
+        return self.backend.retrieve_all()
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.size_bytes = 0
+
+    def stats(self) -> CacheStats:
+        with self._lock:
+            return CacheStats(
+                hits=self.hits,
+                misses=self.misses,
+                evictions=self.evictions,
+                entries=len(self._entries),
+                size_bytes=self.size_bytes,
+            )
+
+
+def copy_cache(source: CacheBackend[str], target: CacheBackend[str]) -> int:
+    """Copies every entry of `source` into `target`, e.g. to migrate an existing
+    `FileBasedTextCache` directory into a `SQLiteTextCache`. Returns the number of copied entries."""
+    entries = source.retrieve_all()
+    target.store_many(entries)
+    return len(entries)
+
+
+def legacy_file_cache(prefix: str, path_to_cache: Path, policy: CachePolicy = CachePolicy()) -> FileBasedTextCache | None:
+    """The file-per-entry cache `prefix` was kept in before the single-file backends became the default,
+    if `path_to_cache` still holds its files."""
+    if not any(path_to_cache.glob(f"{prefix}_*")):
+        return None
+    return FileBasedTextCache(prefix=prefix, path_to_cache=path_to_cache, policy=policy)
+
 
-        return result
\ No newline at end of file
+def import_legacy_file_cache(cache: SQLiteTextCache) -> int:
+    """Copies the entries a `FileBasedTextCache` left in the directory of `cache` under the same prefix
+    into it while it has none of its own, so switching the default backend does not drop responses
+    that were already paid for. The legacy files are left in place. Returns the number of imported entries."""
+    legacy = legacy_file_cache(cache.prefix, cache.path_to_cache, cache.policy)
+    if legacy is None or cache.size_bytes() > 0:
+        return 0
+    imported = copy_cache(legacy, cache)
+    logger.info("Imported %d entries of %s from the file-based cache in %s", imported, cache.prefix, cache.path_to_cache)
+    return imported
@@ -0,0 +1,248 @@
+"""Embedding throughput benchmark.
+
+Runs embedding models over a fixed synthetic Polish corpus at several batch sizes and reports
+items/sec, per-call latency percentiles, peak RSS and cost. Remote (OpenAI) models are replaced
+by an offline fake with a realistic latency unless an API key is given, so the benchmark runs offline by default:
+
+    python -m utils.embedding_models.benchmark --batch-sizes 1 32 256 --output-dir benchmark_results
+
+Peak RSS is measured for the whole process, so it also counts models benchmarked earlier in the same run;
+benchmark a single model (`--models <name>`) per run to compare their memory use.
+"""
+
+import argparse
+import os
+import random
+import threading
+import time
+from pathlib import Path
+from typing import Callable, Iterable
+
+import numpy as np
+from pydantic import BaseModel
+
+from utils.embedding_models.providers import supported_models
+from utils.embedding_models.providers.fake import FakeEmbeddingModel
+from utils.embedding_models.schema import EmbeddingModel, EmbeddingModelInfo
+from utils.embedding_models.tokenizer import ENCODING_MODEL_NAME
+from utils.simulation import LatencyDistribution
+
+DEFAULT_BATCH_SIZES = (1, 32, 256)
+DEFAULT_NUMBER_OF_TEXTS = 1024
+# round trip of a remote embedding request, for the offline stand-ins of remote models
+REMOTE_LATENCY = LatencyDistribution(kind="lognormal", mean_seconds=0.2, spread_seconds=0.05, seconds_per_mln_tokens=5.0)
+
+_WORDS = (
+    "historia miasta rzeka zamek król wojna pokój szkoła uniwersytet nauka język polski kultura sztuka muzyka "
+    "literatura poeta pisarz obraz malarz kościół katedra ulica most dworzec kolej droga góry morze jezioro las "
+    "park ogród zwierzę ptak ryba roślina drzewo kwiat pogoda zima wiosna lato jesień rok wiek tysiąc milion "
+    "mieszkańcy ludność gmina powiat województwo stolica państwo rząd prezydent sejm senat ustawa prawo sąd "
+    "gospodarka przemysł rolnictwo handel pieniądz bank firma praca pracownik fabryka energia węgiel stal "
+    "został została było była jest są znajduje się położony położona powstał założony wybudowany zniszczony "
+    "odbudowany największy najstarszy ważny znany słynny nowy stary duży mały polska warszawa kraków gdańsk "
+    "wrocław poznań łódź lublin szczecin toruń wisła odra bałtyk tatry mazury śląsk pomorze małopolska"
+).split()
+
+
+def synthetic_polish_corpus(number_of_texts: int = DEFAULT_NUMBER_OF_TEXTS, seed: int = 0) -> list[str]:
+    """Deterministic wiki-like Polish texts with a long-tailed length distribution (a few words to a few hundred)."""
+    rng = random.Random(seed)
+    texts = []
+    for _ in range(number_of_texts):
+        number_of_words = min(int(rng.lognormvariate(3.5, 0.9)) + 3, 600)
+        sentences = []
+        while number_of_words > 0:
+            sentence_length = min(rng.randint(5, 18), number_of_words)
+            words = [rng.choice(_WORDS) for _ in range(sentence_length)]
+            sentences.append(" ".join(words).capitalize() + ".")
+            number_of_words -= sentence_length
+        texts.append(" ".join(sentences))
+    return texts
+
+
+class PeakRSSSampler:
+    """Samples the resident set size of this process in a background thread while in use."""
+
+    def __init__(self, interval_seconds: float = 0.01) -> None:
+        self.interval_seconds = interval_seconds
+        self.peak_bytes = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    @staticmethod
+    def current_rss_bytes() -> int:
+        try:
+            with open("/proc/self/statm") as statm:
+                return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+        except OSError:
+            pass
+        try:
+            import resource
+        except ImportError:
+            # Windows: not measured
+            return 0
+        # lifetime peak (kilobytes on Linux) where /proc is not available
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            self.peak_bytes = max(self.peak_bytes, self.current_rss_bytes())
+            self._stop.wait(self.interval_seconds)
+
+    def __enter__(self) -> "PeakRSSSampler":
+        self.peak_bytes = self.current_rss_bytes()
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self._stop.set()
+        self._thread.join()
+        self.peak_bytes = max(self.peak_bytes, self.current_rss_bytes())
+
+
+class BenchmarkResult(BaseModel, frozen=True):
+    model_name: str
+    dimension: int
+    batch_size: int
+    number_of_texts: int
+    total_seconds: float
+    items_per_second: float
+    latency_p50_seconds: float
+    latency_p95_seconds: float
+    latency_p99_seconds: float
+    # of the whole process: models benchmarked earlier in the same run may still hold memory
+    peak_rss_mb: float
+    promt_tokens: int
+    cost_per_mln_tokens: float
+    total_cost: float
+
+
+def benchmark_model(
+    model: EmbeddingModel, corpus: list[str], batch_sizes: Iterable[int] = DEFAULT_BATCH_SIZES, warmup_batches: int = 1
+) -> list[BenchmarkResult]:
+    results = []
+    for batch_size in batch_sizes:
+        batches = [corpus[start : start + batch_size] for start in range(0, len(corpus), batch_size)]
+        for batch in batches[:warmup_batches]:
+            model.embed(batch)
+
+        latencies = []
+        promt_tokens = 0
+        with PeakRSSSampler() as rss:
+            start_time = time.perf_counter()
+            for batch in batches:
+                call_start = time.perf_counter()
+                promt_tokens += model.embed(batch).promt_tokens
+                latencies.append(time.perf_counter() - call_start)
+            total_seconds = time.perf_counter() - start_time
+
+        p50, p95, p99 = np.percentile(latencies, [50, 95, 99]).tolist()
+        cost_per_mln_tokens = model.model_info.cost_per_mln_tokens
+        results.append(
+            BenchmarkResult(
+                model_name=model.model_info.model_name,
+                dimension=model.model_info.effective_dimension,
+                batch_size=batch_size,
+                number_of_texts=len(corpus),
+                total_seconds=total_seconds,
+                items_per_second=len(corpus) / total_seconds,
+                latency_p50_seconds=p50,
+                latency_p95_seconds=p95,
+                latency_p99_seconds=p99,
+                peak_rss_mb=rss.peak_bytes / 2**20,
+                promt_tokens=promt_tokens,
+                cost_per_mln_tokens=cost_per_mln_tokens,
+                total_cost=promt_tokens * cost_per_mln_tokens / 1_000_000,
+            )
+        )
+    return results
+
+
+def supported_embedding_models() -> list[EmbeddingModelInfo]:
+    return [value for value in vars(supported_models).values() if isinstance(value, EmbeddingModelInfo)]
+
+
+def is_remote_model(model_info: EmbeddingModelInfo) -> bool:
+    return model_info.model_name in {name.value for name in ENCODING_MODEL_NAME}
+
+
+def default_model_factory(api_key: str | None = None) -> Callable[[EmbeddingModelInfo], EmbeddingModel]:
+    """Hugging Face models run locally; OpenAI models are called only when `api_key` is given
+    and are replaced by a `FakeEmbeddingModel` with `REMOTE_LATENCY` otherwise."""
+
+    def init_model(model_info: EmbeddingModelInfo) -> EmbeddingModel:
+        if is_remote_model(model_info):
+            if api_key is None:
+                return FakeEmbeddingModel(model_info, latency=REMOTE_LATENCY)
+            from utils.embedding_models.providers.open_ai import OpenAIEmbeddingModel
+
+            return OpenAIEmbeddingModel(api_key=api_key, model_info=model_info)
+        from utils.embedding_models.providers.hugging_face import HFEmbeddingModel
+
+        return HFEmbeddingModel(model_info)
+
+    return init_model
+
+
+def run_benchmarks(
+    model_infos: list[EmbeddingModelInfo],
+    init_model: Callable[[EmbeddingModelInfo], EmbeddingModel],
+    corpus: list[str],
+    batch_sizes: Iterable[int] = DEFAULT_BATCH_SIZES,
+):
+    """Benchmarks every model and returns the results as a pandas DataFrame, one row per model and batch size."""
+    import pandas as pd
+
+    results = []
+    for model_info in model_infos:
+        results += benchmark_model(init_model(model_info), corpus, batch_sizes)
+    return pd.DataFrame([result.model_dump() for result in results])
+
+
+def draw_benchmark_charts(results, metrics: Iterable[str] = ("items_per_second", "latency_p95_seconds", "peak_rss_mb")):
+    """One `draw_bar_chart` per metric, with models as bars grouped by batch size. Returns the figures.
+    `draw_bar_chart` has a palette of three colors, so at most three batch sizes can be drawn at once."""
+    import matplotlib.pyplot as plt
+
+    from chart_utils import draw_bar_chart
+
+    # shortened variants of the same model share its name
+    results = results.assign(model=results["model_name"] + " (" + results["dimension"].astype(str) + "d)")
+    figures = []
+    for metric in metrics:
+        df = results.pivot(index="model", columns="batch_size", values=metric)
+        df.columns = [f"batch {batch_size}" for batch_size in df.columns]
+        draw_bar_chart(df, title=f"{metric} by batch size")
+        plt.gca().legend(loc="lower right")
+        figures.append(plt.gcf())
+    return figures
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--models", nargs="*", help="model names to benchmark (default: all supported models)")
+    parser.add_argument("--batch-sizes", nargs="*", type=int, default=list(DEFAULT_BATCH_SIZES))
+    parser.add_argument("--texts", type=int, default=DEFAULT_NUMBER_OF_TEXTS)
+    parser.add_argument("--output-dir", type=Path, default=Path("benchmark_results"))
+    args = parser.parse_args()
+
+    model_infos = [
+        model_info for model_info in supported_embedding_models() if not args.models or model_info.model_name in args.models
+    ]
+    results = run_benchmarks(
+        model_infos,
+        default_model_factory(api_key=os.environ.get("OPEN_AI_KEY")),
+        synthetic_polish_corpus(args.texts),
+        args.batch_sizes,
+    )
+
+    args.output_dir.mkdir(parents=True, exist_ok=True)
+    results.to_csv(args.output_dir / "results.csv", index=False)
+    print(results.to_string(index=False))
+    print("peak_rss_mb: peak of the whole process, including models benchmarked earlier in this run")
+    for figure, metric in zip(draw_benchmark_charts(results), ("items_per_second", "latency_p95_seconds", "peak_rss_mb")):
+        figure.savefig(args.output_dir / f"{metric}.png")
+
+
+if __name__ == "__main__":
+    main()
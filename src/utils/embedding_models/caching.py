@@ -1,36 +1,177 @@
-
+import asyncio
 from pathlib import Path
 
-from utils.caching import FileBasedTextCache
-from utils.embedding_models.schema import EmbeddingModel, EmbeddingModelInfo, GenericEmbeddingResponse
+import numpy as np
+
+from utils.caching import CacheBackend, CachePolicy, CacheStats, LRUMemoryCache
+from utils.embedding_models.embedding_store import CachedEmbedding, MemmapEmbeddingStore, import_legacy_text_cache
+from utils.embedding_models.schema import (
+    AsyncEmbeddingModel,
+    EmbeddingModel,
+    EmbeddingModelInfo,
+    GenericEmbeddingResponse,
+)
+
+def apportion_tokens(total: int, texts: list[str]) -> list[int]:
+    """Splits the token count of a batched request between its texts proportionally
+    to their length, keeping the integer parts summing up to `total`."""
+    weights = [max(len(text), 1) for text in texts]
+    total_weight = sum(weights)
+    shares = [total * weight / total_weight for weight in weights]
+    tokens = [int(share) for share in shares]
+    by_remainder = sorted(range(len(texts)), key=lambda i: shares[i] - tokens[i], reverse=True)
+    for i in by_remainder[: total - sum(tokens)]:
+        tokens[i] += 1
+    return tokens
+
+
+def init_embedding_cache(
+    model_info: EmbeddingModelInfo,
+    path_to_cache: Path,
+    cache: CacheBackend[CachedEmbedding] | None,
+    memory_cache_max_entries: int | None,
+    memory_cache_max_bytes: int | None,
+    cache_policy: CachePolicy,
+) -> CacheBackend[CachedEmbedding]:
+    if cache is None:
+        store = MemmapEmbeddingStore(
+            prefix=model_info.cache_prefix, path_to_cache=path_to_cache, policy=cache_policy
+        )
+        import_legacy_text_cache(store)
+        cache = store
+    if memory_cache_max_entries is not None or memory_cache_max_bytes is not None:
+        cache = LRUMemoryCache(
+            cache,
+            max_entries=memory_cache_max_entries,
+            max_bytes=memory_cache_max_bytes,
+            size_of=lambda item: item.embedding.nbytes,
+        )
+    return cache
+
+
+def split_batch_response(batch: list[str], resp: GenericEmbeddingResponse) -> dict[str, CachedEmbedding]:
+    if len(resp.vectors) != len(batch):
+        raise ValueError(f"Expected {len(batch)} embeddings from the model, got {len(resp.vectors)}")
+
+    promt_tokens = apportion_tokens(resp.promt_tokens, batch)
+    total_length = sum(max(len(text), 1) for text in batch)
+    # rows are copied: a view would keep the whole batch matrix alive for as long as one row is cached
+    return {
+        text: CachedEmbedding(
+            embedding=np.array(embedding),
+            promt_tokens=tokens,
+            time_to_generate=resp.time_to_generate * max(len(text), 1) / total_length,
+        )
+        for text, embedding, tokens in zip(batch, resp.vectors, promt_tokens)
+    }
+
+
+def assemble_response(
+    texts: list[str], cached: dict[str, CachedEmbedding], cached_items: int = 0
+) -> GenericEmbeddingResponse:
+    vectors = np.stack([cached[text].embedding for text in texts]) if texts else np.empty((0, 0), dtype=np.float32)
+    total_promt_tokes = 0
+    time_to_generate = 0
+
+    for text in texts:
+        embedding = cached[text]
+        total_promt_tokes += embedding.promt_tokens
+        time_to_generate += embedding.time_to_generate
+    return GenericEmbeddingResponse(
+        vectors=vectors, promt_tokens=total_promt_tokes, time_to_generate=time_to_generate, cached_items=cached_items
+    )
+
 
 class CachedEmbeddingModel:
 
-    def __init__(self, model: EmbeddingModel, path_to_cache: Path = Path("~/.cache/embeddings_cache").expanduser()) -> None:
-        model_name = model.model_info.sanitized_model_name
-        self.cache = FileBasedTextCache(prefix=model_name, path_to_cache=path_to_cache)
+    def __init__(
+        self,
+        model: EmbeddingModel,
+        path_to_cache: Path = Path("~/.cache/embeddings_cache").expanduser(),
+        cache: CacheBackend[CachedEmbedding] | None = None,
+        batch_size: int = 256,
+        memory_cache_max_entries: int | None = None,
+        memory_cache_max_bytes: int | None = None,
+        cache_policy: CachePolicy = CachePolicy(),
+    ) -> None:
+        if batch_size < 1:
+            raise ValueError("batch_size must be a positive integer")
+
+        self.cache = init_embedding_cache(
+            model.model_info, path_to_cache, cache, memory_cache_max_entries, memory_cache_max_bytes, cache_policy
+        )
         self.model = model
+        self.batch_size = batch_size
 
     def embed(self, texts: list[str]) -> GenericEmbeddingResponse:
-    
-        embeddings = []
-        total_promt_tokes = 0
-        time_to_generate = 0
-
-        for text in texts:
-            cached = self.cache.retrieve(text)
-            
-            if cached is not None:
-                embedding = GenericEmbeddingResponse.model_validate_json(cached)
-            else:
-                embedding = self.model.embed([text])
-                self.cache.store(text, embedding.model_dump_json())
-
-            embeddings.append(embedding.embeddings[0])
-            total_promt_tokes += embedding.promt_tokens
-            time_to_generate += embedding.time_to_generate
-        return GenericEmbeddingResponse(embeddings=embeddings, promt_tokens=total_promt_tokes, time_to_generate=time_to_generate)
-    
+
+        cached = self.cache.retrieve_many(texts)
+        cached_items = sum(text in cached for text in texts)
+
+        misses = [text for text in dict.fromkeys(texts) if text not in cached]
+
+        for start in range(0, len(misses), self.batch_size):
+            batch = misses[start : start + self.batch_size]
+            embedded = split_batch_response(batch, self.model.embed(batch))
+            cached.update(embedded)
+            self.cache.store_many(embedded)
+
+        return assemble_response(texts, cached, cached_items)
+
+    @property
+    def cache_stats(self) -> CacheStats | None:
+        return self.cache.stats() if isinstance(self.cache, LRUMemoryCache) else None
+
+    @property
+    def model_info(self) -> EmbeddingModelInfo:
+        return self.model.model_info
+
+
+class AsyncCachedEmbeddingModel:
+    """Async counterpart of `CachedEmbeddingModel`: all batches of misses are sent to the model
+    at once (the model bounds how many are in flight) and cache I/O runs in worker threads."""
+
+    def __init__(
+        self,
+        model: AsyncEmbeddingModel,
+        path_to_cache: Path = Path("~/.cache/embeddings_cache").expanduser(),
+        cache: CacheBackend[CachedEmbedding] | None = None,
+        batch_size: int = 256,
+        memory_cache_max_entries: int | None = None,
+        memory_cache_max_bytes: int | None = None,
+        cache_policy: CachePolicy = CachePolicy(),
+    ) -> None:
+        if batch_size < 1:
+            raise ValueError("batch_size must be a positive integer")
+
+        self.cache = init_embedding_cache(
+            model.model_info, path_to_cache, cache, memory_cache_max_entries, memory_cache_max_bytes, cache_policy
+        )
+        self.model = model
+        self.batch_size = batch_size
+
+    async def _embed_batch(self, batch: list[str]) -> dict[str, CachedEmbedding]:
+        embedded = split_batch_response(batch, await self.model.embed(batch))
+        await asyncio.to_thread(self.cache.store_many, embedded)
+        return embedded
+
+    async def embed(self, texts: list[str]) -> GenericEmbeddingResponse:
+
+        cached = await asyncio.to_thread(self.cache.retrieve_many, texts)
+        cached_items = sum(text in cached for text in texts)
+
+        misses = [text for text in dict.fromkeys(texts) if text not in cached]
+        batches = [misses[start : start + self.batch_size] for start in range(0, len(misses), self.batch_size)]
+
+        for embedded in await asyncio.gather(*(self._embed_batch(batch) for batch in batches)):
+            cached.update(embedded)
+
+        return assemble_response(texts, cached, cached_items)
+
+    @property
+    def cache_stats(self) -> CacheStats | None:
+        return self.cache.stats() if isinstance(self.cache, LRUMemoryCache) else None
+
     @property
     def model_info(self) -> EmbeddingModelInfo:
-        return self.model.model_info
\ No newline at end of file
+        return self.model.model_info
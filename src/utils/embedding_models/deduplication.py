@@ -0,0 +1,38 @@
+import numpy as np
+
+from utils.embedding_models.schema import EmbeddingModel, EmbeddingModelInfo, GenericEmbeddingResponse
+
+
+def deduplicate(texts: list[str]) -> tuple[list[str], np.ndarray]:
+    """Unique texts in order of first occurrence, and for every input text the position of its
+    unique copy, so that `vectors[inverse]` fans embeddings of the unique texts back out."""
+    positions: dict[str, int] = {}
+    inverse = np.fromiter((positions.setdefault(text, len(positions)) for text in texts), dtype=np.intp, count=len(texts))
+    return list(positions), inverse
+
+
+class DeduplicatingEmbeddingModel:
+    """Embeds every distinct text of a call once. Only needed in front of models without a cache,
+    `CachedEmbeddingModel` already sends each missing text once."""
+
+    def __init__(self, model: EmbeddingModel) -> None:
+        self.model = model
+
+    def embed(self, texts: list[str]) -> GenericEmbeddingResponse:
+        unique_texts, inverse = deduplicate(texts)
+        resp = self.model.embed(unique_texts)
+        if len(unique_texts) == len(texts):
+            return resp
+        # the wrapped model only reports how many unique texts were cache hits, not which ones: every
+        # input counts as its unique text on average, which is exact when none or all of them were hits
+        cached_items = round(resp.cached_items * len(texts) / len(unique_texts))
+        return GenericEmbeddingResponse(
+            vectors=resp.vectors[inverse],
+            promt_tokens=resp.promt_tokens,
+            time_to_generate=resp.time_to_generate,
+            cached_items=cached_items,
+        )
+
+    @property
+    def model_info(self) -> EmbeddingModelInfo:
+        return self.model.model_info
@@ -0,0 +1,343 @@
+import logging
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Annotated, Literal, NamedTuple
+
+import numpy as np
+from pydantic import constr
+
+from utils.caching import (
+    CacheBackend,
+    CachePolicy,
+    CompactionReport,
+    SQLiteTextCache,
+    connect_sqlite,
+    hash_key,
+    legacy_file_cache,
+)
+from utils.embedding_models.schema import GenericEmbeddingResponse
+
+logger = logging.getLogger(__name__)
+
+
+class CachedEmbedding(NamedTuple):
+    embedding: np.ndarray
+    promt_tokens: int
+    time_to_generate: float
+
+
+class MemmapEmbeddingStore:
+    """Keeps embeddings as raw rows of a memory-mapped matrix file ("{prefix}_{dtype}.{generation}.bin")
+    and the text hash -> row mapping together with token/time metadata in a SQLite index.
+    The row dimension is recorded on the first write unless given upfront; the generation
+    changes every time `compact` rewrites the matrix file."""
+
+    INDEX_FILE_NAME = "embeddings_index.sqlite3"
+    MAX_KEYS_PER_QUERY = 500
+    MAX_READ_ATTEMPTS = 3
+    COMPACTION_CHUNK_ROWS = 65536
+
+    def __init__(
+        self,
+        prefix: Annotated[str, constr(min_length=1)],
+        path_to_cache: Path,
+        dimension: int | None = None,
+        dtype: Literal["float32", "float16"] = "float32",
+        policy: CachePolicy = CachePolicy(),
+    ) -> None:
+        self.prefix = prefix
+        self.path_to_cache = path_to_cache
+        self.dtype = np.dtype(dtype)
+        self.policy = policy
+        self.name = f"{prefix}_{dtype}"
+        self._mapped: tuple[int, np.ndarray] | None = None
+
+        self.path_to_cache.mkdir(parents=True, exist_ok=True)
+        self.connection = connect_sqlite(self.path_to_cache / self.INDEX_FILE_NAME)
+        self._lock = threading.RLock()
+        self.connection.execute(
+            """CREATE TABLE IF NOT EXISTS stores (
+                store TEXT PRIMARY KEY,
+                dimension INTEGER NOT NULL,
+                generation INTEGER NOT NULL
+            )"""
+        )
+        self.connection.execute(
+            """CREATE TABLE IF NOT EXISTS embeddings (
+                store TEXT NOT NULL,
+                key_hash TEXT NOT NULL,
+                key TEXT NOT NULL,
+                row INTEGER NOT NULL,
+                promt_tokens INTEGER NOT NULL,
+                time_to_generate REAL NOT NULL,
+                created_at REAL NOT NULL,
+                PRIMARY KEY (store, key_hash)
+            ) WITHOUT ROWID"""
+        )
+
+        recorded_dimension, _ = self._state()
+        if dimension is not None and recorded_dimension is not None and dimension != recorded_dimension:
+            raise ValueError(f"Store {self.name} holds embeddings of dimension {recorded_dimension}, not {dimension}")
+        self.dimension = recorded_dimension if recorded_dimension is not None else dimension
+
+    def _state(self) -> tuple[int | None, int]:
+        row = self.connection.execute(
+            "SELECT dimension, generation FROM stores WHERE store = ?", (self.name,)
+        ).fetchone()
+        return (None, 0) if row is None else (row[0], row[1])
+
+    def data_path(self, generation: int | None = None) -> Path:
+        if generation is None:
+            _, generation = self._state()
+        return self.path_to_cache / f"{self.name}.{generation}.bin"
+
+    @property
+    def row_bytes(self) -> int:
+        return self.dtype.itemsize * (self.dimension or 0)
+
+    def _matrix(self, generation: int, min_rows: int) -> np.ndarray:
+        if self._mapped is None or self._mapped[0] != generation or len(self._mapped[1]) < min_rows:
+            path = self.data_path(generation)
+            rows = path.stat().st_size // self.row_bytes
+            self._mapped = (generation, np.memmap(path, dtype=self.dtype, mode="r", shape=(rows, self.dimension)))
+        return np.asarray(self._mapped[1])
+
+    def _select(self, queries: list[tuple[str, tuple]]) -> dict[str, CachedEmbedding]:
+        """Runs the lookups and reads the generation in one snapshot, so that a concurrent `compact`
+        cannot hand out rows of a matrix file other than the one being mapped. Results are keyed
+        by the first selected column."""
+        for attempt in range(self.MAX_READ_ATTEMPTS):
+            with self._lock:
+                with self.connection:
+                    self.connection.execute("BEGIN")
+                    dimension, generation = self._state()
+                    rows = [row for query, parameters in queries for row in self.connection.execute(query, parameters)]
+
+                if not rows:
+                    return {}
+                self.dimension = dimension
+                try:
+                    matrix = self._matrix(generation, max(row for _, row, _, _ in rows) + 1)
+                except FileNotFoundError:
+                    # The file of this generation was removed by a compaction that committed after our snapshot.
+                    if attempt == self.MAX_READ_ATTEMPTS - 1:
+                        raise
+                    continue
+
+            return {
+                key: CachedEmbedding(embedding=matrix[row], promt_tokens=promt_tokens, time_to_generate=time_to_generate)
+                for key, row, promt_tokens, time_to_generate in rows
+            }
+        return {}
+
+    def store(self, key: str, value: CachedEmbedding) -> None:
+        self.store_many({key: value})
+
+    def store_many(self, items: dict[str, CachedEmbedding]) -> None:
+        if not items:
+            return
+
+        vectors = np.ascontiguousarray([item.embedding for item in items.values()], dtype=self.dtype)
+        if vectors.ndim != 2:
+            raise ValueError(f"Expected a batch of 1-d embeddings, got shape {vectors.shape}")
+
+        now = time.time()
+        with self._lock, self.connection:
+            self.connection.execute("BEGIN IMMEDIATE")
+            recorded_dimension, generation = self._state()
+            if recorded_dimension is None:
+                recorded_dimension = self.dimension or vectors.shape[1]
+                self.connection.execute(
+                    "INSERT INTO stores (store, dimension, generation) VALUES (?, ?, ?)",
+                    (self.name, recorded_dimension, generation),
+                )
+            self.dimension = recorded_dimension
+            if vectors.shape[1] != self.dimension:
+                raise ValueError(f"Expected embeddings of dimension {self.dimension}, got {vectors.shape[1]}")
+
+            # Rows are appended while holding the database write lock and made durable before the index
+            # references them; a partial row left by a writer that crashed mid-append is cut off first.
+            with open(self.data_path(generation), "ab") as f:
+                first_row = f.seek(0, 2) // self.row_bytes
+                f.truncate(first_row * self.row_bytes)
+                f.write(vectors.tobytes())
+                f.flush()
+                os.fsync(f.fileno())
+            self.connection.executemany(
+                """INSERT OR REPLACE INTO embeddings
+                (store, key_hash, key, row, promt_tokens, time_to_generate, created_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?)""",
+                [
+                    (self.name, hash_key(key), key, first_row + i, item.promt_tokens, item.time_to_generate, now)
+                    for i, (key, item) in enumerate(items.items())
+                ],
+            )
+
+    def exists(self, key: str) -> bool:
+        with self._lock:
+            row = self.connection.execute(
+                "SELECT 1 FROM embeddings WHERE store = ? AND key_hash = ? AND created_at >= ?",
+                (self.name, hash_key(key), self.policy.expiry_cutoff()),
+            ).fetchone()
+        return row is not None
+
+    def retrieve(self, key: str) -> CachedEmbedding | None:
+        return self.retrieve_many([key]).get(key)
+
+    def retrieve_many(self, keys: list[str]) -> dict[str, CachedEmbedding]:
+        hash_to_keys: dict[str, list[str]] = {}
+        for key in dict.fromkeys(keys):
+            hash_to_keys.setdefault(hash_key(key), []).append(key)
+
+        hashes = list(hash_to_keys)
+        cutoff = self.policy.expiry_cutoff()
+        queries = []
+        for start in range(0, len(hashes), self.MAX_KEYS_PER_QUERY):
+            chunk = hashes[start : start + self.MAX_KEYS_PER_QUERY]
+            placeholders = ", ".join("?" * len(chunk))
+            queries.append((
+                f"""SELECT key_hash, row, promt_tokens, time_to_generate FROM embeddings
+                WHERE store = ? AND created_at >= ? AND key_hash IN ({placeholders})""",
+                (self.name, cutoff, *chunk),
+            ))
+
+        found = self._select(queries) if queries else {}
+        return {key: embedding for key_hash, embedding in found.items() for key in hash_to_keys[key_hash]}
+
+    def retrieve_all(self) -> dict[str, CachedEmbedding]:
+        return self._select([(
+            "SELECT key, row, promt_tokens, time_to_generate FROM embeddings WHERE store = ? AND created_at >= ?",
+            (self.name, self.policy.expiry_cutoff()),
+        )])
+
+    def size_bytes(self) -> int:
+        with self._lock:
+            keys_size = self.connection.execute(
+                "SELECT SUM(length(CAST(key AS BLOB))) FROM embeddings WHERE store = ?", (self.name,)
+            ).fetchone()[0]
+            data_path = self.data_path()
+        data_size = data_path.stat().st_size if data_path.exists() else 0
+        return data_size + (keys_size or 0)
+
+    def size_by_prefix(self) -> dict[str, int]:
+        with self._lock:
+            stores = self.connection.execute("SELECT store, generation FROM stores").fetchall()
+            keys_sizes = dict(self.connection.execute(
+                "SELECT store, SUM(length(CAST(key AS BLOB))) FROM embeddings GROUP BY store"
+            ).fetchall())
+        sizes: dict[str, int] = {}
+        for store, generation in stores:
+            data_path = self.path_to_cache / f"{store}.{generation}.bin"
+            data_size = data_path.stat().st_size if data_path.exists() else 0
+            sizes[store] = data_size + (keys_sizes.get(store) or 0)
+        return sizes
+
+    def compact(self) -> CompactionReport:
+        """Deletes expired entries, then the oldest ones until the store fits `policy.max_size_bytes`,
+        and rewrites the matrix file with only the rows still referenced by the index."""
+        size_before = self.size_bytes()
+        with self._lock, self.connection:
+            self.connection.execute("BEGIN IMMEDIATE")
+            dimension, generation = self._state()
+            if dimension is None:
+                return CompactionReport(removed_entries=0, size_before=size_before, size_after=size_before)
+            self.dimension = dimension
+
+            removed = self.connection.execute(
+                "DELETE FROM embeddings WHERE store = ? AND created_at < ?",
+                (self.name, self.policy.expiry_cutoff()),
+            ).rowcount
+            if self.policy.max_size_bytes is not None:
+                removed += self.connection.execute(
+                    """DELETE FROM embeddings WHERE store = ? AND key_hash IN (
+                        SELECT key_hash FROM (
+                            SELECT key_hash, SUM(? + length(CAST(key AS BLOB)))
+                                OVER (ORDER BY created_at DESC, key_hash) AS cumulative_size
+                            FROM embeddings WHERE store = ?
+                        ) WHERE cumulative_size > ?
+                    )""",
+                    (self.name, self.row_bytes, self.name, self.policy.max_size_bytes),
+                ).rowcount
+
+            alive = self.connection.execute(
+                "SELECT key_hash, row FROM embeddings WHERE store = ? ORDER BY row", (self.name,)
+            ).fetchall()
+            old_path, new_path = self.data_path(generation), self.data_path(generation + 1)
+            with open(new_path, "wb") as f:
+                if alive:
+                    old_rows = old_path.stat().st_size // self.row_bytes
+                    old_matrix = np.memmap(old_path, dtype=self.dtype, mode="r", shape=(old_rows, dimension))
+                    for start in range(0, len(alive), self.COMPACTION_CHUNK_ROWS):
+                        rows = [row for _, row in alive[start : start + self.COMPACTION_CHUNK_ROWS]]
+                        f.write(np.ascontiguousarray(old_matrix[rows]).tobytes())
+                    del old_matrix
+
+            self.connection.executemany(
+                "UPDATE embeddings SET row = ? WHERE store = ? AND key_hash = ?",
+                [(new_row, self.name, key_hash) for new_row, (key_hash, _) in enumerate(alive)],
+            )
+            self.connection.execute(
+                "UPDATE stores SET generation = ? WHERE store = ?", (generation + 1, self.name)
+            )
+
+        with self._lock:
+            self._mapped = None
+            # only generations this compaction replaced: a newer one belongs to a concurrent compaction
+            for path in self.path_to_cache.glob(f"{self.name}.*.bin"):
+                try:
+                    path_generation = int(path.name[len(self.name) + 1 : -len(".bin")])
+                except ValueError:
+                    continue
+                if path_generation <= generation:
+                    path.unlink(missing_ok=True)
+            self.connection.execute("VACUUM")
+            self.connection.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        return CompactionReport(removed_entries=removed, size_before=size_before, size_after=self.size_bytes())
+
+    def close(self) -> None:
+        self._mapped = None
+        self.connection.close()
+
+
+def copy_text_cache(source: CacheBackend[str], target: CacheBackend[CachedEmbedding]) -> int:
+    """Moves embeddings cached as `GenericEmbeddingResponse` JSON (the format used before
+    `MemmapEmbeddingStore`) into an embedding store. Returns the number of copied entries."""
+    entries: dict[str, CachedEmbedding] = {}
+    for key, value in source.retrieve_all().items():
+        response = GenericEmbeddingResponse.model_validate_json(value)
+        entries[key] = CachedEmbedding(
+            embedding=response.vectors[0],
+            promt_tokens=response.promt_tokens,
+            time_to_generate=response.time_to_generate,
+        )
+    target.store_many(entries)
+    return len(entries)
+
+
+def import_legacy_text_cache(store: MemmapEmbeddingStore) -> int:
+    """Copies the embeddings cached as JSON under the prefix of `store` in its directory, either as files
+    (`FileBasedTextCache`) or in a `SQLiteTextCache` database, into it while it holds no embeddings, so switching
+    the default backend does not drop embeddings that were already paid for. The legacy entries are left
+    in place. Returns the number of imported entries."""
+    if store.size_bytes() > 0:
+        return 0
+
+    sources: list[CacheBackend[str]] = []
+    file_cache = legacy_file_cache(store.prefix, store.path_to_cache, store.policy)
+    if file_cache is not None:
+        sources.append(file_cache)
+    text_cache = None
+    if (store.path_to_cache / SQLiteTextCache.DATABASE_FILE_NAME).exists():
+        text_cache = SQLiteTextCache(prefix=store.prefix, path_to_cache=store.path_to_cache, policy=store.policy)
+        sources.append(text_cache)
+
+    try:
+        imported = sum(copy_text_cache(source, store) for source in sources)
+    finally:
+        if text_cache is not None:
+            text_cache.close()
+    if imported:
+        logger.info("Imported %d embeddings of %s from the text cache in %s", imported, store.prefix, store.path_to_cache)
+    return imported
@@ -1,22 +1,86 @@
-from utils.embedding_models.schema import EmbeddingModel, GenericEmbeddingResponse
+import threading
+import time
 
+from utils.embedding_models.schema import (
+    AsyncEmbeddingModel,
+    EmbeddingModel,
+    EmbeddingModelInfo,
+    GenericEmbeddingResponse,
+)
+from utils.metrics import CallMetrics
 
-class EmbeddingModelWithMonitoring:
 
-    def __init__(self, model: EmbeddingModel) -> None:
-        self.model = model
+class _EmbeddingMonitor:
+    """Counters shared by the sync and async monitoring wrappers."""
+
+    def __init__(self, model_info: EmbeddingModelInfo) -> None:
         self.promt_tokens = 0
         self.time_to_generate = 0
-        self.model_info = self.model.model_info
+        self.number_of_texts = 0
+        self.number_of_unique_texts = 0
+        self.model_info = model_info
+        self.metrics = CallMetrics("embedding")
+        self._lock = threading.Lock()
 
-    def embed(self, texts: list[str]) -> GenericEmbeddingResponse:
-        resp = self.model.embed(texts)
-        self.promt_tokens += resp.promt_tokens
-        self.time_to_generate += resp.time_to_generate
-        return resp
+    def _record(self, texts: list[str], resp: GenericEmbeddingResponse, latency: float) -> None:
+        self.metrics.record(latency, items=len(texts), tokens=resp.promt_tokens, cache_hits=resp.cached_items)
+        with self._lock:
+            self.promt_tokens += resp.promt_tokens
+            self.time_to_generate += resp.time_to_generate
+            self.number_of_texts += len(texts)
+            self.number_of_unique_texts += len(set(texts))
+
+    def _record_error(self, texts: list[str], latency: float) -> None:
+        self.metrics.record(latency, items=len(texts), error=True)
 
     def get_total_cost(self) -> float:
-        return self.promt_tokens * self.model.model_info.cost_per_mln_tokens / 1_000_000
+        return self.promt_tokens * self.model_info.cost_per_mln_tokens / 1_000_000
 
     def get_total_time(self) -> float:
         return self.time_to_generate
+
+    def get_dedup_ratio(self) -> float:
+        """Share of embedded texts that repeated another text of the same call."""
+        if self.number_of_texts == 0:
+            return 0.0
+        return 1 - self.number_of_unique_texts / self.number_of_texts
+
+    def snapshot(self) -> dict[str, float]:
+        return {**self.metrics.snapshot(), "dedup_ratio": self.get_dedup_ratio(), "total_cost": self.get_total_cost()}
+
+    def to_prometheus(self) -> str:
+        return self.metrics.to_prometheus(labels={"model": self.model_info.model_name})
+
+
+class EmbeddingModelWithMonitoring(_EmbeddingMonitor):
+
+    def __init__(self, model: EmbeddingModel) -> None:
+        super().__init__(model.model_info)
+        self.model = model
+
+    def embed(self, texts: list[str]) -> GenericEmbeddingResponse:
+        start_time = time.perf_counter()
+        try:
+            resp = self.model.embed(texts)
+        except Exception:
+            self._record_error(texts, time.perf_counter() - start_time)
+            raise
+        self._record(texts, resp, time.perf_counter() - start_time)
+        return resp
+
+
+class AsyncEmbeddingModelWithMonitoring(_EmbeddingMonitor):
+
+    def __init__(self, model: AsyncEmbeddingModel) -> None:
+        super().__init__(model.model_info)
+        self.model = model
+
+    async def embed(self, texts: list[str]) -> GenericEmbeddingResponse:
+        start_time = time.perf_counter()
+        try:
+            resp = await self.model.embed(texts)
+        except Exception:
+            self._record_error(texts, time.perf_counter() - start_time)
+            raise
+        self._record(texts, resp, time.perf_counter() - start_time)
+        return resp
@@ -0,0 +1,98 @@
+import asyncio
+import hashlib
+from pathlib import Path
+
+import numpy as np
+
+from utils.embedding_models.caching import CachedEmbeddingModel
+from utils.embedding_models.monitoring import EmbeddingModelWithMonitoring
+from utils.embedding_models.request_packing import MAX_INPUTS_PER_REQUEST, MAX_TOKENS_PER_REQUEST, pack_requests
+from utils.embedding_models.schema import EmbeddingModelInfo, GenericEmbeddingResponse
+from utils.simulation import FaultInjection, LatencyDistribution, SimulatedEndpoint, estimate_number_of_tokens
+
+
+def fake_embedding(text: str, model_info: EmbeddingModelInfo) -> np.ndarray:
+    """Unit vector that depends only on the text and the model, the same in every process and run."""
+    digest = hashlib.sha256(f"{model_info.model_name}\n{text}".encode("utf-8")).digest()
+    rng = np.random.default_rng(int.from_bytes(digest[:8], "little"))
+    vector = rng.standard_normal(model_info.effective_dimension, dtype=np.float32)
+    return vector / np.linalg.norm(vector)
+
+
+class FakeEmbeddingModel:
+    """Offline stand-in for a remote embedding API. Texts are packed into requests under the OpenAI
+    endpoint limits and every request goes through a `SimulatedEndpoint`, which adds latency, failures
+    and rate limits and accounts for the (estimated) tokens."""
+
+    def __init__(
+        self,
+        model_info: EmbeddingModelInfo,
+        latency: LatencyDistribution = LatencyDistribution(),
+        faults: FaultInjection = FaultInjection(),
+        seed: int = 0,
+        endpoint: SimulatedEndpoint | None = None,
+    ) -> None:
+        self.model_info = model_info
+        self.endpoint = endpoint or SimulatedEndpoint(latency, faults, seed)
+
+    def _request_tokens(self, texts: list[str]) -> list[int]:
+        """Number of tokens of every request the texts are packed into."""
+        token_counts = [estimate_number_of_tokens(text) for text in texts]
+        return [
+            sum(token_counts[i] for i in request)
+            for request in pack_requests(token_counts, MAX_TOKENS_PER_REQUEST, MAX_INPUTS_PER_REQUEST)
+        ]
+
+    def _response(self, texts: list[str], promt_tokens: int, duration: float) -> GenericEmbeddingResponse:
+        vectors = (
+            np.stack([fake_embedding(text, self.model_info) for text in texts])
+            if texts
+            else np.empty((0, self.model_info.effective_dimension), dtype=np.float32)
+        )
+        return GenericEmbeddingResponse(vectors=vectors, promt_tokens=promt_tokens, time_to_generate=duration)
+
+    def embed(self, texts: list[str]) -> GenericEmbeddingResponse:
+        request_tokens = self._request_tokens(texts)
+        duration = sum(self.endpoint.call(tokens) for tokens in request_tokens)
+        return self._response(texts, sum(request_tokens), duration)
+
+
+class AsyncFakeEmbeddingModel(FakeEmbeddingModel):
+    """Async variant of `FakeEmbeddingModel` with at most `max_concurrency` requests in flight."""
+
+    def __init__(
+        self,
+        model_info: EmbeddingModelInfo,
+        latency: LatencyDistribution = LatencyDistribution(),
+        faults: FaultInjection = FaultInjection(),
+        seed: int = 0,
+        endpoint: SimulatedEndpoint | None = None,
+        max_concurrency: int = 16,
+    ) -> None:
+        if max_concurrency < 1:
+            raise ValueError("max_concurrency must be a positive integer")
+        super().__init__(model_info, latency, faults, seed, endpoint)
+        self.semaphore = asyncio.Semaphore(max_concurrency)
+
+    async def _send(self, tokens: int) -> float:
+        async with self.semaphore:
+            return await self.endpoint.acall(tokens)
+
+    async def embed(self, texts: list[str]) -> GenericEmbeddingResponse:  # type: ignore[override]
+        request_tokens = self._request_tokens(texts)
+        durations = await asyncio.gather(*(self._send(tokens) for tokens in request_tokens))
+        return self._response(texts, sum(request_tokens), sum(durations))
+
+
+def init_model(
+    model_info: EmbeddingModelInfo,
+    path_to_cache: Path = Path("~/.cache/fake_embeddings_cache").expanduser(),
+    latency: LatencyDistribution = LatencyDistribution(),
+    faults: FaultInjection = FaultInjection(),
+    seed: int = 0,
+) -> EmbeddingModelWithMonitoring:
+    # fake vectors are cached apart from the real ones of the same model
+    model = FakeEmbeddingModel(model_info=model_info, latency=latency, faults=faults, seed=seed)
+    model = CachedEmbeddingModel(model=model, path_to_cache=path_to_cache)
+    model = EmbeddingModelWithMonitoring(model=model)
+    return model
@@ -1,38 +1,195 @@
+import math
+import multiprocessing
+import os
 import time
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
-from typing import Literal
+from typing import TYPE_CHECKING, Literal
 
-from sentence_transformers import SentenceTransformer
+import numpy as np
 
 from utils.embedding_models.caching import CachedEmbeddingModel
 from utils.embedding_models.monitoring import EmbeddingModelWithMonitoring
+from utils.embedding_models.request_packing import bucket_by_length
 from utils.embedding_models.schema import EmbeddingModelInfo, GenericEmbeddingResponse
 
+if TYPE_CHECKING:
+    from sentence_transformers import SentenceTransformer
+
+Device = Literal["cpu", "cuda", "mps"]
+Precision = Literal["fp32", "bf16", "int8"]
+
+
+def detect_device() -> Device:
+    import torch
+
+    if torch.cuda.is_available():
+        return "cuda"
+    if torch.backends.mps.is_available():
+        return "mps"
+    return "cpu"
+
 
 class HFEmbeddingModel:
+    """Sentence Transformers model running on `device` (detected when not given).
+    torch and the model weights are only loaded on the first `embed`.
+
+    Texts are sorted by token length and batched so that a batch holds at most `batch_size` texts
+    and `max_tokens_per_batch` tokens after padding. `precision="bf16"` runs the model in bfloat16,
+    `precision="int8"` applies dynamic int8 quantization to its linear layers (CPU only)."""
+
+    def __init__(
+        self,
+        model_info: EmbeddingModelInfo,
+        device: Device | None = None,
+        batch_size: int = 32,
+        max_tokens_per_batch: int = 16384,
+        precision: Precision = "fp32",
+    ) -> None:
+        if precision == "int8":
+            if device not in (None, "cpu"):
+                raise ValueError("int8 quantization is only supported on cpu")
+            device = "cpu"
+        if batch_size < 1:
+            raise ValueError("batch_size must be a positive integer")
+
+        self.model_info = model_info
+        self.device = device
+        self.batch_size = batch_size
+        self.max_tokens_per_batch = max_tokens_per_batch
+        self.precision = precision
+        self._embedding_model: "SentenceTransformer | None" = None
+
+    @property
+    def embedding_model(self) -> "SentenceTransformer":
+        if self._embedding_model is None:
+            import torch
+            from sentence_transformers import SentenceTransformer
+
+            self.device = self.device or detect_device()
+            embedding_model = SentenceTransformer(
+                self.model_info.model_name, device=self.device, truncate_dim=self.model_info.output_dimension
+            )
+            if self.precision == "bf16":
+                embedding_model.to(torch.bfloat16)
+            elif self.precision == "int8":
+                embedding_model = torch.ao.quantization.quantize_dynamic(
+                    embedding_model, {torch.nn.Linear}, dtype=torch.qint8
+                )
+            self._embedding_model = embedding_model
+        return self._embedding_model
+
+    def _token_lengths(self, texts: list[str]) -> list[int]:
+        encoded = self.embedding_model.tokenizer(
+            texts, truncation=True, max_length=self.embedding_model.max_seq_length
+        )
+        return [len(input_ids) for input_ids in encoded["input_ids"]]
+
+    def embed(self, texts: list[str]) -> GenericEmbeddingResponse:
+        import torch
+
+        embedding_model = self.embedding_model
+        start_time = time.perf_counter()
+        vectors = np.empty((len(texts), self.model_info.effective_dimension), dtype=np.float32)
+        batches = bucket_by_length(self._token_lengths(texts), self.batch_size, self.max_tokens_per_batch) if texts else []
+        with torch.inference_mode():
+            for batch in batches:
+                resp = embedding_model.encode(
+                    [texts[i] for i in batch], batch_size=len(batch), show_progress_bar=False
+                )
+                if resp.shape[1] != vectors.shape[1]:
+                    vectors = np.empty((len(texts), resp.shape[1]), dtype=np.float32)
+                vectors[batch] = resp
+        duration = time.perf_counter() - start_time
+        return GenericEmbeddingResponse(
+            promt_tokens=0, vectors=vectors, time_to_generate=duration
+        )
+
+
+_worker_model: HFEmbeddingModel | None = None
+
+
+def _init_worker(
+    model_info: EmbeddingModelInfo, threads_per_process: int, batch_size: int, max_tokens_per_batch: int, precision: Precision
+) -> None:
+    import torch
+
+    global _worker_model
+    torch.set_num_threads(threads_per_process)
+    torch.set_num_interop_threads(1)
+    _worker_model = HFEmbeddingModel(
+        model_info, device="cpu", batch_size=batch_size, max_tokens_per_batch=max_tokens_per_batch, precision=precision
+    )
+    _worker_model.embedding_model
+
+
+def _embed_in_worker(texts: list[str]) -> np.ndarray:
+    assert _worker_model is not None
+    return _worker_model.embed(texts).vectors
+
+
+class MultiProcessHFEmbeddingModel:
+    """Shards texts across `num_processes` CPU worker processes, each holding its own copy of
+    the model and using `threads_per_process` torch threads (by default the cores split evenly).
+    Shards hold at most `shard_size` texts and results come back in input order.
+
+    Workers live until `close()` is called, so prefer using the model as a context manager."""
+
     def __init__(
         self,
         model_info: EmbeddingModelInfo,
-        device: Literal["cpu", "cuda"] = "cuda",
+        num_processes: int | None = None,
+        threads_per_process: int | None = None,
+        shard_size: int = 256,
+        batch_size: int = 32,
+        max_tokens_per_batch: int = 16384,
+        precision: Precision = "fp32",
     ) -> None:
+        cpu_count = os.cpu_count() or 1
+        num_processes = num_processes or cpu_count
+        threads_per_process = threads_per_process or max(1, cpu_count // num_processes)
+        if num_processes < 1 or threads_per_process < 1 or shard_size < 1:
+            raise ValueError("num_processes, threads_per_process and shard_size must be positive integers")
+
         self.model_info = model_info
-        self.embedding_model = SentenceTransformer(model_info.model_name, device=device)
+        self.num_processes = num_processes
+        self.shard_size = shard_size
+        self.executor = ProcessPoolExecutor(
+            max_workers=num_processes,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(model_info, threads_per_process, batch_size, max_tokens_per_batch, precision),
+        )
 
     def embed(self, texts: list[str]) -> GenericEmbeddingResponse:
         start_time = time.perf_counter()
-        resp = self.embedding_model.encode(texts, show_progress_bar=False)
+        shard_size = min(self.shard_size, math.ceil(len(texts) / self.num_processes)) or 1
+        shards = [texts[start : start + shard_size] for start in range(0, len(texts), shard_size)]
+        shard_vectors = list(self.executor.map(_embed_in_worker, shards))
+        vectors = np.concatenate(shard_vectors) if shard_vectors else np.empty((0, self.model_info.effective_dimension))
         duration = time.perf_counter() - start_time
-        embeddings = resp.tolist()
         return GenericEmbeddingResponse(
-            promt_tokens=0, embeddings=embeddings, time_to_generate=duration
+            promt_tokens=0, vectors=vectors, time_to_generate=duration
         )
 
+    def close(self) -> None:
+        self.executor.shutdown(wait=True, cancel_futures=True)
+
+    def __enter__(self) -> "MultiProcessHFEmbeddingModel":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
 
 def init_model(
     model_info: EmbeddingModelInfo,
     path_to_cache: Path = Path("~/.cache/embeddings_cache").expanduser(),
+    device: Device | None = None,
+    batch_size: int = 32,
+    precision: Precision = "fp32",
 ) -> EmbeddingModelWithMonitoring:
-    model = HFEmbeddingModel(model_info=model_info)
+    model = HFEmbeddingModel(model_info=model_info, device=device, batch_size=batch_size, precision=precision)
     model = CachedEmbeddingModel(model=model, path_to_cache=path_to_cache)
     model = EmbeddingModelWithMonitoring(model=model)
     return model
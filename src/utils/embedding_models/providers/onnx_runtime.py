@@ -0,0 +1,164 @@
+import importlib.util
+import json
+import time
+import warnings
+from pathlib import Path
+
+import numpy as np
+
+from utils.embedding_models.caching import CachedEmbeddingModel
+from utils.embedding_models.monitoring import EmbeddingModelWithMonitoring
+from utils.embedding_models.request_packing import bucket_by_length
+from utils.embedding_models.schema import EmbeddingModelInfo, GenericEmbeddingResponse
+
+MODEL_INPUT_NAMES = ("input_ids", "attention_mask", "token_type_ids")
+EXPORT_CONFIG_FILE_NAME = "export_config.json"
+
+
+def check_onnx_installed() -> None:
+    """Fails early, without importing them, when the packages of the `onnx` extra are missing."""
+    missing = [module for module in ("onnx", "onnxruntime") if importlib.util.find_spec(module) is None]
+    if missing:
+        raise ImportError(
+            f"ONNX embedding models need {' and '.join(missing)}; install the `onnx` extra: "
+            "`uv sync --extra onnx` or `pip install 'articles-materials[onnx]'`"
+        )
+
+
+def export_to_onnx(model_name: str, export_dir: Path, quantize: bool = False) -> None:
+    """Exports the Sentence Transformers model together with its pooling and normalization,
+    and saves its tokenizer next to it, so that inference needs neither torch weights nor the hub."""
+    check_onnx_installed()
+    import torch
+    from sentence_transformers import SentenceTransformer
+
+    class _SentenceEmbeddingGraph(torch.nn.Module):
+        """Whole Sentence Transformers pipeline (transformer, pooling, normalization) as a single forward pass."""
+
+        def __init__(self, model: SentenceTransformer, input_names: list[str]) -> None:
+            super().__init__()
+            self.model = model
+            self.input_names = input_names
+
+        def forward(self, *inputs: torch.Tensor) -> torch.Tensor:
+            return self.model(dict(zip(self.input_names, inputs)))["sentence_embedding"]
+
+    export_dir.mkdir(parents=True, exist_ok=True)
+    model = SentenceTransformer(model_name, device="cpu").eval()
+
+    sample = model.tokenizer(["sample text", "sample"], padding=True, return_tensors="pt")
+    input_names = [name for name in MODEL_INPUT_NAMES if name in sample]
+    dynamic_axes = {name: {0: "batch", 1: "sequence"} for name in input_names}
+    with warnings.catch_warnings():
+        # shape checks traced as constants hold for any padded batch
+        warnings.simplefilter("ignore", torch.jit.TracerWarning)
+        torch.onnx.export(
+            _SentenceEmbeddingGraph(model, input_names),
+            tuple(sample[name] for name in input_names),
+            str(export_dir / "model.onnx"),
+            input_names=input_names,
+            output_names=["sentence_embedding"],
+            dynamic_axes={**dynamic_axes, "sentence_embedding": {0: "batch"}},
+            dynamo=False,
+        )
+    if quantize:
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+
+        quantize_dynamic(export_dir / "model.onnx", export_dir / "model_int8.onnx", weight_type=QuantType.QInt8)
+
+    model.tokenizer.save_pretrained(export_dir)
+    (export_dir / EXPORT_CONFIG_FILE_NAME).write_text(
+        json.dumps({"input_names": input_names, "max_seq_length": model.max_seq_length})
+    )
+
+
+class ONNXEmbeddingModel:
+    """CPU counterpart of `HFEmbeddingModel` running an ONNX export of the model in onnxruntime.
+
+    The model is exported on the first `embed` into `path_to_models/<model name>` and reused afterwards.
+    `quantize=True` runs the dynamically int8 quantized export instead."""
+
+    def __init__(
+        self,
+        model_info: EmbeddingModelInfo,
+        path_to_models: Path = Path("~/.cache/onnx_models").expanduser(),
+        batch_size: int = 32,
+        max_tokens_per_batch: int = 16384,
+        num_threads: int | None = None,
+        quantize: bool = False,
+    ) -> None:
+        if batch_size < 1:
+            raise ValueError("batch_size must be a positive integer")
+        check_onnx_installed()
+
+        self.model_info = model_info
+        self.export_dir = path_to_models / model_info.sanitized_model_name
+        self.quantize = quantize
+        self.num_threads = num_threads
+        self.batch_size = batch_size
+        self.max_tokens_per_batch = max_tokens_per_batch
+        self.session = None
+
+    def _load(self) -> None:
+        import onnxruntime
+        from transformers import AutoTokenizer
+
+        model_path = self.export_dir / ("model_int8.onnx" if self.quantize else "model.onnx")
+        if not model_path.exists() or not (self.export_dir / EXPORT_CONFIG_FILE_NAME).exists():
+            export_to_onnx(self.model_info.model_name, self.export_dir, quantize=self.quantize)
+
+        export_config = json.loads((self.export_dir / EXPORT_CONFIG_FILE_NAME).read_text())
+        self.input_names: list[str] = export_config["input_names"]
+        self.max_seq_length: int = export_config["max_seq_length"]
+        self.tokenizer = AutoTokenizer.from_pretrained(self.export_dir)
+
+        options = onnxruntime.SessionOptions()
+        options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if self.num_threads is not None:
+            options.intra_op_num_threads = self.num_threads
+        self.session = onnxruntime.InferenceSession(
+            str(model_path), sess_options=options, providers=["CPUExecutionProvider"]
+        )
+
+    def embed(self, texts: list[str]) -> GenericEmbeddingResponse:
+        if self.session is None:
+            self._load()
+        start_time = time.perf_counter()
+        vectors = np.empty((len(texts), self.model_info.effective_dimension), dtype=np.float32)
+        if texts:
+            lengths = [
+                len(input_ids)
+                for input_ids in self.tokenizer(texts, truncation=True, max_length=self.max_seq_length)["input_ids"]
+            ]
+            for batch in bucket_by_length(lengths, self.batch_size, self.max_tokens_per_batch):
+                features = self.tokenizer(
+                    [texts[i] for i in batch],
+                    padding=True,
+                    truncation=True,
+                    max_length=self.max_seq_length,
+                    return_tensors="np",
+                )
+                (resp,) = self.session.run(
+                    None, {name: features[name].astype(np.int64) for name in self.input_names}
+                )
+                # shortened like Sentence Transformers' truncate_dim
+                resp = resp[:, : self.model_info.output_dimension]
+                if resp.shape[1] != vectors.shape[1]:
+                    vectors = np.empty((len(texts), resp.shape[1]), dtype=np.float32)
+                vectors[batch] = resp
+        duration = time.perf_counter() - start_time
+        return GenericEmbeddingResponse(
+            promt_tokens=0, vectors=vectors, time_to_generate=duration
+        )
+
+
+def init_model(
+    model_info: EmbeddingModelInfo,
+    path_to_cache: Path = Path("~/.cache/embeddings_cache").expanduser(),
+    path_to_models: Path = Path("~/.cache/onnx_models").expanduser(),
+    quantize: bool = False,
+) -> EmbeddingModelWithMonitoring:
+    model = ONNXEmbeddingModel(model_info=model_info, path_to_models=path_to_models, quantize=quantize)
+    model = CachedEmbeddingModel(model=model, path_to_cache=path_to_cache)
+    model = EmbeddingModelWithMonitoring(model=model)
+    return model
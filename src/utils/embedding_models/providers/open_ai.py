@@ -1,31 +1,135 @@
+import asyncio
+import base64
 import time
+from functools import partial
 from pathlib import Path
+from typing import TYPE_CHECKING, Callable, Literal
 
-from openai import OpenAI
+import numpy as np
 
-from utils.embedding_models.caching import CachedEmbeddingModel
-from utils.embedding_models.monitoring import EmbeddingModelWithMonitoring
+from utils.embedding_models.caching import AsyncCachedEmbeddingModel, CachedEmbeddingModel
+from utils.embedding_models.monitoring import AsyncEmbeddingModelWithMonitoring, EmbeddingModelWithMonitoring
+from utils.embedding_models.request_packing import MAX_INPUTS_PER_REQUEST, EmbeddingRequestPlan
 from utils.embedding_models.schema import EmbeddingModelInfo, GenericEmbeddingResponse
+from utils.embedding_models.tokenizer import ENCODING_MODEL_NAME, tokenize_many
+
+if TYPE_CHECKING:
+    from openai.types import CreateEmbeddingResponse
+
+
+def tokenizer_for(model_info: EmbeddingModelInfo) -> Callable[[list[str]], list[list[int]]] | None:
+    """Tokenizer of the model, or None for models tiktoken does not know about (e.g. OpenAI compatible servers)."""
+    try:
+        encoding_model_name = ENCODING_MODEL_NAME(model_info.model_name)
+    except ValueError:
+        return None
+    return partial(tokenize_many, encoding_model_name=encoding_model_name)
+
+
+def dimension_arguments(model_info: EmbeddingModelInfo) -> dict[str, int]:
+    """text-embedding-3 models shorten their embeddings natively when asked for fewer `dimensions`."""
+    if model_info.output_dimension is None:
+        return {}
+    if model_info.model_name == ENCODING_MODEL_NAME.TEXT_EMBEDDING_ADA_002.value:
+        raise ValueError(f"{model_info.model_name} does not support shortened embeddings")
+    return {"dimensions": model_info.output_dimension}
+
+
+def decode_embeddings(resp: "CreateEmbeddingResponse") -> np.ndarray:
+    """Embeddings requested with `encoding_format="base64"` come back as raw float32 bytes,
+    which are decoded straight into a matrix instead of through lists of Python floats."""
+    data = sorted(resp.data, key=lambda d: d.index)
+    return np.stack([np.frombuffer(base64.b64decode(d.embedding), dtype=np.float32) for d in data])  # type: ignore
 
 
 class OpenAIEmbeddingModel:
-    def __init__(self, api_key: str, model_info: EmbeddingModelInfo) -> None:
-        self.client = OpenAI(api_key=api_key)
+    """Packs the texts into as few requests as the endpoint limits allow. Inputs over the
+    per-input token limit raise `OversizedInputError`, or with `oversized_inputs="chunk"`
+    are embedded in chunks and averaged."""
+
+    def __init__(
+        self,
+        api_key: str,
+        model_info: EmbeddingModelInfo,
+        base_url: str | None = None,
+        oversized_inputs: Literal["raise", "chunk"] = "raise",
+    ) -> None:
+        from openai import OpenAI
+
+        self.client = OpenAI(api_key=api_key, base_url=base_url)
         self.model_info = model_info
+        self.dimension_arguments = dimension_arguments(model_info)
+        self.oversized_inputs = oversized_inputs
+        self.tokenize = tokenizer_for(model_info)
 
     def embed(self, texts: list[str]) -> GenericEmbeddingResponse:
-        start_time = time.perf_counter()
-        resp = self.client.embeddings.create(
-            input=texts,
-            model=self.model_info.model_name,
+        plan = EmbeddingRequestPlan(texts, self.tokenize, self.oversized_inputs)
+
+        request_embeddings = []
+        promt_tokens = 0
+        duration = 0.0
+        for request in plan.requests:
+            start_time = time.perf_counter()
+            resp = self.client.embeddings.create(
+                input=plan.request_inputs(request),
+                model=self.model_info.model_name,
+                encoding_format="base64",
+                **self.dimension_arguments,
+            )
+            duration += time.perf_counter() - start_time
+            promt_tokens += resp.usage.prompt_tokens
+            request_embeddings.append(decode_embeddings(resp))
+
+        return GenericEmbeddingResponse(
+            vectors=plan.assemble(request_embeddings), promt_tokens=promt_tokens, time_to_generate=duration
         )
-        duration = time.perf_counter() - start_time
 
-        promt_tokens = resp.usage.prompt_tokens
-        embeddings = [d.embedding for d in resp.data]
+
+class AsyncOpenAIEmbeddingModel:
+    """Embeds through the async OpenAI client with at most `max_concurrency` requests in flight.
+    Texts are packed into requests the same way as in `OpenAIEmbeddingModel`."""
+
+    def __init__(
+        self,
+        api_key: str,
+        model_info: EmbeddingModelInfo,
+        max_concurrency: int = 16,
+        base_url: str | None = None,
+        oversized_inputs: Literal["raise", "chunk"] = "raise",
+    ) -> None:
+        if max_concurrency < 1:
+            raise ValueError("max_concurrency must be a positive integer")
+
+        from openai import AsyncOpenAI
+
+        self.client = AsyncOpenAI(api_key=api_key, base_url=base_url)
+        self.model_info = model_info
+        self.semaphore = asyncio.Semaphore(max_concurrency)
+        self.dimension_arguments = dimension_arguments(model_info)
+        self.oversized_inputs = oversized_inputs
+        self.tokenize = tokenizer_for(model_info)
+
+    async def _send(self, inputs: list[str] | list[list[int]]) -> tuple[np.ndarray, int, float]:
+        async with self.semaphore:
+            start_time = time.perf_counter()
+            resp = await self.client.embeddings.create(
+                input=inputs,
+                model=self.model_info.model_name,
+                encoding_format="base64",
+                **self.dimension_arguments,
+            )
+            duration = time.perf_counter() - start_time
+        return decode_embeddings(resp), resp.usage.prompt_tokens, duration
+
+    async def embed(self, texts: list[str]) -> GenericEmbeddingResponse:
+        plan = EmbeddingRequestPlan(texts, self.tokenize, self.oversized_inputs)
+
+        responses = await asyncio.gather(*(self._send(plan.request_inputs(request)) for request in plan.requests))
 
         return GenericEmbeddingResponse(
-            embeddings=embeddings, promt_tokens=promt_tokens, time_to_generate=duration
+            vectors=plan.assemble([embeddings for embeddings, _, _ in responses]),
+            promt_tokens=sum(tokens for _, tokens, _ in responses),
+            time_to_generate=sum(duration for _, _, duration in responses),
         )
 
 
@@ -33,8 +137,23 @@ def init_model(
     api_key: str,
     model_info: EmbeddingModelInfo,
     path_to_cache: Path = Path("~/.cache/embeddings_cache").expanduser(),
+    batch_size: int = MAX_INPUTS_PER_REQUEST,
 ) -> EmbeddingModelWithMonitoring:
+    # cache misses are handed over in batches as large as a request may be, so packing can fill each request
     model = OpenAIEmbeddingModel(api_key=api_key, model_info=model_info)
-    model = CachedEmbeddingModel(model=model, path_to_cache=path_to_cache)
+    model = CachedEmbeddingModel(model=model, path_to_cache=path_to_cache, batch_size=batch_size)
     model = EmbeddingModelWithMonitoring(model=model)
     return model
+
+
+def init_async_model(
+    api_key: str,
+    model_info: EmbeddingModelInfo,
+    max_concurrency: int = 16,
+    path_to_cache: Path = Path("~/.cache/embeddings_cache").expanduser(),
+    batch_size: int = MAX_INPUTS_PER_REQUEST,
+) -> AsyncEmbeddingModelWithMonitoring:
+    model = AsyncOpenAIEmbeddingModel(api_key=api_key, model_info=model_info, max_concurrency=max_concurrency)
+    model = AsyncCachedEmbeddingModel(model=model, path_to_cache=path_to_cache, batch_size=batch_size)
+    model = AsyncEmbeddingModelWithMonitoring(model=model)
+    return model
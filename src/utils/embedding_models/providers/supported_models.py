@@ -35,3 +35,8 @@ TEXT_EMBEDDING_3_LARGE = EmbeddingModelInfo(
 TEXT_EMBEDDING_ADA_002 = EmbeddingModelInfo(
     model_name="text-embedding-ada-002", dimension=1536, cost_per_mln_tokens=0.100
 )
+
+# Shortened OpenAI embeddings
+TEXT_EMBEDDING_3_LARGE_1024 = TEXT_EMBEDDING_3_LARGE.with_output_dimension(1024)
+TEXT_EMBEDDING_3_LARGE_256 = TEXT_EMBEDDING_3_LARGE.with_output_dimension(256)
+TEXT_EMBEDDING_3_SMALL_512 = TEXT_EMBEDDING_3_SMALL.with_output_dimension(512)
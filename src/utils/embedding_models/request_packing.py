@@ -0,0 +1,116 @@
+from typing import Callable, Literal
+
+import numpy as np
+
+# Limits of the OpenAI embeddings endpoint
+MAX_TOKENS_PER_INPUT = 8191
+MAX_TOKENS_PER_REQUEST = 300_000
+MAX_INPUTS_PER_REQUEST = 2048
+
+
+class OversizedInputError(ValueError):
+    def __init__(self, oversized: dict[int, int], max_tokens_per_input: int) -> None:
+        self.oversized = oversized
+        details = ", ".join(f"#{index} ({tokens} tokens)" for index, tokens in oversized.items())
+        super().__init__(f"Inputs exceed the limit of {max_tokens_per_input} tokens per input: {details}")
+
+
+def pack_requests(
+    token_counts: list[int], max_tokens_per_request: int, max_inputs_per_request: int
+) -> list[list[int]]:
+    """Greedily groups consecutive inputs into requests that stay within both limits.
+    Returns the input indices of every request."""
+    requests: list[list[int]] = []
+    current: list[int] = []
+    current_tokens = 0
+    for index, tokens in enumerate(token_counts):
+        if current and (current_tokens + tokens > max_tokens_per_request or len(current) >= max_inputs_per_request):
+            requests.append(current)
+            current, current_tokens = [], 0
+        current.append(index)
+        current_tokens += tokens
+    if current:
+        requests.append(current)
+    return requests
+
+
+def bucket_by_length(lengths: list[int], max_batch_size: int, max_tokens_per_batch: int) -> list[list[int]]:
+    """Groups inputs of similar length so that padded batches (every input padded to the longest one)
+    stay within `max_tokens_per_batch`: short inputs share wide batches, long ones narrow batches.
+    Returns the input indices of every batch, longest inputs first."""
+    batches: list[list[int]] = []
+    current: list[int] = []
+    for index in sorted(range(len(lengths)), key=lambda i: lengths[i], reverse=True):
+        # the first input of a batch is its longest one
+        if current and (len(current) >= max_batch_size or (len(current) + 1) * lengths[current[0]] > max_tokens_per_batch):
+            batches.append(current)
+            current = []
+        current.append(index)
+    if current:
+        batches.append(current)
+    return batches
+
+
+class EmbeddingRequestPlan:
+    """Splits a list of texts into as few requests as the limits allow.
+
+    With a `tokenize` function (encoding a whole list of texts) the texts are sent as token ids: inputs over `max_tokens_per_input`
+    either raise `OversizedInputError` or are cut into chunks whose embeddings are averaged
+    (weighted by chunk length) and re-normalized. Without it only the number of inputs is limited."""
+
+    def __init__(
+        self,
+        texts: list[str],
+        tokenize: Callable[[list[str]], list[list[int]]] | None,
+        oversized_inputs: Literal["raise", "chunk"] = "raise",
+        max_tokens_per_input: int = MAX_TOKENS_PER_INPUT,
+        max_tokens_per_request: int = MAX_TOKENS_PER_REQUEST,
+        max_inputs_per_request: int = MAX_INPUTS_PER_REQUEST,
+    ) -> None:
+        self.number_of_texts = len(texts)
+        self.inputs: list[str] | list[list[int]]
+        self.owners: list[int] = []
+        self.weights: list[int] = []
+
+        if tokenize is None:
+            self.inputs = list(texts)
+            self.owners = list(range(len(texts)))
+            self.weights = [1] * len(texts)
+            self.requests = pack_requests(self.weights, max_tokens_per_request, max_inputs_per_request)
+            return
+
+        token_lists = tokenize(texts)
+        oversized = {i: len(tokens) for i, tokens in enumerate(token_lists) if len(tokens) > max_tokens_per_input}
+        if oversized and oversized_inputs == "raise":
+            raise OversizedInputError(oversized, max_tokens_per_input)
+
+        chunks: list[list[int]] = []
+        for owner, tokens in enumerate(token_lists):
+            for start in range(0, max(len(tokens), 1), max_tokens_per_input):
+                chunks.append(tokens[start : start + max_tokens_per_input])
+                self.owners.append(owner)
+        self.inputs = chunks
+        self.weights = [len(chunk) for chunk in chunks]
+        self.requests = pack_requests(self.weights, max_tokens_per_request, max_inputs_per_request)
+
+    def request_inputs(self, request: list[int]) -> list[str] | list[list[int]]:
+        return [self.inputs[index] for index in request]  # type: ignore
+
+    def assemble(self, request_embeddings: list[np.ndarray]) -> np.ndarray:
+        """Puts the embeddings returned for every request back in the order of the original texts."""
+        if not self.requests:
+            return np.empty((0, 0), dtype=np.float32)
+        chunk_embeddings = np.empty((len(self.inputs), request_embeddings[0].shape[1]), dtype=np.float32)
+        for request, embeddings in zip(self.requests, request_embeddings):
+            chunk_embeddings[request] = embeddings
+        if len(self.inputs) == self.number_of_texts:
+            return chunk_embeddings
+
+        owners = np.asarray(self.owners)
+        weights = np.asarray(self.weights, dtype=np.float32)[:, None]
+        result = np.zeros((self.number_of_texts, chunk_embeddings.shape[1]), dtype=np.float32)
+        np.add.at(result, owners, chunk_embeddings * weights)
+        chunked = np.bincount(owners, minlength=self.number_of_texts) > 1
+        result[~chunked] = chunk_embeddings[np.searchsorted(owners, np.flatnonzero(~chunked))]
+        result[chunked] /= np.linalg.norm(result[chunked], axis=1, keepdims=True)
+        return result
@@ -1,28 +1,94 @@
-from typing import Protocol, TypeVar
+from typing import Any, Protocol, TypeVar
 
-from pydantic import BaseModel
+import numpy as np
+from pydantic import BaseModel, field_serializer, field_validator, model_validator
 
 T = TypeVar("T")
 
 
-class GenericEmbeddingResponse(BaseModel):
-    embeddings: list[list[float]]
+def as_vectors(embeddings: Any) -> np.ndarray:
+    """Embeddings as a contiguous float32 matrix with one row per text (no copy if they already are one)."""
+    vectors = np.ascontiguousarray(embeddings, dtype=np.float32)
+    if vectors.ndim == 1 and vectors.size == 0:
+        return np.empty((0, 0), dtype=np.float32)
+    if vectors.ndim != 2:
+        raise ValueError(f"Expected a 2-dimensional array of embeddings, got {vectors.ndim} dimensions")
+    return vectors
+
+
+class GenericEmbeddingResponse(BaseModel, arbitrary_types_allowed=True):
+    """`vectors` holds the embeddings as a float32 matrix. Lists of floats are still accepted
+    as `embeddings=` and `embeddings` gives them back as lists, at the cost of a copy."""
+
+    vectors: np.ndarray
     promt_tokens: int
     time_to_generate: float
+    cached_items: int = 0
+
+    @model_validator(mode="before")
+    @classmethod
+    def _accept_embeddings(cls, data: Any) -> Any:
+        if isinstance(data, dict) and "embeddings" in data:
+            data = dict(data)
+            data["vectors"] = data.pop("embeddings")
+        return data
+
+    @field_validator("vectors", mode="before")
+    @classmethod
+    def _to_vectors(cls, value: Any) -> np.ndarray:
+        return as_vectors(value)
+
+    @field_serializer("vectors")
+    def _serialize_vectors(self, vectors: np.ndarray) -> list[list[float]]:
+        return vectors.tolist()
+
+    @property
+    def embeddings(self) -> list[list[float]]:
+        return self.vectors.tolist()
 
 
 class EmbeddingModelInfo(BaseModel, frozen=True):
+    """`output_dimension` requests embeddings shortened to fewer than the native `dimension`."""
+
     model_name: str
     dimension: int
     cost_per_mln_tokens: float
+    output_dimension: int | None = None
+
+    @model_validator(mode="after")
+    def _check_output_dimension(self) -> "EmbeddingModelInfo":
+        if self.output_dimension is not None and not 0 < self.output_dimension <= self.dimension:
+            raise ValueError(f"output_dimension must be between 1 and {self.dimension}, got {self.output_dimension}")
+        return self
 
     @property
     def sanitized_model_name(self) -> str:
         return self.model_name.replace("/", "_")
 
+    @property
+    def effective_dimension(self) -> int:
+        return self.output_dimension or self.dimension
+
+    @property
+    def cache_prefix(self) -> str:
+        """Shortened embeddings are cached apart from the full ones."""
+        if self.output_dimension is None:
+            return self.sanitized_model_name
+        return f"{self.sanitized_model_name}_{self.output_dimension}d"
+
+    def with_output_dimension(self, output_dimension: int | None) -> "EmbeddingModelInfo":
+        return self.model_validate({**self.model_dump(), "output_dimension": output_dimension})
+
 
 class EmbeddingModel(Protocol):
     def embed(self, texts: list[str]) -> GenericEmbeddingResponse: ...
 
     @property
     def model_info(self) -> EmbeddingModelInfo: ...
+
+
+class AsyncEmbeddingModel(Protocol):
+    async def embed(self, texts: list[str]) -> GenericEmbeddingResponse: ...
+
+    @property
+    def model_info(self) -> EmbeddingModelInfo: ...
@@ -1,5 +1,13 @@
+import os
 from enum import Enum
-import tiktoken
+from functools import lru_cache
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    import tiktoken
+
+DEFAULT_NUMBER_OF_THREADS = os.cpu_count() or 1
+
 
 class ENCODING_MODEL_NAME(Enum):
     TEXT_EMBEDDING_ADA_002 = "text-embedding-ada-002"
@@ -7,9 +15,30 @@ class ENCODING_MODEL_NAME(Enum):
     TEXT_EMBEDDING_3_LARGE = "text-embedding-3-large"
 
 
+@lru_cache(maxsize=None)
+def get_encoding(encoding_model_name: ENCODING_MODEL_NAME) -> "tiktoken.Encoding":
+    """Encoders are loaded once per model and shared by the whole process."""
+    import tiktoken
+
+    return tiktoken.encoding_for_model(encoding_model_name.value)
+
+
 def tokenize_text(text: str, encoding_model_name: ENCODING_MODEL_NAME) -> list[int]:
-    tokenizer = tiktoken.encoding_for_model(encoding_model_name.value)
-    return tokenizer.encode(text)
+    return get_encoding(encoding_model_name).encode(text)
+
+
+def tokenize_many(
+    texts: list[str], encoding_model_name: ENCODING_MODEL_NAME, num_threads: int = DEFAULT_NUMBER_OF_THREADS
+) -> list[list[int]]:
+    return get_encoding(encoding_model_name).encode_batch(texts, num_threads=num_threads)
+
 
 def calculate_number_of_tokens(text: str, encoding_model_name: ENCODING_MODEL_NAME) -> int:
-    return len(tokenize_text(text, encoding_model_name))
\ No newline at end of file
+    return len(tokenize_text(text, encoding_model_name))
+
+
+def count_tokens_many(
+    texts: list[str], encoding_model_name: ENCODING_MODEL_NAME, num_threads: int = DEFAULT_NUMBER_OF_THREADS
+) -> list[int]:
+    """Token counts of all texts, encoded in parallel by tiktoken's thread pool."""
+    return [len(tokens) for tokens in tokenize_many(texts, encoding_model_name, num_threads)]
@@ -3,7 +3,14 @@ from typing import Generic, TypeVar
 
 from pydantic import BaseModel
 
-from utils.caching import FileBasedTextCache
+from utils.caching import (
+    CacheBackend,
+    CachePolicy,
+    CacheStats,
+    LRUMemoryCache,
+    SQLiteTextCache,
+    import_legacy_file_cache,
+)
 from utils.llm_clients.schema import (
     ChatMessage,
     GenericLLMResponse,
@@ -20,10 +27,21 @@ class CachedLLMClient(Generic[ResponseFormat]):
         self,
         client: LLMCLient[ResponseFormat],
         path_to_cache: Path = Path("~/.cache/completion_cache").expanduser(),
+        cache: CacheBackend[str] | None = None,
+        memory_cache_max_entries: int | None = None,
+        memory_cache_max_bytes: int | None = None,
+        cache_policy: CachePolicy = CachePolicy(),
     ) -> None:
         self.client = client
         model_name = client.model_info.sanitized_model_name
-        self.cache = FileBasedTextCache(prefix=model_name, path_to_cache=path_to_cache)
+        if cache is None:
+            cache = SQLiteTextCache(prefix=model_name, path_to_cache=path_to_cache, policy=cache_policy)
+            import_legacy_file_cache(cache)
+        if memory_cache_max_entries is not None or memory_cache_max_bytes is not None:
+            cache = LRUMemoryCache(
+                cache, max_entries=memory_cache_max_entries, max_bytes=memory_cache_max_bytes
+            )
+        self.cache = cache
 
     def chat_messages_to_string(self, messages: list[ChatMessage]) -> str:
         return "\n".join([message.model_dump_json() for message in messages])
@@ -33,26 +51,58 @@ class CachedLLMClient(Generic[ResponseFormat]):
             ChatMessage.model_validate_json(message) for message in string.split("\n")
         ]
 
+    def _response_from_cache(
+        self, retrieved: str, _format: type[ResponseFormat]
+    ) -> GenericLLMResponse[ResponseFormat]:
+        response = GenericLLMResponse[_format].model_validate_json(retrieved)
+        response.response = _format.model_validate(response.response)
+        response.from_cache = True
+        return response
+
     def chat(
         self, messages: list[ChatMessage], _format: type[ResponseFormat]
     ) -> GenericLLMResponse[ResponseFormat]:
 
         promt = self.chat_messages_to_string(messages)
 
-        if self.cache.exists(promt):
-            retrieved = str(self.cache.retrieve(promt))
-            response = GenericLLMResponse[_format].model_validate_json(retrieved)
-            response.response = _format.model_validate(response.response)
-            return response
+        retrieved = self.cache.retrieve(promt)
+        if retrieved is not None:
+            return self._response_from_cache(retrieved, _format)
 
-        self.cache.exists(promt)
         response = self.client.chat(messages, _format)
-        self.cache.exists(promt)
-
         self.cache.store(promt, response.model_dump_json())
 
         return response
 
+    def chat_many(
+        self, conversations: list[list[ChatMessage]], _format: type[ResponseFormat]
+    ) -> list[GenericLLMResponse[ResponseFormat]]:
+
+        promts = [self.chat_messages_to_string(messages) for messages in conversations]
+        retrieved = self.cache.retrieve_many(promts)
+
+        responses: dict[str, GenericLLMResponse[ResponseFormat]] = {
+            promt: self._response_from_cache(value, _format)
+            for promt, value in retrieved.items()
+        }
+
+        to_store: dict[str, str] = {}
+        try:
+            for promt, messages in zip(promts, conversations):
+                if promt not in responses:
+                    response = self.client.chat(messages, _format)
+                    responses[promt] = response
+                    to_store[promt] = response.model_dump_json()
+        finally:
+            if to_store:
+                self.cache.store_many(to_store)
+
+        return [responses[promt] for promt in promts]
+
+    @property
+    def cache_stats(self) -> CacheStats | None:
+        return self.cache.stats() if isinstance(self.cache, LRUMemoryCache) else None
+
     @property
     def model_info(self) -> LLMModelInfo:
         return self.client.model_info
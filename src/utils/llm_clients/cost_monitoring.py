@@ -1,7 +1,10 @@
+import threading
+import time
 
 from pydantic import BaseModel
 
 from utils.llm_clients.schema import ChatMessage, GenericLLMResponse, LLMCLient
+from utils.metrics import CallMetrics
 
 from typing import TypeVar, Generic
 
@@ -14,11 +17,25 @@ class LLMClientWithCostMonitoring(Generic[ResponseFormat]):
         self.completion_tokens = 0
         self.promt_tokens = 0
         self.model_info = self.client.model_info
+        self.metrics = CallMetrics("llm")
+        self._lock = threading.Lock()
 
     def chat(self, messages: list[ChatMessage], _format: type[ResponseFormat]) -> GenericLLMResponse[ResponseFormat]:
-        response = self.client.chat(messages, _format)
-        self.completion_tokens += response.completion_tokens
-        self.promt_tokens += response.promt_tokens
+        start_time = time.perf_counter()
+        try:
+            response = self.client.chat(messages, _format)
+        except Exception:
+            self.metrics.record(time.perf_counter() - start_time, items=1, error=True)
+            raise
+        self.metrics.record(
+            time.perf_counter() - start_time,
+            items=1,
+            tokens=response.promt_tokens + response.completion_tokens,
+            cache_hits=int(response.from_cache),
+        )
+        with self._lock:
+            self.completion_tokens += response.completion_tokens
+            self.promt_tokens += response.promt_tokens
 
         return response
     
@@ -26,4 +43,13 @@ class LLMClientWithCostMonitoring(Generic[ResponseFormat]):
         return self.promt_tokens * self.client.model_info.promt_cost_per_mln_tokens / 1_000_000
     
     def get_total_completion_cost(self) -> float:
-        return self.completion_tokens * self.client.model_info.completion_cost_per_mln_tokens / 1_000_000
\ No newline at end of file
+        return self.completion_tokens * self.client.model_info.completion_cost_per_mln_tokens / 1_000_000
+
+    def snapshot(self) -> dict[str, float]:
+        return {
+            **self.metrics.snapshot(),
+            "total_cost": self.get_total_promt_cost() + self.get_total_completion_cost(),
+        }
+
+    def to_prometheus(self) -> str:
+        return self.metrics.to_prometheus(labels={"model": self.model_info.model_name})
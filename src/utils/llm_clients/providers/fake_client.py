@@ -0,0 +1,61 @@
+import hashlib
+import random
+from typing import Any, Callable, Generic, TypeVar
+
+from pydantic import BaseModel
+
+from utils.llm_clients.schema import ChatMessage, GenericLLMResponse, LLMModelInfo
+from utils.simulation import FaultInjection, LatencyDistribution, SimulatedEndpoint, estimate_number_of_tokens
+
+ResponseFormat = TypeVar("ResponseFormat", bound=BaseModel)
+
+QUESTION_TEMPLATES = (
+    "Czym jest {}?",
+    "Jakie znaczenie ma {}?",
+    "Kiedy pojawiło się {}?",
+    "Gdzie można spotkać {}?",
+    "Dlaczego {} jest ważne?",
+)
+
+
+def fake_questions(messages: list[ChatMessage]) -> dict[str, Any]:
+    """Five questions about words of the last message, the same for the same conversation.
+    The dict validates into `GeneratedQuestions` or any other format with a `questions: list[str]` field."""
+    conversation = "\n".join(message.content for message in messages)
+    rng = random.Random(hashlib.sha256(conversation.encode("utf-8")).digest())
+    words = [word.strip(".,:;!?()\"'") for word in messages[-1].content.split()]
+    words = [word for word in words if len(word) > 3] or ["tekst"]
+    return {"questions": [template.format(rng.choice(words)) for template in QUESTION_TEMPLATES]}
+
+
+class FakeLLMClient(Generic[ResponseFormat]):
+    """Offline stand-in for an LLM API. The structured response is built by `respond` from the conversation
+    (by default `fake_questions`) and validated into the requested format; every call goes through
+    a `SimulatedEndpoint`, which adds latency, failures and rate limits."""
+
+    def __init__(
+        self,
+        model_info: LLMModelInfo,
+        respond: Callable[[list[ChatMessage]], dict[str, Any]] = fake_questions,
+        latency: LatencyDistribution = LatencyDistribution(),
+        faults: FaultInjection = FaultInjection(),
+        seed: int = 0,
+        endpoint: SimulatedEndpoint | None = None,
+    ) -> None:
+        self.model_info = model_info
+        self.respond = respond
+        self.endpoint = endpoint or SimulatedEndpoint(latency, faults, seed)
+        self.promt_tokens = 0
+        self.completion_tokens = 0
+
+    def chat(self, messages: list[ChatMessage], _format: type[ResponseFormat]) -> GenericLLMResponse[ResponseFormat]:
+        promt_tokens = sum(estimate_number_of_tokens(message.content) for message in messages)
+        response = _format.model_validate(self.respond(messages))
+        completion_tokens = estimate_number_of_tokens(response.model_dump_json())
+
+        duration = self.endpoint.call(promt_tokens + completion_tokens)
+        self.promt_tokens += promt_tokens
+        self.completion_tokens += completion_tokens
+        return GenericLLMResponse[_format](
+            response=response, promt_tokens=promt_tokens, completion_tokens=completion_tokens, time_to_generate=duration
+        )
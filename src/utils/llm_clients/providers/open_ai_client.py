@@ -1,5 +1,4 @@
 from typing import Generic, TypeVar
-from openai import OpenAI
 from pydantic import BaseModel
 import time
 
@@ -9,6 +8,8 @@ ResponseFormat = TypeVar('ResponseFormat', bound=BaseModel)
 
 class OpenAIClient(Generic[ResponseFormat]):
     def __init__(self, api_key:str, model_info: LLMModelInfo):
+        from openai import OpenAI
+
         self.api_key = api_key
         self.client = OpenAI(api_key=api_key)
         self.model_info = model_info
@@ -1,6 +1,6 @@
 from typing import Generic, Literal, Protocol, TypeVar
 
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 
 T = TypeVar("T")
 
@@ -25,6 +25,7 @@ class GenericLLMResponse(BaseModel, Generic[T]):
     promt_tokens: int
     completion_tokens: int
     time_to_generate: float
+    from_cache: bool = Field(default=False, exclude=True)
 
 
 class LLMCLient(Protocol[T]):
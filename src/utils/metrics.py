@@ -0,0 +1,149 @@
+import threading
+import time
+from bisect import bisect_left
+from typing import Sequence
+
+DEFAULT_LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+DEFAULT_BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256, 512, 1024, 2048)
+QUANTILES = (0.5, 0.95, 0.99)
+
+
+class Histogram:
+    """Fixed-bucket histogram. Quantiles are interpolated linearly inside the bucket they fall in,
+    the same way Prometheus' `histogram_quantile` does."""
+
+    def __init__(self, buckets: Sequence[float]) -> None:
+        self.buckets = sorted(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def quantile(self, q: float) -> float:
+        if self.count == 0:
+            return 0.0
+        rank = q * self.count
+        cumulative = 0
+        for i, count in enumerate(self.counts):
+            if count and cumulative + count >= rank:
+                if i == len(self.buckets):
+                    return self.buckets[-1]
+                lower = self.buckets[i - 1] if i > 0 else 0.0
+                return lower + (self.buckets[i] - lower) * (rank - cumulative) / count
+            cumulative += count
+        return self.buckets[-1]
+
+    def cumulative_counts(self) -> list[tuple[str, int]]:
+        bounds = [f"{bound:g}" for bound in self.buckets] + ["+Inf"]
+        cumulative = 0
+        result = []
+        for bound, count in zip(bounds, self.counts):
+            cumulative += count
+            result.append((bound, cumulative))
+        return result
+
+
+class CallMetrics:
+    """Thread-safe metrics of the calls made through a monitoring wrapper: latency and batch size
+    histograms, processed items and tokens, cache hits and errors.
+
+    Throughput is measured over the window between the start of the first and the end of the last call,
+    so it stays correct when calls overlap."""
+
+    def __init__(
+        self,
+        namespace: str,
+        latency_buckets: Sequence[float] = DEFAULT_LATENCY_BUCKETS,
+        batch_size_buckets: Sequence[float] = DEFAULT_BATCH_SIZE_BUCKETS,
+    ) -> None:
+        self.namespace = namespace
+        self.lock = threading.Lock()
+        self.latency = Histogram(latency_buckets)
+        self.batch_size = Histogram(batch_size_buckets)
+        self.calls = 0
+        self.errors = 0
+        self.items = 0
+        self.tokens = 0
+        self.cache_hits = 0
+        self.first_call_start: float | None = None
+        self.last_call_end: float | None = None
+
+    def record(self, latency: float, items: int, tokens: int = 0, cache_hits: int = 0, error: bool = False) -> None:
+        end = time.perf_counter()
+        with self.lock:
+            start = end - latency
+            if self.first_call_start is None or start < self.first_call_start:
+                self.first_call_start = start
+            self.last_call_end = end
+            self.calls += 1
+            self.latency.observe(latency)
+            self.batch_size.observe(items)
+            if error:
+                self.errors += 1
+                return
+            self.items += items
+            self.tokens += tokens
+            self.cache_hits += cache_hits
+
+    def snapshot(self) -> dict[str, float]:
+        with self.lock:
+            window = (
+                self.last_call_end - self.first_call_start
+                if self.first_call_start is not None and self.last_call_end is not None
+                else 0.0
+            )
+            snapshot: dict[str, float] = {
+                "calls": self.calls,
+                "errors": self.errors,
+                "items": self.items,
+                "tokens": self.tokens,
+                "cache_hits": self.cache_hits,
+                "cache_hit_ratio": self.cache_hits / self.items if self.items else 0.0,
+                "items_per_second": self.items / window if window > 0 else 0.0,
+                "tokens_per_second": self.tokens / window if window > 0 else 0.0,
+                "latency_mean_seconds": self.latency.sum / self.latency.count if self.latency.count else 0.0,
+                "batch_size_mean": self.batch_size.sum / self.batch_size.count if self.batch_size.count else 0.0,
+            }
+            for q in QUANTILES:
+                snapshot[f"latency_p{q * 100:g}_seconds"] = self.latency.quantile(q)
+            for q in QUANTILES:
+                snapshot[f"batch_size_p{q * 100:g}"] = self.batch_size.quantile(q)
+            return snapshot
+
+    def to_prometheus(self, labels: dict[str, str] | None = None) -> str:
+        """Metrics in the Prometheus text exposition format."""
+        label_pairs = [f'{name}="{value}"' for name, value in (labels or {}).items()]
+
+        def sample(name: str, value: float, extra_labels: tuple[str, ...] = ()) -> str:
+            all_labels = [*label_pairs, *extra_labels]
+            label_set = "{" + ",".join(all_labels) + "}" if all_labels else ""
+            # exact integers and round-trippable floats: counters grow past what `:g` keeps (6 digits)
+            formatted = str(value) if isinstance(value, int) else repr(float(value))
+            return f"{self.namespace}_{name}{label_set} {formatted}"
+
+        lines = []
+        with self.lock:
+            for name, value, description in [
+                ("calls_total", self.calls, "Number of calls."),
+                ("errors_total", self.errors, "Number of calls that raised an error."),
+                ("items_total", self.items, "Number of items processed."),
+                ("tokens_total", self.tokens, "Number of tokens processed."),
+                ("cache_hits_total", self.cache_hits, "Number of items served from the cache."),
+            ]:
+                lines += [f"# HELP {self.namespace}_{name} {description}", f"# TYPE {self.namespace}_{name} counter"]
+                lines.append(sample(name, value))
+
+            for name, histogram, description in [
+                ("latency_seconds", self.latency, "Latency of a call."),
+                ("batch_size", self.batch_size, "Number of items in a call."),
+            ]:
+                lines += [f"# HELP {self.namespace}_{name} {description}", f"# TYPE {self.namespace}_{name} histogram"]
+                for bound, count in histogram.cumulative_counts():
+                    lines.append(sample(f"{name}_bucket", count, (f'le="{bound}"',)))
+                lines.append(sample(f"{name}_sum", histogram.sum))
+                lines.append(sample(f"{name}_count", histogram.count))
+        return "\n".join(lines) + "\n"
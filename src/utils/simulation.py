@@ -0,0 +1,130 @@
+import asyncio
+import math
+import random
+import threading
+import time
+from collections import deque
+from typing import Callable, Literal
+
+from pydantic import BaseModel, Field
+
+
+class SimulatedProviderError(RuntimeError):
+    """An injected failure of a simulated provider (the equivalent of a 5xx response)."""
+
+
+class SimulatedRateLimitError(SimulatedProviderError):
+    """The request was rejected because it would exceed the simulated rate limits (the equivalent of a 429)."""
+
+    def __init__(self, message: str, retry_after: float) -> None:
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+def estimate_number_of_tokens(text: str) -> int:
+    """Roughly four characters per token, the rule of thumb for OpenAI tokenizers. Used where tiktoken
+    (which downloads its encodings) is not available."""
+    return max(len(text) // 4, 1)
+
+
+class LatencyDistribution(BaseModel, frozen=True):
+    """Latency of a single request: a fixed part drawn from the distribution plus a part growing with the number of tokens.
+    `spread_seconds` is the half-width of the uniform distribution and the standard deviation of the other ones."""
+
+    kind: Literal["constant", "uniform", "normal", "lognormal", "exponential"] = "constant"
+    mean_seconds: float = Field(default=0.0, ge=0)
+    spread_seconds: float = Field(default=0.0, ge=0)
+    seconds_per_mln_tokens: float = Field(default=0.0, ge=0)
+
+    def sample(self, rng: random.Random, tokens: int = 0) -> float:
+        mean, spread = self.mean_seconds, self.spread_seconds
+        if self.kind == "constant" or mean == 0:
+            latency = mean
+        elif self.kind == "uniform":
+            latency = rng.uniform(mean - spread, mean + spread)
+        elif self.kind == "normal":
+            latency = rng.gauss(mean, spread)
+        elif self.kind == "lognormal":
+            sigma = math.sqrt(math.log1p((spread / mean) ** 2))
+            latency = rng.lognormvariate(math.log(mean) - sigma**2 / 2, sigma)
+        else:
+            latency = rng.expovariate(1 / mean)
+        return max(latency, 0.0) + tokens * self.seconds_per_mln_tokens / 1_000_000
+
+
+class FaultInjection(BaseModel, frozen=True):
+    """`failure_rate` of the admitted requests fail after their latency has elapsed; requests over
+    the per-minute limits are rejected straight away with `SimulatedRateLimitError`."""
+
+    failure_rate: float = Field(default=0.0, ge=0, le=1)
+    requests_per_minute: int | None = Field(default=None, gt=0)
+    tokens_per_minute: int | None = Field(default=None, gt=0)
+
+
+class SimulatedEndpoint:
+    """Latency, failures, rate limits and usage accounting of a simulated remote API.
+
+    All randomness comes from a generator seeded with `seed`, so a given sequence of calls always sees
+    the same latencies and failures. Thread-safe; `call` blocks the thread, `acall` only the coroutine."""
+
+    def __init__(
+        self,
+        latency: LatencyDistribution = LatencyDistribution(),
+        faults: FaultInjection = FaultInjection(),
+        seed: int = 0,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.latency = latency
+        self.faults = faults
+        self.clock = clock
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._window: deque[tuple[float, int]] = deque()
+        self.requests = 0
+        self.failed_requests = 0
+        self.rate_limited_requests = 0
+        self.tokens = 0
+
+    def _admit(self, tokens: int) -> tuple[float, bool]:
+        """Checks the rate limits and draws the latency and the outcome of a request."""
+        with self._lock:
+            now = self.clock()
+            while self._window and self._window[0][0] <= now - 60:
+                self._window.popleft()
+
+            used_tokens = sum(window_tokens for _, window_tokens in self._window)
+            over_requests = (
+                self.faults.requests_per_minute is not None and len(self._window) >= self.faults.requests_per_minute
+            )
+            over_tokens = self.faults.tokens_per_minute is not None and used_tokens + tokens > self.faults.tokens_per_minute
+            if over_requests or over_tokens:
+                self.rate_limited_requests += 1
+                retry_after = self._window[0][0] + 60 - now if self._window else 60.0
+                raise SimulatedRateLimitError(
+                    f"Rate limit exceeded: {len(self._window)} requests and {used_tokens} tokens in the last minute",
+                    retry_after=retry_after,
+                )
+
+            self._window.append((now, tokens))
+            self.requests += 1
+            self.tokens += tokens
+            delay = self.latency.sample(self._rng, tokens)
+            failed = self._rng.random() < self.faults.failure_rate
+            if failed:
+                self.failed_requests += 1
+            return delay, failed
+
+    def call(self, tokens: int) -> float:
+        """Simulates a request of `tokens` tokens and returns its latency."""
+        delay, failed = self._admit(tokens)
+        time.sleep(delay)
+        if failed:
+            raise SimulatedProviderError("Injected provider failure")
+        return delay
+
+    async def acall(self, tokens: int) -> float:
+        delay, failed = self._admit(tokens)
+        await asyncio.sleep(delay)
+        if failed:
+            raise SimulatedProviderError("Injected provider failure")
+        return delay
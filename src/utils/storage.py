@@ -20,5 +20,14 @@ class ArticleStorage:
     def load_all(self) -> pd.DataFrame:
         return pd.DataFrame(self.records)
 
+    def sections_with_metadata(self) -> tuple[list[str], list[dict[str, str]]]:
+        """Section contents and their article and section titles, ready for `VectorDB.insert_texts(..., metadata=...)`."""
+        texts = [record['Section Content'] for record in self.records]
+        metadata = [
+            {'Article Title': record['Article Title'], 'Section Title': record['Section Title']}
+            for record in self.records
+        ]
+        return texts, metadata
+
     def __len__(self):
         return len(self.records)
\ No newline at end of file
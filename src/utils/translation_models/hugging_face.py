@@ -1,5 +1,4 @@
 from enum import Enum
-from transformers import pipeline
 
 
 class HUGGING_FACE_TRANSLATOR_MODEL(Enum):
@@ -11,9 +10,15 @@ class Device(Enum):
 
 class TranslatorEnglishToPolish:
     def __init__(self, translation_model_name: HUGGING_FACE_TRANSLATOR_MODEL, device: Device=Device.CPU) -> None:
-        self.translation_pipeline = pipeline("translation", model=translation_model_name.value, device=device.value)
+        self.translation_model_name = translation_model_name
+        self.device = device
+        self.translation_pipeline = None
 
     def translate(self, text: str, max_completion_length=512) -> str:
+        if self.translation_pipeline is None:
+            from transformers import pipeline
+
+            self.translation_pipeline = pipeline("translation", model=self.translation_model_name.value, device=self.device.value)
         resp = self.translation_pipeline(text, max_completion_length)
 
         return resp
\ No newline at end of file
@@ -0,0 +1,125 @@
+"""Recall and latency of the index types against the exact (flat) baseline:
+
+    python -m utils.vectordb.index_benchmark --vectors 100000 --dimension 256
+"""
+
+import argparse
+import time
+from typing import TYPE_CHECKING
+
+import numpy as np
+from pydantic import BaseModel
+
+from utils.vectordb.index_spec import IndexSpec
+
+if TYPE_CHECKING:
+    import faiss  # type: ignore
+
+DEFAULT_SPECS = [
+    IndexSpec(kind="flat"),
+    IndexSpec(kind="ivf_flat", nprobe=8),
+    IndexSpec(kind="ivf_flat", nprobe=32),
+    IndexSpec(kind="ivf_flat", nprobe=128),
+    IndexSpec(kind="ivf_pq", nprobe=32),
+    IndexSpec(kind="hnsw", ef_search=64),
+    IndexSpec(kind="hnsw", ef_search=256),
+]
+
+
+def clustered_vectors(
+    number_of_vectors: int, dimension: int, number_of_clusters: int = 1000, noise: float = 1.8, seed: int = 0
+) -> np.ndarray:
+    """Unit vectors grouped around random centres, a stand-in for embeddings of texts on many topics.
+    With `noise` above 1 the clusters overlap, so nearest neighbours are often in other clusters."""
+    rng = np.random.default_rng(seed)
+    centres = rng.standard_normal((number_of_clusters, dimension), dtype=np.float32)
+    vectors = centres[rng.integers(number_of_clusters, size=number_of_vectors)]
+    vectors += noise * rng.standard_normal((number_of_vectors, dimension), dtype=np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+class IndexMeasurement(BaseModel, frozen=True):
+    spec: IndexSpec
+    recall_at_k: float
+    ms_per_query: float
+    size_mb: float
+    build_seconds: float
+
+
+def build_index(spec: IndexSpec, vectors: np.ndarray) -> "faiss.Index":
+    index = spec.build(vectors.shape[1])
+    if spec.requires_training:
+        index.train(vectors[: spec.effective_training_sample_size])
+    index.add(vectors)
+    return index
+
+
+def measure_index(
+    spec: IndexSpec, index: "faiss.Index", queries: np.ndarray, exact_neighbours: np.ndarray, build_seconds: float
+) -> IndexMeasurement:
+    """Fraction of the exact top-k neighbours found by the index, and its mean single-query latency."""
+    import faiss  # type: ignore
+
+    top_k = exact_neighbours.shape[1]
+    spec.apply_search_parameters(index)
+
+    neighbours = []
+    start_time = time.perf_counter()
+    for query in queries:
+        neighbours.append(index.search(query[None, :], top_k)[1][0])
+    ms_per_query = (time.perf_counter() - start_time) * 1000 / len(queries)
+
+    found = sum(len(np.intersect1d(row, exact)) for row, exact in zip(neighbours, exact_neighbours))
+    return IndexMeasurement(
+        spec=spec,
+        recall_at_k=found / exact_neighbours.size,
+        ms_per_query=ms_per_query,
+        size_mb=len(faiss.serialize_index(index)) / 2**20,
+        build_seconds=build_seconds,
+    )
+
+
+def compare_with_flat(
+    specs: list[IndexSpec], vectors: np.ndarray, queries: np.ndarray, top_k: int = 10
+) -> list[IndexMeasurement]:
+    import faiss  # type: ignore
+
+    exact_neighbours = faiss.knn(queries, vectors, top_k)[1]
+    # specs differing only in search parameters share the built index
+    built: dict[IndexSpec, tuple[faiss.Index, float]] = {}
+    measurements = []
+    for spec in specs:
+        build_spec = spec.model_copy(update={"nprobe": 1, "ef_search": 1})
+        if build_spec not in built:
+            start_time = time.perf_counter()
+            built[build_spec] = (build_index(spec, vectors), time.perf_counter() - start_time)
+        index, build_seconds = built[build_spec]
+        measurements.append(measure_index(spec, index, queries, exact_neighbours, build_seconds))
+    return measurements
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--vectors", type=int, default=100_000)
+    parser.add_argument("--queries", type=int, default=1000)
+    parser.add_argument("--dimension", type=int, default=256)
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--threads", type=int, default=1)
+    args = parser.parse_args()
+
+    import faiss  # type: ignore
+
+    faiss.omp_set_num_threads(args.threads)
+    data = clustered_vectors(args.vectors + args.queries, args.dimension)
+    measurements = compare_with_flat(DEFAULT_SPECS, data[args.queries :], data[: args.queries], args.top_k)
+    for measurement in measurements:
+        print(
+            f"{measurement.spec.factory_string():<16} nprobe={measurement.spec.nprobe:<4} "
+            f"ef_search={measurement.spec.ef_search:<4} recall@{args.top_k}={measurement.recall_at_k:.3f} "
+            f"{measurement.ms_per_query:.2f} ms/query {measurement.size_mb:.1f} MB "
+            f"built in {measurement.build_seconds:.1f} s"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""Types of faiss indices a `VectorIndex` can be built on.
+
+Recall@10 and latency against the exact (flat) baseline, measured with `python -m utils.vectordb.index_benchmark`
+on 100k clustered (overlapping clusters) 256-d unit vectors and 1k single-vector queries, one CPU thread:
+
+    index                                    recall@10  ms/query   MB         build (s)
+    flat                                     1.000      11.7       97.7       0.1
+    ivf_flat (nlist=1024, nprobe=8)          0.968      0.21       99.4       13.6
+    ivf_flat (nlist=1024, nprobe=32)         0.980      0.49       99.4       13.6
+    ivf_flat (nlist=1024, nprobe=128)        0.992      1.49       99.4       13.6
+    ivf_pq (nlist=1024, pq_m=32, nprobe=32)  0.486      0.29       5.1        98.2
+    hnsw (hnsw_m=32, ef_search=64)           0.984      0.70       123.6      172.4
+    hnsw (hnsw_m=32, ef_search=256)          0.995      2.23       123.6      172.4
+
+- flat scans every vector: exact, no training, latency grows linearly with the corpus.
+- ivf_flat scans only the `nprobe` closest of `nlist` clusters: the cheapest way to trade recall for speed,
+  tuned at search time with `nprobe`. Needs training.
+- ivf_pq additionally compresses vectors to `pq_m` bytes (8 bits per sub-quantizer): ~20x less memory
+  at the cost of recall, which more `nprobe` does not recover; re-rank its candidates exactly where recall matters.
+  Needs training, which is the slowest of the IVF variants.
+- hnsw walks a proximity graph: high recall at low latency without training, tuned with `ef_search`,
+  but the slowest to build, uses more memory than the vectors themselves and cannot remove entries.
+"""
+
+from typing import TYPE_CHECKING, Literal
+
+from pydantic import BaseModel, Field
+
+if TYPE_CHECKING:
+    import faiss  # type: ignore
+
+
+class IndexSpec(BaseModel, frozen=True):
+    kind: Literal["flat", "ivf_flat", "ivf_pq", "hnsw"] = "flat"
+    # IVF: number of clusters and how many of them are scanned per query
+    nlist: int = Field(default=1024, gt=0)
+    nprobe: int = Field(default=16, gt=0)
+    # PQ: bytes per vector (must divide the dimension)
+    pq_m: int = Field(default=32, gt=0)
+    # HNSW: neighbours per node and the size of the candidate lists while building and searching
+    hnsw_m: int = Field(default=32, gt=0)
+    ef_construction: int = Field(default=200, gt=0)
+    ef_search: int = Field(default=64, gt=0)
+    # vectors buffered before the index is trained, by default 39 per cluster as recommended by faiss
+    training_sample_size: int | None = Field(default=None, gt=0)
+
+    @property
+    def requires_training(self) -> bool:
+        return self.kind in ("ivf_flat", "ivf_pq")
+
+    @property
+    def min_training_size(self) -> int:
+        """Fewer vectors than this cannot be clustered."""
+        return max(self.nlist, 256) if self.kind == "ivf_pq" else self.nlist
+
+    @property
+    def effective_training_sample_size(self) -> int:
+        if self.training_sample_size is not None:
+            return max(self.training_sample_size, self.min_training_size)
+        return 39 * self.min_training_size
+
+    def factory_string(self) -> str:
+        if self.kind == "ivf_flat":
+            return f"IVF{self.nlist},Flat"
+        if self.kind == "ivf_pq":
+            return f"IVF{self.nlist},PQ{self.pq_m}x8"
+        if self.kind == "hnsw":
+            return f"HNSW{self.hnsw_m},Flat"
+        return "Flat"
+
+    def build(self, dimension: int) -> "faiss.Index":
+        import faiss  # type: ignore
+
+        if self.kind == "ivf_pq" and dimension % self.pq_m:
+            raise ValueError(f"pq_m={self.pq_m} must divide the dimension {dimension}")
+
+        index = faiss.index_factory(dimension, self.factory_string(), faiss.METRIC_L2)
+        if self.kind == "hnsw":
+            index.hnsw.efConstruction = self.ef_construction
+        self.apply_search_parameters(index)
+        return index
+
+    def apply_search_parameters(self, index: "faiss.Index") -> None:
+        """Sets `nprobe` (IVF) or `efSearch` (HNSW) of the spec on the index."""
+        import faiss  # type: ignore
+
+        parameters = faiss.ParameterSpace()
+        if self.kind in ("ivf_flat", "ivf_pq"):
+            parameters.set_index_parameter(index, "nprobe", self.nprobe)
+        elif self.kind == "hnsw":
+            parameters.set_index_parameter(index, "efSearch", self.ef_search)
+
+    def search_parameters(self, index: "faiss.Index", selector: "faiss.IDSelector") -> "faiss.SearchParameters":
+        """Parameters restricting a search to the ids accepted by `selector`, keeping the index's current
+        `nprobe`/`efSearch` (parameters passed to `search` replace the ones set on the index)."""
+        import faiss  # type: ignore
+
+        if self.kind in ("ivf_flat", "ivf_pq"):
+            return faiss.SearchParametersIVF(sel=selector, nprobe=faiss.extract_index_ivf(index).nprobe)
+        if self.kind == "hnsw":
+            return faiss.SearchParametersHNSW(sel=selector, efSearch=index.hnsw.efSearch)
+        return faiss.SearchParameters(sel=selector)
@@ -0,0 +1,72 @@
+import json
+from collections.abc import Mapping
+from pathlib import Path
+from typing import Iterator
+
+import numpy as np
+
+TEXTS_FILE_NAME = "texts.bin"
+OFFSETS_FILE_NAME = "text_offsets.npy"
+
+
+def write_texts(path: Path, texts: list[str]) -> None:
+    """Writes the texts as one UTF-8 blob and the int64 offsets of their boundaries (one more than texts)."""
+    encoded = [text.encode("utf-8") for text in texts]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum([len(data) for data in encoded], out=offsets[1:])
+    with open(path / TEXTS_FILE_NAME, "wb") as file:
+        for data in encoded:
+            file.write(data)
+    np.save(path / OFFSETS_FILE_NAME, offsets)
+
+
+class MemoryMappedTexts(Mapping[int, str]):
+    """Read-only id -> text mapping over files written by `write_texts`. Texts are decoded on access,
+    so opening it is instant and processes mapping the same files share them in the page cache."""
+
+    def __init__(self, path: Path) -> None:
+        self.offsets = np.load(path / OFFSETS_FILE_NAME, mmap_mode="r")
+        size = int(self.offsets[-1])
+        # np.memmap cannot map empty files
+        self.data = np.memmap(path / TEXTS_FILE_NAME, dtype=np.uint8, mode="r") if size else np.empty(0, np.uint8)
+
+    def __getitem__(self, position: int) -> str:
+        if not 0 <= position < len(self):
+            raise KeyError(position)
+        start, end = self.offsets[position], self.offsets[position + 1]
+        return self.data[start:end].tobytes().decode("utf-8")
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def __iter__(self) -> Iterator[int]:
+        return iter(range(len(self)))
+
+
+def read_texts(path: Path) -> dict[int, str]:
+    return dict(MemoryMappedTexts(path))
+
+
+class MemoryMappedMetadata(Mapping[int, dict[str, str]]):
+    """Read-only id -> metadata mapping over metadata written as JSON texts by `write_texts`."""
+
+    def __init__(self, path: Path) -> None:
+        self.texts = MemoryMappedTexts(path)
+
+    def __getitem__(self, position: int) -> dict[str, str]:
+        return json.loads(self.texts[position])
+
+    def __len__(self) -> int:
+        return len(self.texts)
+
+    def __iter__(self) -> Iterator[int]:
+        return iter(self.texts)
+
+
+def write_text_metadata(path: Path, metadata: list[dict[str, str]]) -> None:
+    path.mkdir(parents=True, exist_ok=True)
+    write_texts(path, [json.dumps(item, ensure_ascii=False) for item in metadata])
+
+
+def read_text_metadata(path: Path) -> dict[int, dict[str, str]]:
+    return dict(MemoryMappedMetadata(path))
@@ -1,40 +1,284 @@
-import faiss  # type: ignore
+import os
+import shutil
+from pathlib import Path
+from typing import Callable
+
 import numpy as np
+from pydantic import BaseModel
+from tqdm.auto import tqdm
 
 from utils.embedding_models import tokenizer
-from utils.embedding_models.schema import EmbeddingModel
+from utils.embedding_models.deduplication import deduplicate
+from utils.embedding_models.schema import EmbeddingModel, EmbeddingModelInfo
+from utils.vectordb.index_spec import IndexSpec
+from utils.vectordb.text_store import (
+    MemoryMappedMetadata,
+    MemoryMappedTexts,
+    read_text_metadata,
+    read_texts,
+    write_text_metadata,
+    write_texts,
+)
+
+DEFAULT_INSERT_BATCH_SIZE = 1024
+
+FORMAT_VERSION = 1
+MANIFEST_FILE_NAME = "manifest.json"
+METADATA_FILE_NAME = "metadata.json"
+INDEX_FILE_NAME = "index.faiss"
+TRAINING_BUFFER_FILE_NAME = "training_buffer.npy"
+TEXT_METADATA_DIRECTORY = "text_metadata"
+
+
+class SearchResult(BaseModel, frozen=True):
+    id: int
+    text: str
+    # squared L2 distance; for unit vectors 2 - 2 * cosine similarity
+    distance: float
+    metadata: dict[str, str] = {}
+
+
+class IndexMetadata(BaseModel, frozen=True):
+    model_info: EmbeddingModelInfo
+    index_spec: IndexSpec
+    size: int
+
+
+class VectorDBManifest(BaseModel, frozen=True):
+    format_version: int
+    # index name -> directory relative to the saved DB
+    indices: dict[str, str]
+
+
+def _mmap_flags() -> int:
+    import faiss  # type: ignore
+
+    # IO_FLAG_MMAP_IFC maps the file in place (zero-copy); IO_FLAG_MMAP of older faiss versions
+    # still reads flat and HNSW indices fully into memory
+    if not hasattr(faiss, "IO_FLAG_MMAP_IFC"):
+        raise RuntimeError(
+            f"faiss {faiss.__version__} cannot memory-map indices, upgrade to faiss-cpu>=1.11.0 or load with mmap=False"
+        )
+    return faiss.IO_FLAG_MMAP_IFC | faiss.IO_FLAG_READ_ONLY
 
 
 class VectorIndex:
+    """Texts and their embeddings in a faiss index of the type given by `index_spec`.
+
+    Indices that need training (IVF) buffer the inserted vectors until `training_sample_size` of them
+    are collected, then are trained on them; until then queries are answered exactly from the buffer.
+    `train` trains on the buffered vectors straight away.
+
+    Indices loaded with `mmap=True` are read-only."""
 
-    def __init__(self, embedding_model: EmbeddingModel) -> None:
-        self.index = faiss.IndexFlatL2(embedding_model.model_info.dimension)
+    def __init__(self, embedding_model: EmbeddingModel, index_spec: IndexSpec = IndexSpec()) -> None:
+        self.index_spec = index_spec
+        self.index = index_spec.build(embedding_model.model_info.effective_dimension)
         self.tokenizer = tokenizer
         self.embedding_model = embedding_model
-        self.indexed_texts: dict[int, str] = {}
+        self.indexed_texts: dict[int, str] | MemoryMappedTexts = {}
+        self.text_metadata: dict[int, dict[str, str]] | MemoryMappedMetadata = {}
+        # (key, value) -> ids of the texts with that metadata, built on the first filtered search
+        self._postings: dict[tuple[str, str], list[int]] | None = None
+        self.training_buffer: list[np.ndarray] = []
+        self.read_only = False
 
     def embed_text(self, text: str) -> np.ndarray:
-        embedding = self.embedding_model.embed([text])
-        embedding_vector = np.array(embedding.embeddings[0]).reshape(1, -1)
-        return embedding_vector
+        return self.embedding_model.embed([text]).vectors
+
+    def _check_writable(self):
+        if self.read_only:
+            raise ValueError("The index was loaded memory-mapped and is read-only")
+
+    def _add(self, texts: list[str], vectors: np.ndarray, metadata: list[dict[str, str]] | None = None):
+        self._check_writable()
+        for position, text in enumerate(texts, start=self.size()):
+            self.indexed_texts[position] = text
+        for position, item in enumerate(metadata or [], start=self.size()):
+            self.text_metadata[position] = item
+            if self._postings is not None:
+                for key, value in item.items():
+                    self._postings.setdefault((key, value), []).append(position)
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        if self.index.is_trained:
+            self.index.add(vectors)  # type: ignore
+            return
+        self.training_buffer.append(vectors)
+        if self._buffered() >= self.index_spec.effective_training_sample_size:
+            self.train()
+
+    def _buffered(self) -> int:
+        return sum(len(vectors) for vectors in self.training_buffer)
+
+    def train(self):
+        if self.index.is_trained:
+            return
+        self._check_writable()
+        if self._buffered() < self.index_spec.min_training_size:
+            raise ValueError(
+                f"Training {self.index_spec.kind} needs at least {self.index_spec.min_training_size} vectors, "
+                f"{self._buffered()} inserted"
+            )
+        vectors = np.concatenate(self.training_buffer)
+        self.index.train(vectors)  # type: ignore
+        self.index.add(vectors)  # type: ignore
+        self.training_buffer = []
+
+    def tune(self, nprobe: int | None = None, ef_search: int | None = None):
+        """Changes the search-time parameters: `nprobe` of IVF indices or `ef_search` of HNSW.
+        The new values are kept in `index_spec`, so they are saved with the index."""
+        update = {name: value for name, value in [("nprobe", nprobe), ("ef_search", ef_search)] if value is not None}
+        self.index_spec = self.index_spec.model_validate({**self.index_spec.model_dump(), **update})
+        self.index_spec.apply_search_parameters(self.index)
+
+    def _selected_ids(self, where: dict[str, str]) -> np.ndarray:
+        """Ids of the texts whose metadata has all the given values."""
+        if self._postings is None:
+            self._postings = {}
+            for position, item in self.text_metadata.items():
+                for key, value in item.items():
+                    self._postings.setdefault((key, value), []).append(position)
+
+        selected: np.ndarray | None = None
+        for key, value in where.items():
+            ids = np.asarray(self._postings.get((key, value), []), dtype=np.int64)
+            selected = ids if selected is None else np.intersect1d(selected, ids, assume_unique=True)
+        return selected if selected is not None else np.arange(self.size(), dtype=np.int64)
 
-    def insert_texts(self, texts: list[str]):
-        for text in texts:
-            self.insert_text(text)
+    def _search(
+        self, vectors: np.ndarray, top_k: int, ids: np.ndarray | None = None
+    ) -> tuple[np.ndarray, np.ndarray]:
+        """Distances and ids of the `top_k` nearest vectors, only among `ids` if given."""
+        import faiss  # type: ignore
 
-    def insert_text(self, text: str):
-        self.indexed_texts[self.index.ntotal] = text
-        self.index.add(self.embed_text(text))  # type: ignore
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        if self.training_buffer:
+            buffered = np.concatenate(self.training_buffer)
+            if ids is None:
+                return faiss.knn(vectors, buffered, top_k)
+            distances, positions = faiss.knn(vectors, np.ascontiguousarray(buffered[ids]), top_k)
+            return distances, np.where(positions >= 0, ids[positions], -1)
+        if ids is None:
+            return self.index.search(vectors, k=top_k)  # type: ignore
+        # faiss skips the vectors the selector rejects instead of scoring them and filtering afterwards
+        selector = faiss.IDSelectorBatch(ids)
+        params = self.index_spec.search_parameters(self.index, selector)
+        return self.index.search(vectors, k=top_k, params=params)  # type: ignore
+
+    def insert_texts(
+        self,
+        texts: list[str],
+        batch_size: int = DEFAULT_INSERT_BATCH_SIZE,
+        show_progress: bool = False,
+        metadata: list[dict[str, str]] | None = None,
+    ):
+        """Embeds the texts `batch_size` at a time (duplicates within a batch only once) and adds
+        every batch to the index as one matrix, so memory stays bounded by a single batch.
+        `metadata` (e.g. article and section titles) is attached to the texts one to one."""
+        if batch_size < 1:
+            raise ValueError("batch_size must be a positive integer")
+        if metadata is not None and len(metadata) != len(texts):
+            raise ValueError(f"Got metadata for {len(metadata)} of {len(texts)} texts")
+        with tqdm(total=len(texts), desc="Indexed texts", unit="text", disable=not show_progress) as progress:
+            for start in range(0, len(texts), batch_size):
+                batch = texts[start : start + batch_size]
+                unique_texts, inverse = deduplicate(batch)
+                batch_metadata = metadata[start : start + batch_size] if metadata is not None else None
+                self._add(batch, self.embedding_model.embed(unique_texts).vectors[inverse], batch_metadata)
+                progress.update(len(batch))
+
+    def insert_text(self, text: str, metadata: dict[str, str] | None = None):
+        self._add([text], self.embed_text(text), [metadata] if metadata is not None else None)
 
     def size(self) -> int:
-        return self.index.ntotal
+        return self.index.ntotal + self._buffered()
 
     def find_text(self, text: str, top_k: int) -> list[str]:
-        text_indices = self.index.search(self.embed_text(text), k=top_k)[1][0]  # type: ignore
-        result = [
-            self.indexed_texts[int(index)] for index in text_indices if index >= 0
+        return self.find_texts([text], top_k)[0]
+
+    def find_texts(self, queries: list[str], top_k: int) -> list[list[str]]:
+        return [[result.text for result in results] for results in self.search(queries, top_k)]
+
+    def search(
+        self, queries: list[str], top_k: int, where: dict[str, str] | None = None
+    ) -> list[list[SearchResult]]:
+        """Embeds all queries in one call (duplicates once) and searches them in one multi-row `index.search`,
+        which faiss parallelizes over the queries. Returns the results of every query in order.
+
+        `where` restricts the search to texts with all the given metadata values before it runs,
+        through a faiss `IDSelectorBatch`. IVF indices only see the selected texts of the `nprobe` clusters
+        they scan, so very selective filters may need a higher `nprobe`."""
+        if not queries:
+            return []
+        ids = self._selected_ids(where) if where else None
+        if ids is not None and len(ids) == 0:
+            return [[] for _ in queries]
+
+        unique_queries, inverse = deduplicate(queries)
+        distances, text_ids = self._search(self.embedding_model.embed(unique_queries).vectors, top_k, ids)
+        results = [
+            [
+                SearchResult(
+                    id=int(text_id),
+                    text=self.indexed_texts[int(text_id)],
+                    distance=float(distance),
+                    metadata=self.text_metadata.get(int(text_id), {}),
+                )
+                for distance, text_id in zip(row_distances, row_ids)
+                if text_id >= 0
+            ]
+            for row_distances, row_ids in zip(distances, text_ids)
         ]
-        return result
+        return [results[i] for i in inverse]
+
+    def save(self, path: Path):
+        import faiss  # type: ignore
+
+        path.mkdir(parents=True, exist_ok=True)
+        faiss.write_index(self.index, str(path / INDEX_FILE_NAME))
+        if self.training_buffer:
+            np.save(path / TRAINING_BUFFER_FILE_NAME, np.concatenate(self.training_buffer))
+        write_texts(path, [self.indexed_texts[position] for position in range(self.size())])
+        write_text_metadata(
+            path / TEXT_METADATA_DIRECTORY, [self.text_metadata.get(position, {}) for position in range(self.size())]
+        )
+        metadata = IndexMetadata(
+            model_info=self.embedding_model.model_info, index_spec=self.index_spec, size=self.size()
+        )
+        (path / METADATA_FILE_NAME).write_text(metadata.model_dump_json(indent=2))
+
+    @staticmethod
+    def read_metadata(path: Path) -> IndexMetadata:
+        return IndexMetadata.model_validate_json((path / METADATA_FILE_NAME).read_text())
+
+    @classmethod
+    def load(cls, path: Path, embedding_model: EmbeddingModel, mmap: bool = False) -> "VectorIndex":
+        """Loads an index saved with `save`. The embedding model must be the one the index was built with.
+        With `mmap=True` the faiss index and the texts are memory-mapped read-only instead of read into memory."""
+        import faiss  # type: ignore
+
+        metadata = cls.read_metadata(path)
+        if embedding_model.model_info != metadata.model_info:
+            raise ValueError(
+                f"The index at {path} was built with {metadata.model_info}, not {embedding_model.model_info}"
+            )
+
+        vector_index = cls(embedding_model, metadata.index_spec)
+        vector_index.index = faiss.read_index(str(path / INDEX_FILE_NAME), _mmap_flags() if mmap else 0)
+        metadata.index_spec.apply_search_parameters(vector_index.index)
+        vector_index.indexed_texts = MemoryMappedTexts(path) if mmap else read_texts(path)
+        metadata_path = path / TEXT_METADATA_DIRECTORY
+        if metadata_path.exists():
+            vector_index.text_metadata = (
+                MemoryMappedMetadata(metadata_path) if mmap else read_text_metadata(metadata_path)
+            )
+        if (path / TRAINING_BUFFER_FILE_NAME).exists():
+            vector_index.training_buffer = [np.load(path / TRAINING_BUFFER_FILE_NAME, mmap_mode="r" if mmap else None)]
+        vector_index.read_only = mmap
+
+        if vector_index.size() != metadata.size or len(vector_index.indexed_texts) != metadata.size:
+            raise ValueError(f"The index at {path} is incomplete: expected {metadata.size} vectors and texts")
+        return vector_index
 
 
 class VectorDB:
@@ -42,17 +286,72 @@ class VectorDB:
     def __init__(self) -> None:
         self.indices: dict[str, VectorIndex] = {}
 
-    def add_index(self, index_name: str, embedding_model: EmbeddingModel):
-        self.indices[index_name] = VectorIndex(embedding_model)
+    def add_index(self, index_name: str, embedding_model: EmbeddingModel, index_spec: IndexSpec = IndexSpec()):
+        self.indices[index_name] = VectorIndex(embedding_model, index_spec)
 
     def list_indices(self) -> list[str]:
         return list(self.indices.keys())
 
-    def insert_text(self, text: str, index_name: str):
-        self.indices[index_name].insert_text(text)
+    def insert_text(self, text: str, index_name: str, metadata: dict[str, str] | None = None):
+        self.indices[index_name].insert_text(text, metadata)
 
-    def insert_texts(self, texts: list[str], index_name: str):
-        self.indices[index_name].insert_texts(texts)
+    def insert_texts(
+        self,
+        texts: list[str],
+        index_name: str,
+        batch_size: int = DEFAULT_INSERT_BATCH_SIZE,
+        show_progress: bool = False,
+        metadata: list[dict[str, str]] | None = None,
+    ):
+        self.indices[index_name].insert_texts(
+            texts, batch_size=batch_size, show_progress=show_progress, metadata=metadata
+        )
 
     def find_text(self, text: str, top_k: int, index_name: str) -> list[str]:
         return self.indices[index_name].find_text(text, top_k)
+
+    def find_texts(self, queries: list[str], top_k: int, index_name: str) -> list[list[str]]:
+        return self.indices[index_name].find_texts(queries, top_k)
+
+    def search(
+        self, queries: list[str], top_k: int, index_name: str, where: dict[str, str] | None = None
+    ) -> list[list[SearchResult]]:
+        return self.indices[index_name].search(queries, top_k, where)
+
+    def save(self, path: Path):
+        """Saves every index (faiss index, texts, model info and index spec) under `path`, replacing
+        a DB saved there before. The DB is written next to `path` first and then moved in place."""
+        if path.exists() and any(path.iterdir()) and not (path / MANIFEST_FILE_NAME).exists():
+            raise ValueError(f"{path} is not empty and does not hold a saved VectorDB")
+
+        staging_path = path.with_name(f".{path.name}.tmp")
+        shutil.rmtree(staging_path, ignore_errors=True)
+        staging_path.mkdir(parents=True)
+        manifest = VectorDBManifest(
+            format_version=FORMAT_VERSION,
+            indices={index_name: f"indices/{i}" for i, index_name in enumerate(self.indices)},
+        )
+        for index_name, directory in manifest.indices.items():
+            self.indices[index_name].save(staging_path / directory)
+        (staging_path / MANIFEST_FILE_NAME).write_text(manifest.model_dump_json(indent=2))
+
+        if path.exists():
+            shutil.rmtree(path)
+        os.replace(staging_path, path)
+
+    @classmethod
+    def load(
+        cls, path: Path, init_model: Callable[[EmbeddingModelInfo], EmbeddingModel], mmap: bool = False
+    ) -> "VectorDB":
+        """Loads a DB saved with `save`; `init_model` creates the embedding model of every index from
+        its saved model info. See `VectorIndex.load` for `mmap`."""
+        manifest = VectorDBManifest.model_validate_json((path / MANIFEST_FILE_NAME).read_text())
+        if manifest.format_version != FORMAT_VERSION:
+            raise ValueError(f"Unsupported VectorDB format version {manifest.format_version}")
+
+        vector_db = cls()
+        for index_name, directory in manifest.indices.items():
+            index_path = path / directory
+            embedding_model = init_model(VectorIndex.read_metadata(index_path).model_info)
+            vector_db.indices[index_name] = VectorIndex.load(index_path, embedding_model, mmap=mmap)
+        return vector_db
@@ -1,12 +1,15 @@
 import os
 import unittest
 
+import numpy as np
+
 from dotenv import load_dotenv
 
 from utils.embedding_models.caching import CachedEmbeddingModel
 from utils.embedding_models.monitoring import EmbeddingModelWithMonitoring
 from utils.embedding_models.providers import supported_models
 from utils.embedding_models.providers.hugging_face import HFEmbeddingModel
+from utils.embedding_models.providers.onnx_runtime import ONNXEmbeddingModel
 from utils.embedding_models.providers.open_ai import OpenAIEmbeddingModel
 from utils.vectordb.vectordb import VectorIndex
 
@@ -63,3 +66,16 @@ class CalculatingAndStoringEmbeddingsTestCase(unittest.TestCase):
 
         found = vector_db.find_text("To jest pierwszy tekst", top_k=1)
         self.assertEqual(found, ["To jest pierwszy tekst testowy"])
+
+    @unittest.skip("Integration test for ONNX Runtime inference of Hugging Face models")
+    def test_onnx_embeddings_match_hugging_face_embeddings(self):
+
+        texts = ["To jest pierwszy tekst testowy", "Kot siedzi na macie", "Warszawa jest stolica Polski"]
+        for model_info in [
+            supported_models.ST_POLISH_PARAPHRASE_FROM_MPNET,
+            supported_models.ORB_ST_POLISH_KARTONBERTA_BASE_ALPHA_V1,
+        ]:
+            expected = HFEmbeddingModel(model_info, device="cpu").embed(texts).embeddings
+            embeddings = ONNXEmbeddingModel(model_info).embed(texts).embeddings
+
+            np.testing.assert_allclose(embeddings, expected, atol=1e-4)
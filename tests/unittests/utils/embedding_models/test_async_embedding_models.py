@@ -0,0 +1,166 @@
+import asyncio
+import base64
+import json
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+import numpy as np
+
+from utils.embedding_models.caching import AsyncCachedEmbeddingModel
+from utils.embedding_models.monitoring import AsyncEmbeddingModelWithMonitoring
+from utils.embedding_models.providers.open_ai import AsyncOpenAIEmbeddingModel, init_async_model, init_model
+from utils.embedding_models.request_packing import MAX_INPUTS_PER_REQUEST
+from utils.embedding_models.schema import EmbeddingModelInfo
+
+
+class StubEmbeddingsServer(ThreadingHTTPServer):
+    """Local stand-in for the OpenAI embeddings endpoint: embeds a text as [len(text), 1, 0]
+    (shortened to `dimensions` when requested) and records how many requests were in flight at the same time."""
+
+    def __init__(self, response_delay: float) -> None:
+        super().__init__(("127.0.0.1", 0), StubEmbeddingsHandler)
+        self.response_delay = response_delay
+        self.lock = threading.Lock()
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.requests: list[list[str]] = []
+        self.request_bodies: list[dict] = []
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}/v1"
+
+
+class StubEmbeddingsHandler(BaseHTTPRequestHandler):
+    server: StubEmbeddingsServer
+
+    def log_message(self, format, *args) -> None:
+        pass
+
+    def do_POST(self) -> None:
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        with self.server.lock:
+            self.server.in_flight += 1
+            self.server.max_in_flight = max(self.server.max_in_flight, self.server.in_flight)
+            self.server.requests.append(body["input"])
+            self.server.request_bodies.append(body)
+
+        time.sleep(self.server.response_delay)
+
+        data = []
+        for i, text in enumerate(body["input"]):
+            embedding = np.array([len(text), 1.0, 0.0], dtype=np.float32)[: body.get("dimensions")]
+            if body.get("encoding_format") == "base64":
+                encoded = base64.b64encode(embedding.tobytes()).decode("ascii")
+            else:
+                encoded = embedding.tolist()
+            data.append({"object": "embedding", "index": i, "embedding": encoded})
+        tokens = sum(len(text.split()) for text in body["input"])
+        payload = json.dumps({
+            "object": "list",
+            "data": data,
+            "model": body["model"],
+            "usage": {"prompt_tokens": tokens, "total_tokens": tokens},
+        }).encode("utf-8")
+
+        with self.server.lock:
+            self.server.in_flight -= 1
+
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+
+class AsyncEmbeddingModelsTestCase(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self) -> None:
+        self.server = StubEmbeddingsServer(response_delay=0.05)
+        self.server_thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.server_thread.start()
+        self.temp_dir = tempfile.mkdtemp()
+        self.model_info = EmbeddingModelInfo(model_name="stub-embedding", dimension=3, cost_per_mln_tokens=1.0)
+
+    def tearDown(self) -> None:
+        self.server.shutdown()
+        self.server.server_close()
+        shutil.rmtree(self.temp_dir)
+
+    def _model(self, max_concurrency: int, output_dimension: int | None = None) -> AsyncOpenAIEmbeddingModel:
+        return AsyncOpenAIEmbeddingModel(
+            api_key="test",
+            model_info=self.model_info.with_output_dimension(output_dimension),
+            max_concurrency=max_concurrency,
+            base_url=self.server.base_url,
+        )
+
+    async def test_embed(self):
+        resp = await self._model(max_concurrency=1).embed(["ab", "abc def"])
+
+        self.assertEqual(resp.embeddings, [[2.0, 1.0, 0.0], [7.0, 1.0, 0.0]])
+        self.assertEqual(resp.promt_tokens, 3)
+
+    async def test_concurrency_is_bounded(self):
+        model = self._model(max_concurrency=3)
+
+        await asyncio.gather(*(model.embed([f"text {i}"]) for i in range(9)))
+
+        self.assertEqual(len(self.server.requests), 9)
+        self.assertEqual(self.server.max_in_flight, 3)
+
+    async def test_cached_and_monitored_model(self):
+        cached_model = AsyncCachedEmbeddingModel(
+            model=self._model(max_concurrency=4), path_to_cache=Path(self.temp_dir), batch_size=2
+        )
+        model = AsyncEmbeddingModelWithMonitoring(model=cached_model)
+        texts = [f"text number {i}" for i in range(8)]
+
+        resp = await model.embed(texts)
+
+        self.assertEqual(len(self.server.requests), 4)
+        self.assertGreater(self.server.max_in_flight, 1)
+        self.assertEqual(resp.embeddings, [[float(len(text)), 1.0, 0.0] for text in texts])
+        self.assertEqual(model.promt_tokens, 24)
+
+        resp = await model.embed(texts[::-1])
+
+        self.assertEqual(len(self.server.requests), 4)
+        self.assertEqual(resp.embeddings, [[float(len(text)), 1.0, 0.0] for text in texts[::-1]])
+        self.assertEqual(model.promt_tokens, 48)
+        self.assertAlmostEqual(model.get_total_cost(), 48 / 1_000_000)
+
+    async def test_shortened_embeddings_are_cached_apart(self):
+        full_model = AsyncCachedEmbeddingModel(model=self._model(max_concurrency=1), path_to_cache=Path(self.temp_dir))
+        short_model = AsyncCachedEmbeddingModel(
+            model=self._model(max_concurrency=1, output_dimension=2), path_to_cache=Path(self.temp_dir)
+        )
+
+        full = await full_model.embed(["ab"])
+        short = await short_model.embed(["ab"])
+
+        self.assertEqual(full.embeddings, [[2.0, 1.0, 0.0]])
+        self.assertEqual(short.embeddings, [[2.0, 1.0]])
+        self.assertNotIn("dimensions", self.server.request_bodies[0])
+        self.assertEqual(self.server.request_bodies[1]["dimensions"], 2)
+        self.assertEqual((await short_model.embed(["ab"])).cached_items, 1)
+        self.assertEqual(len(self.server.requests), 2)
+
+    def test_factories_hand_over_request_sized_batches(self):
+        for factory in [init_model, init_async_model]:
+            model = factory(api_key="test", model_info=self.model_info, path_to_cache=Path(self.temp_dir))
+
+            self.assertEqual(model.model.batch_size, MAX_INPUTS_PER_REQUEST)
+
+    def test_output_dimension_is_validated(self):
+        self.assertEqual(self.model_info.with_output_dimension(2).effective_dimension, 2)
+        self.assertEqual(self.model_info.with_output_dimension(2).cache_prefix, "stub-embedding_2d")
+        self.assertEqual(self.model_info.cache_prefix, "stub-embedding")
+        with self.assertRaises(ValueError):
+            self.model_info.with_output_dimension(4)
+
@@ -0,0 +1,88 @@
+import sys
+import unittest
+from unittest import mock
+
+import matplotlib
+
+matplotlib.use("Agg")
+
+from utils.embedding_models.benchmark import (
+    PeakRSSSampler,
+    benchmark_model,
+    default_model_factory,
+    draw_benchmark_charts,
+    run_benchmarks,
+    supported_embedding_models,
+    synthetic_polish_corpus,
+)
+from utils.embedding_models.providers import supported_models
+from utils.embedding_models.providers.fake import FakeEmbeddingModel
+from utils.embedding_models.schema import EmbeddingModelInfo, GenericEmbeddingResponse
+
+
+class MockedEmbeddingModel:
+    def __init__(self, model_name: str = "test_model") -> None:
+        self.embedded_texts: list[list[str]] = []
+        self.model_info = EmbeddingModelInfo(model_name=model_name, dimension=2, cost_per_mln_tokens=2)
+
+    def embed(self, texts: list[str]) -> GenericEmbeddingResponse:
+        self.embedded_texts.append(texts)
+        return GenericEmbeddingResponse(
+            embeddings=[[len(text), 1] for text in texts], promt_tokens=len(texts), time_to_generate=0
+        )
+
+
+class BenchmarkTestCase(unittest.TestCase):
+
+    def test_corpus_is_deterministic_polish_text(self):
+        corpus = synthetic_polish_corpus(50, seed=1)
+
+        self.assertEqual(corpus, synthetic_polish_corpus(50, seed=1))
+        self.assertNotEqual(corpus, synthetic_polish_corpus(50, seed=2))
+        self.assertEqual(len(corpus), 50)
+        self.assertTrue(any(character in "ąćęłńóśźż" for text in corpus for character in text))
+        self.assertGreater(max(map(len, corpus)), 5 * min(map(len, corpus)))
+
+    def test_benchmark_model(self):
+        model = MockedEmbeddingModel()
+
+        results = benchmark_model(model, synthetic_polish_corpus(10), batch_sizes=[1, 4])
+
+        self.assertEqual([result.batch_size for result in results], [1, 4])
+        # one warm-up batch and then the whole corpus, for each batch size
+        self.assertEqual([len(texts) for texts in model.embedded_texts], [1] * 11 + [4, 4, 4, 2])
+        for result in results:
+            self.assertEqual(result.promt_tokens, 10)
+            self.assertAlmostEqual(result.total_cost, 10 * 2 / 1_000_000)
+            self.assertGreater(result.items_per_second, 0)
+            self.assertGreater(result.peak_rss_mb, 0)
+            self.assertLessEqual(result.latency_p50_seconds, result.latency_p99_seconds)
+
+    def test_rss_without_proc_and_resource(self):
+        # e.g. Windows: neither /proc nor the POSIX-only resource module
+        with mock.patch("builtins.open", side_effect=OSError), mock.patch.dict(sys.modules, {"resource": None}):
+            self.assertEqual(PeakRSSSampler.current_rss_bytes(), 0)
+        with mock.patch("builtins.open", side_effect=OSError):
+            self.assertGreater(PeakRSSSampler.current_rss_bytes(), 0)
+
+    def test_remote_models_are_replaced_by_fakes(self):
+        init_model = default_model_factory(api_key=None)
+
+        model = init_model(supported_models.TEXT_EMBEDDING_3_LARGE_256)
+
+        self.assertIsInstance(model, FakeEmbeddingModel)
+        self.assertEqual(model.model_info.effective_dimension, 256)
+        self.assertIn(supported_models.TEXT_EMBEDDING_3_SMALL, supported_embedding_models())
+
+    def test_charts(self):
+        results = run_benchmarks(
+            [MockedEmbeddingModel("model_a").model_info, MockedEmbeddingModel("model_b").model_info],
+            init_model=lambda model_info: MockedEmbeddingModel(model_info.model_name),
+            corpus=synthetic_polish_corpus(8),
+            batch_sizes=[1, 8],
+        )
+
+        figures = draw_benchmark_charts(results, metrics=["items_per_second", "peak_rss_mb"])
+
+        self.assertEqual(len(results), 4)
+        self.assertEqual(len(figures), 2)
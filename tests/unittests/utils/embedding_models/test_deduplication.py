@@ -0,0 +1,48 @@
+import shutil
+import tempfile
+import unittest
+from pathlib import Path
+
+from utils.embedding_models.caching import CachedEmbeddingModel
+from utils.embedding_models.deduplication import DeduplicatingEmbeddingModel, deduplicate
+from utils.embedding_models.schema import EmbeddingModelInfo, GenericEmbeddingResponse
+
+
+class MockedEmbeddingModel:
+    def __init__(self) -> None:
+        self.embedded_texts: list[list[str]] = []
+        self.model_info = EmbeddingModelInfo(model_name="test_model", dimension=2, cost_per_mln_tokens=0.1)
+
+    def embed(self, texts: list[str]) -> GenericEmbeddingResponse:
+        self.embedded_texts.append(texts)
+        return GenericEmbeddingResponse(
+            embeddings=[[len(text), 1] for text in texts], promt_tokens=len(texts), time_to_generate=1
+        )
+
+
+class DeduplicationTestCase(unittest.TestCase):
+
+    def test_deduplicate(self):
+        unique_texts, inverse = deduplicate(["Main", "a", "Main", "bb", "a"])
+
+        self.assertEqual(unique_texts, ["Main", "a", "bb"])
+        self.assertEqual(inverse.tolist(), [0, 1, 0, 2, 1])
+        self.assertEqual(deduplicate([])[0], [])
+
+    def test_each_unique_text_is_embedded_once(self):
+        underlying_model = MockedEmbeddingModel()
+        model = DeduplicatingEmbeddingModel(underlying_model)
+
+        resp = model.embed(["Main", "abc", "Main", "Main"])
+
+        self.assertEqual(underlying_model.embedded_texts, [["Main", "abc"]])
+        self.assertEqual(resp.embeddings, [[4, 1], [3, 1], [4, 1], [4, 1]])
+        self.assertEqual(resp.promt_tokens, 2)
+
+    def test_cache_hits_are_reported_for_every_input(self):
+        temp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, temp_dir)
+        model = DeduplicatingEmbeddingModel(CachedEmbeddingModel(MockedEmbeddingModel(), path_to_cache=Path(temp_dir)))
+
+        self.assertEqual(model.embed(["Main", "abc", "Main", "Main"]).cached_items, 0)
+        self.assertEqual(model.embed(["Main", "abc", "Main", "Main"]).cached_items, 4)
@@ -0,0 +1,184 @@
+import shutil
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+import numpy as np
+
+from utils.caching import CachePolicy, FileBasedTextCache, SQLiteTextCache
+from utils.embedding_models.embedding_store import (
+    CachedEmbedding,
+    MemmapEmbeddingStore,
+    copy_text_cache,
+    import_legacy_text_cache,
+)
+from utils.embedding_models.schema import GenericEmbeddingResponse
+
+
+class MemmapEmbeddingStoreTestCase(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.temp_dir = tempfile.mkdtemp()
+        self.temp_dir_path = Path(self.temp_dir)
+        self.store = MemmapEmbeddingStore(prefix="test", path_to_cache=self.temp_dir_path)
+
+    def tearDown(self) -> None:
+        self.store.close()
+        shutil.rmtree(self.temp_dir)
+
+    def test_store_and_retrieve(self):
+        self.assertFalse(self.store.exists("key"))
+        self.assertIsNone(self.store.retrieve("key"))
+
+        self.store.store("key", CachedEmbedding(embedding=np.array([1.0, 2.0, 3.0]), promt_tokens=4, time_to_generate=0.5))
+
+        self.assertTrue(self.store.exists("key"))
+        retrieved = self.store.retrieve("key")
+        assert retrieved is not None
+        self.assertEqual(retrieved.embedding.tolist(), [1.0, 2.0, 3.0])
+        self.assertEqual(retrieved.embedding.dtype, np.float32)
+        self.assertEqual(retrieved.promt_tokens, 4)
+        self.assertEqual(retrieved.time_to_generate, 0.5)
+
+    def test_vectors_are_stored_as_raw_rows(self):
+        self.store.store_many({
+            "key": CachedEmbedding(embedding=np.array([1.0, 2.0]), promt_tokens=1, time_to_generate=0),
+            "key2": CachedEmbedding(embedding=np.array([3.0, 4.0]), promt_tokens=1, time_to_generate=0),
+        })
+
+        self.assertEqual(self.store.data_path().stat().st_size, 2 * 2 * 4)
+
+        retrieved = self.store.retrieve_many(["key2", "missing", "key"])
+        self.assertEqual(set(retrieved), {"key", "key2"})
+        self.assertEqual(retrieved["key2"].embedding.tolist(), [3.0, 4.0])
+        self.assertFalse(retrieved["key2"].embedding.flags.owndata)
+
+    def test_retrieve_after_reopening(self):
+        self.store.store("key", CachedEmbedding(embedding=np.array([1.0, 2.0]), promt_tokens=1, time_to_generate=0))
+
+        reopened = MemmapEmbeddingStore(prefix="test", path_to_cache=self.temp_dir_path)
+        self.assertEqual(reopened.dimension, 2)
+        self.assertEqual(list(reopened.retrieve_all()), ["key"])
+
+        other = MemmapEmbeddingStore(prefix="other", path_to_cache=self.temp_dir_path)
+        self.assertEqual(other.retrieve_all(), {})
+
+        reopened.close()
+        other.close()
+
+    def test_half_precision_store(self):
+        store = MemmapEmbeddingStore(prefix="test", path_to_cache=self.temp_dir_path, dtype="float16")
+        store.store("key", CachedEmbedding(embedding=np.array([0.5, 0.25]), promt_tokens=1, time_to_generate=0))
+
+        retrieved = store.retrieve("key")
+        assert retrieved is not None
+        self.assertEqual(retrieved.embedding.dtype, np.float16)
+        self.assertEqual(store.data_path().stat().st_size, 2 * 2)
+        self.assertIsNone(self.store.retrieve("key"))
+        store.close()
+
+    def test_dimension_mismatch(self):
+        self.store.store("key", CachedEmbedding(embedding=np.array([1.0, 2.0]), promt_tokens=1, time_to_generate=0))
+
+        with self.assertRaises(ValueError):
+            self.store.store("key2", CachedEmbedding(embedding=np.array([1.0, 2.0, 3.0]), promt_tokens=1, time_to_generate=0))
+
+        with self.assertRaises(ValueError):
+            MemmapEmbeddingStore(prefix="test", path_to_cache=self.temp_dir_path, dimension=3)
+
+    def test_copy_text_cache(self):
+        text_cache = SQLiteTextCache(prefix="test", path_to_cache=self.temp_dir_path)
+        text_cache.store("key", GenericEmbeddingResponse(embeddings=[[1.0, 2.0]], promt_tokens=3, time_to_generate=1).model_dump_json())
+
+        self.assertEqual(copy_text_cache(text_cache, self.store), 1)
+
+        retrieved = self.store.retrieve("key")
+        assert retrieved is not None
+        self.assertEqual(retrieved.embedding.tolist(), [1.0, 2.0])
+        self.assertEqual(retrieved.promt_tokens, 3)
+        text_cache.close()
+
+    def test_import_legacy_text_cache(self):
+        FileBasedTextCache(prefix="test", path_to_cache=self.temp_dir_path).store(
+            "key", GenericEmbeddingResponse(embeddings=[[1.0, 2.0]], promt_tokens=3, time_to_generate=1).model_dump_json()
+        )
+        text_cache = SQLiteTextCache(prefix="test", path_to_cache=self.temp_dir_path)
+        text_cache.store("key2", GenericEmbeddingResponse(embeddings=[[3.0, 4.0]], promt_tokens=2, time_to_generate=1).model_dump_json())
+        text_cache.close()
+
+        self.assertEqual(import_legacy_text_cache(self.store), 2)
+        self.assertEqual({key: value.embedding.tolist() for key, value in self.store.retrieve_all().items()}, {"key": [1.0, 2.0], "key2": [3.0, 4.0]})
+
+        # a store with embeddings of its own is not touched again
+        self.assertEqual(import_legacy_text_cache(self.store), 0)
+
+    def _age_entry(self, store: MemmapEmbeddingStore, key: str, seconds: float):
+        store.connection.execute(
+            "UPDATE embeddings SET created_at = created_at - ? WHERE store = ? AND key = ?", (seconds, store.name, key)
+        )
+
+    def test_compaction_drops_replaced_rows(self):
+        self.store.store("key", CachedEmbedding(embedding=np.array([1.0, 2.0]), promt_tokens=1, time_to_generate=0))
+        self.store.store("key2", CachedEmbedding(embedding=np.array([3.0, 4.0]), promt_tokens=1, time_to_generate=0))
+        self.store.store("key", CachedEmbedding(embedding=np.array([5.0, 6.0]), promt_tokens=1, time_to_generate=0))
+        self.assertEqual(self.store.size_bytes(), 3 * 8 + 7)
+
+        report = self.store.compact()
+
+        self.assertEqual(report.removed_entries, 0)
+        self.assertEqual(report.size_after, 2 * 8 + 7)
+        self.assertEqual(self.store.size_by_prefix(), {self.store.name: 2 * 8 + 7})
+        self.assertEqual([path.name for path in self.temp_dir_path.glob("*.bin")], [self.store.data_path().name])
+        retrieved = self.store.retrieve_many(["key", "key2"])
+        self.assertEqual(retrieved["key"].embedding.tolist(), [5.0, 6.0])
+        self.assertEqual(retrieved["key2"].embedding.tolist(), [3.0, 4.0])
+
+    def test_overlapping_compactions_keep_the_newest_matrix(self):
+        self.store.store("key", CachedEmbedding(embedding=np.array([1.0, 2.0]), promt_tokens=1, time_to_generate=0))
+        self.store.store("key", CachedEmbedding(embedding=np.array([3.0, 4.0]), promt_tokens=1, time_to_generate=0))
+        other = MemmapEmbeddingStore(prefix="test", path_to_cache=self.temp_dir_path)
+        glob = Path.glob
+        overlapped = False
+
+        def glob_after_other_compaction(path, pattern):
+            # the other process compacts after this one committed, but before it removes old matrix files
+            nonlocal overlapped
+            if pattern.endswith(".bin") and not overlapped:
+                overlapped = True
+                other.compact()
+            return glob(path, pattern)
+
+        with mock.patch.object(Path, "glob", glob_after_other_compaction):
+            self.store.compact()
+
+        self.assertEqual([path.name for path in self.temp_dir_path.glob("*.bin")], [self.store.data_path().name])
+        self.store.store("key2", CachedEmbedding(embedding=np.array([5.0, 6.0]), promt_tokens=1, time_to_generate=0))
+        retrieved = self.store.retrieve_many(["key", "key2"])
+        self.assertEqual(retrieved["key"].embedding.tolist(), [3.0, 4.0])
+        self.assertEqual(retrieved["key2"].embedding.tolist(), [5.0, 6.0])
+        other.close()
+
+    def test_compaction_applies_policy(self):
+        store = MemmapEmbeddingStore(
+            prefix="test", path_to_cache=self.temp_dir_path, policy=CachePolicy(ttl_seconds=60, max_size_bytes=24)
+        )
+        store.store_many({
+            key: CachedEmbedding(embedding=np.array([value, value]), promt_tokens=1, time_to_generate=0)
+            for key, value in [("key1", 1.0), ("key2", 2.0), ("key3", 3.0), ("key4", 4.0)]
+        })
+        self._age_entry(store, "key1", 120)
+        self._age_entry(store, "key2", 30)
+        self.assertFalse(store.exists("key1"))
+        self.assertEqual(set(store.retrieve_all()), {"key2", "key3", "key4"})
+
+        report = store.compact()
+
+        self.assertEqual(report.removed_entries, 2)
+        self.assertEqual(set(store.retrieve_all()), {"key3", "key4"})
+        self.assertEqual(store.retrieve_many(["key4"])["key4"].embedding.tolist(), [4.0, 4.0])
+
+        reader = MemmapEmbeddingStore(prefix="test", path_to_cache=self.temp_dir_path)
+        self.assertEqual(reader.retrieve_many(["key3"])["key3"].embedding.tolist(), [3.0, 3.0])
+        reader.close()
+        store.close()
@@ -3,16 +3,21 @@ import tempfile
 import unittest
 from pathlib import Path
 
-from utils.embedding_models.caching import CachedEmbeddingModel
+import numpy as np
+
+from utils.caching import FileBasedTextCache
+from utils.embedding_models.caching import CachedEmbeddingModel, apportion_tokens, split_batch_response
+from utils.embedding_models.monitoring import EmbeddingModelWithMonitoring
 from utils.embedding_models.schema import EmbeddingModelInfo, GenericEmbeddingResponse
 
 
 class MockedEmbeddingModel:
     def __init__(
-        self, text_to_embeddings: dict[str, list[float]], unique_model_name: str
+        self, text_to_embeddings: dict[str, list[float]], unique_model_name: str, promt_tokens_per_call: int = 0
     ) -> None:
         self.text_to_embeddings = text_to_embeddings
         self.number_of_calls = 0
+        self.promt_tokens_per_call = promt_tokens_per_call
         self.unique_model_name = unique_model_name
         self.model_info = EmbeddingModelInfo(
             model_name=unique_model_name, dimension=42, cost_per_mln_tokens=0.1
@@ -22,7 +27,7 @@ class MockedEmbeddingModel:
         self.number_of_calls += 1
         embeddings = [self.text_to_embeddings[text] for text in texts]
         return GenericEmbeddingResponse(
-            embeddings=embeddings, promt_tokens=0, time_to_generate=0
+            embeddings=embeddings, promt_tokens=self.promt_tokens_per_call, time_to_generate=0
         )
 
 
@@ -86,3 +91,85 @@ class CachedEmbeddingModelTestCase(unittest.TestCase):
         result = model_2.embed(["test"])
         self.assertEqual(underlying_model_2.number_of_calls, 1)
         self.assertEqual(result.embeddings, [[4, 5, 6]])
+
+    def test_cache_misses_are_embedded_in_batches(self):
+        underlying_model = MockedEmbeddingModel(
+            text_to_embeddings={"a": [1, 0, 0], "bb": [0, 1, 0], "ccc": [0, 0, 1]},
+            unique_model_name="test_model_batches",
+            promt_tokens_per_call=9,
+        )
+        cached_model = CachedEmbeddingModel(
+            model=underlying_model, path_to_cache=self.temp_dir_path, batch_size=2
+        )
+
+        result = cached_model.embed(["ccc", "a", "bb", "a"])
+        self.assertEqual(underlying_model.number_of_calls, 2)
+        self.assertEqual(result.embeddings, [[0, 0, 1], [1, 0, 0], [0, 1, 0], [1, 0, 0]])
+
+        result = cached_model.embed(["a", "bb", "ccc"])
+        self.assertEqual(underlying_model.number_of_calls, 2)
+        self.assertEqual(result.embeddings, [[1, 0, 0], [0, 1, 0], [0, 0, 1]])
+        self.assertEqual(result.promt_tokens, 18)
+
+    def test_memory_cache_stats(self):
+        self.assertIsNone(self.cached_model.cache_stats)
+
+        cached_model = CachedEmbeddingModel(
+            model=self.underlying_model, path_to_cache=self.temp_dir_path, memory_cache_max_entries=10
+        )
+        cached_model.embed(["test"])
+        cached_model.embed(["test"])
+
+        stats = cached_model.cache_stats
+        assert stats is not None
+        self.assertEqual((stats.hits, stats.misses, stats.entries), (1, 1, 1))
+        self.assertEqual(stats.size_bytes, 3 * 4)
+        self.assertEqual(self.underlying_model.number_of_calls, 1)
+
+    def test_split_rows_do_not_keep_the_batch_alive(self):
+        resp = GenericEmbeddingResponse(embeddings=[[1, 2, 3], [4, 5, 6]], promt_tokens=2, time_to_generate=0)
+
+        split = split_batch_response(["a", "b"], resp)
+
+        for embedding in split.values():
+            self.assertTrue(embedding.embedding.flags.owndata)
+        self.assertEqual(split["b"].embedding.tolist(), [4, 5, 6])
+
+    def test_embeddings_cached_in_files_are_reused(self):
+        underlying_model = MockedEmbeddingModel(text_to_embeddings={}, unique_model_name="test_model2")
+        FileBasedTextCache(prefix="test_model2", path_to_cache=self.temp_dir_path).store(
+            "test", GenericEmbeddingResponse(embeddings=[[1, 2, 3]], promt_tokens=1, time_to_generate=0).model_dump_json()
+        )
+
+        result = CachedEmbeddingModel(model=underlying_model, path_to_cache=self.temp_dir_path).embed(["test"])
+
+        self.assertEqual(underlying_model.number_of_calls, 0)
+        self.assertEqual(result.embeddings, [[1, 2, 3]])
+
+    def test_apportion_tokens(self):
+        self.assertEqual(apportion_tokens(10, ["a", "bbbb"]), [2, 8])
+        self.assertEqual(apportion_tokens(7, ["aa", "bb", "cc"]), [3, 2, 2])
+        self.assertEqual(apportion_tokens(0, ["a", ""]), [0, 0])
+
+    def test_embeddings_are_returned_as_float32_matrix(self):
+        self.cached_model.embed(["test"])
+
+        result = self.cached_model.embed(["test", "test"])
+
+        self.assertEqual(result.vectors.dtype, np.float32)
+        self.assertEqual(result.vectors.shape, (2, 3))
+        self.assertTrue(result.vectors.flags.c_contiguous)
+        self.assertEqual(result.embeddings, [[1.0, 2.0, 3.0], [1.0, 2.0, 3.0]])
+        self.assertEqual(self.cached_model.embed([]).vectors.shape, (0, 0))
+
+    def test_cache_hits_are_reported_to_monitoring(self):
+        model = EmbeddingModelWithMonitoring(model=self.cached_model)
+
+        model.embed(["test"])
+        resp = model.embed(["test", "test"])
+
+        self.assertEqual(resp.cached_items, 2)
+        snapshot = model.snapshot()
+        self.assertEqual((snapshot["calls"], snapshot["items"], snapshot["cache_hits"]), (2, 3, 2))
+        self.assertAlmostEqual(snapshot["cache_hit_ratio"], 2 / 3)
+        self.assertIn('embedding_cache_hits_total{model="test_model1"} 2', model.to_prometheus())
@@ -51,3 +51,17 @@ class EmbeddingMonitoringTestCase(unittest.TestCase):
         client.embed(["test"])
 
         self.assertEqual(client.time_to_generate, 4)
+
+    def test_dedup_ratio_monitoring(self):
+
+        underlying_model = MockedEmbeddingModel(
+            text_to_embeddings={"test": [1, 2, 3], "other": [3, 2, 1]}, unique_model_name="test_model1"
+        )
+        client = EmbeddingModelWithMonitoring(model=underlying_model)
+        self.assertEqual(client.get_dedup_ratio(), 0.0)
+
+        client.embed(["test", "test", "other", "test"])
+        client.embed(["test"])
+
+        self.assertEqual((client.number_of_texts, client.number_of_unique_texts), (5, 3))
+        self.assertAlmostEqual(client.get_dedup_ratio(), 0.4)
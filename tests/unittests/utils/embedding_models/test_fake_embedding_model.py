@@ -0,0 +1,76 @@
+import asyncio
+import shutil
+import tempfile
+import time
+import unittest
+from pathlib import Path
+
+import numpy as np
+
+from utils.embedding_models.caching import CachedEmbeddingModel
+from utils.embedding_models.providers.fake import AsyncFakeEmbeddingModel, FakeEmbeddingModel, init_model
+from utils.embedding_models.schema import EmbeddingModelInfo
+from utils.simulation import FaultInjection, LatencyDistribution, SimulatedProviderError
+
+MODEL_INFO = EmbeddingModelInfo(model_name="text-embedding-3-small", dimension=16, cost_per_mln_tokens=0.02)
+
+
+class FakeEmbeddingModelTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.path_to_cache = Path(tempfile.mkdtemp())
+
+    def tearDown(self):
+        shutil.rmtree(self.path_to_cache)
+
+    def test_vectors_are_deterministic_unit_vectors(self):
+        resp = FakeEmbeddingModel(MODEL_INFO).embed(["Main", "abc", "Main"])
+        other_resp = FakeEmbeddingModel(MODEL_INFO, seed=5).embed(["abc"])
+        shortened_resp = FakeEmbeddingModel(MODEL_INFO.with_output_dimension(4)).embed(["abc"])
+
+        self.assertEqual(resp.vectors.shape, (3, 16))
+        self.assertEqual(resp.vectors.dtype, np.float32)
+        np.testing.assert_allclose(np.linalg.norm(resp.vectors, axis=1), 1, rtol=1e-6)
+        np.testing.assert_array_equal(resp.vectors[0], resp.vectors[2])
+        np.testing.assert_array_equal(resp.vectors[1], other_resp.vectors[0])
+        self.assertEqual(shortened_resp.vectors.shape, (1, 4))
+        self.assertEqual(resp.promt_tokens, 3)
+
+    def test_large_batches_are_split_into_requests(self):
+        model = FakeEmbeddingModel(MODEL_INFO)
+
+        model.embed(["abcd"] * 5000)
+
+        self.assertEqual((model.endpoint.requests, model.endpoint.tokens), (3, 5000))
+
+    def test_failures_reach_the_caller_and_are_not_cached(self):
+        model = init_model(MODEL_INFO, path_to_cache=self.path_to_cache, faults=FaultInjection(failure_rate=1))
+
+        with self.assertRaises(SimulatedProviderError):
+            model.embed(["Main"])
+
+        self.assertEqual(model.snapshot()["errors"], 1)
+
+    def test_cache_under_load(self):
+        underlying_model = FakeEmbeddingModel(MODEL_INFO, latency=LatencyDistribution(mean_seconds=0.02))
+        model = CachedEmbeddingModel(model=underlying_model, path_to_cache=self.path_to_cache)
+
+        model.embed([f"text {i}" for i in range(10)])
+        start_time = time.perf_counter()
+        resp = model.embed([f"text {i}" for i in range(10)])
+
+        self.assertLess(time.perf_counter() - start_time, 0.02)
+        self.assertEqual(resp.cached_items, 10)
+        self.assertEqual(underlying_model.endpoint.requests, 1)
+
+    def test_async_requests_run_concurrently(self):
+        model = AsyncFakeEmbeddingModel(MODEL_INFO, latency=LatencyDistribution(mean_seconds=0.1), max_concurrency=8)
+
+        async def embed_all():
+            return await asyncio.gather(*(model.embed([f"text {i}"]) for i in range(8)))
+
+        start_time = time.perf_counter()
+        responses = asyncio.run(embed_all())
+
+        self.assertLess(time.perf_counter() - start_time, 0.5)
+        self.assertEqual(sum(resp.promt_tokens for resp in responses), 8 * 1)
@@ -0,0 +1,59 @@
+import shutil
+import tempfile
+import unittest
+from pathlib import Path
+
+import numpy as np
+
+from tests.unittests.utils.embedding_models.tiny_models import save_tiny_sentence_transformer
+from utils.embedding_models.schema import EmbeddingModelInfo
+
+
+class HFEmbeddingModelTestCase(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.temp_dir = tempfile.mkdtemp()
+        self.temp_dir_path = Path(self.temp_dir)
+        save_tiny_sentence_transformer(self.temp_dir_path)
+        self.model_info = EmbeddingModelInfo(
+            model_name=str(self.temp_dir_path / "model"), dimension=32, cost_per_mln_tokens=0.0
+        )
+        # lengths deliberately out of order, so the length buckets reorder them
+        self.texts = [
+            "to jest bardzo dlugi tekst o niczym a kot ma ale to jest bardzo dlugi tekst",
+            "kot",
+            "ala ma kota",
+            "to jest bardzo dlugi tekst o niczym",
+            "ala",
+            "nieznane slowa a kot ma ale",
+            "ala ma kota a kot ma ale to jest bardzo dlugi tekst o niczym",
+        ]
+
+    def tearDown(self) -> None:
+        shutil.rmtree(self.temp_dir)
+
+    def _expected(self) -> np.ndarray:
+        from sentence_transformers import SentenceTransformer
+
+        return SentenceTransformer(self.model_info.model_name, device="cpu").encode(self.texts)
+
+    def test_embeddings_match_sentence_transformers_in_input_order(self):
+        from utils.embedding_models.providers.hugging_face import HFEmbeddingModel
+
+        model = HFEmbeddingModel(self.model_info, device="cpu", batch_size=2, max_tokens_per_batch=32)
+
+        np.testing.assert_allclose(model.embed(self.texts).vectors, self._expected(), atol=1e-5)
+
+    def test_reduced_precision_stays_close_to_sentence_transformers(self):
+        from utils.embedding_models.providers.hugging_face import HFEmbeddingModel
+
+        expected = self._expected()
+        for precision in ["bf16", "int8"]:
+            model = HFEmbeddingModel(self.model_info, device="cpu", batch_size=2, max_tokens_per_batch=32, precision=precision)
+
+            vectors = model.embed(self.texts).vectors
+
+            self.assertEqual(vectors.shape, expected.shape)
+            # rows are normalized, so the row-wise dot product is the cosine similarity
+            similarities = np.sum(vectors * expected, axis=1) / np.linalg.norm(vectors, axis=1)
+            self.assertTrue(np.all(similarities > 0.95), msg=f"{precision}: {similarities}")
@@ -0,0 +1,35 @@
+import shutil
+import tempfile
+import unittest
+from pathlib import Path
+
+import numpy as np
+
+from tests.unittests.utils.embedding_models.tiny_models import save_tiny_sentence_transformer
+from utils.embedding_models.providers.hugging_face import HFEmbeddingModel, MultiProcessHFEmbeddingModel
+from utils.embedding_models.schema import EmbeddingModelInfo
+
+
+class MultiProcessHFEmbeddingModelTestCase(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.temp_dir = tempfile.mkdtemp()
+        self.temp_dir_path = Path(self.temp_dir)
+        save_tiny_sentence_transformer(self.temp_dir_path)
+        self.model_info = EmbeddingModelInfo(
+            model_name=str(self.temp_dir_path / "model"), dimension=32, cost_per_mln_tokens=0.0
+        )
+
+    def tearDown(self) -> None:
+        shutil.rmtree(self.temp_dir)
+
+    def test_embeddings_are_gathered_in_order(self):
+        texts = [" ".join(["ala ma kota"] * (i % 7 + 1) + [str(i)]) for i in range(50)]
+        expected = HFEmbeddingModel(self.model_info, device="cpu").embed(texts).embeddings
+
+        with MultiProcessHFEmbeddingModel(self.model_info, num_processes=2, threads_per_process=1, shard_size=8) as model:
+            resp = model.embed(texts)
+            self.assertEqual(model.embed([]).embeddings, [])
+
+        np.testing.assert_allclose(resp.embeddings, expected, atol=1e-5)
+        self.assertEqual(resp.promt_tokens, 0)
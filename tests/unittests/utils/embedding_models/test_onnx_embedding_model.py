@@ -0,0 +1,69 @@
+import importlib.util
+import shutil
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+import numpy as np
+
+from tests.unittests.utils.embedding_models.tiny_models import save_tiny_sentence_transformer
+
+
+@unittest.skipUnless(importlib.util.find_spec("onnxruntime"), "needs the `onnx` extra: uv sync --extra onnx")
+class ONNXEmbeddingModelTestCase(unittest.TestCase):
+
+    def setUp(self) -> None:
+        from utils.embedding_models.schema import EmbeddingModelInfo
+
+        self.temp_dir = tempfile.mkdtemp()
+        self.temp_dir_path = Path(self.temp_dir)
+        save_tiny_sentence_transformer(self.temp_dir_path)
+        self.model_info = EmbeddingModelInfo(
+            model_name=str(self.temp_dir_path / "model"), dimension=32, cost_per_mln_tokens=0.0
+        )
+        self.texts = ["ala ma kota", "to jest bardzo dlugi tekst o niczym a kot ma ale", "kot", "nieznane slowa"]
+
+    def tearDown(self) -> None:
+        shutil.rmtree(self.temp_dir)
+
+    def test_embeddings_match_hugging_face_model(self):
+        from utils.embedding_models.providers.hugging_face import HFEmbeddingModel
+        from utils.embedding_models.providers.onnx_runtime import ONNXEmbeddingModel
+
+        expected = HFEmbeddingModel(self.model_info, device="cpu").embed(self.texts).embeddings
+
+        model = ONNXEmbeddingModel(self.model_info, path_to_models=self.temp_dir_path / "onnx", batch_size=2)
+        resp = model.embed(self.texts)
+
+        np.testing.assert_allclose(resp.embeddings, expected, atol=1e-5)
+        np.testing.assert_allclose(np.linalg.norm(resp.embeddings, axis=1), 1.0, atol=1e-5)
+        self.assertEqual(model.embed([]).embeddings, [])
+
+        # the export is reused, so the source model is no longer needed
+        shutil.rmtree(self.temp_dir_path / "model")
+        reloaded = ONNXEmbeddingModel(self.model_info, path_to_models=self.temp_dir_path / "onnx")
+        np.testing.assert_allclose(reloaded.embed(self.texts).embeddings, resp.embeddings, atol=1e-6)
+
+    def test_quantized_model(self):
+        from utils.embedding_models.providers.hugging_face import HFEmbeddingModel
+        from utils.embedding_models.providers.onnx_runtime import ONNXEmbeddingModel
+
+        expected = HFEmbeddingModel(self.model_info, device="cpu").embed(self.texts).embeddings
+
+        model = ONNXEmbeddingModel(self.model_info, path_to_models=self.temp_dir_path / "onnx", quantize=True)
+
+        similarities = np.sum(np.array(model.embed(self.texts).embeddings) * np.array(expected), axis=1)
+        self.assertTrue(np.all(similarities > 0.95))
+
+
+class ONNXExtraTestCase(unittest.TestCase):
+
+    def test_missing_extra_is_reported(self):
+        from utils.embedding_models.providers.onnx_runtime import ONNXEmbeddingModel
+        from utils.embedding_models.schema import EmbeddingModelInfo
+
+        model_info = EmbeddingModelInfo(model_name="test_model", dimension=32, cost_per_mln_tokens=0.0)
+        with mock.patch("importlib.util.find_spec", return_value=None):
+            with self.assertRaisesRegex(ImportError, r"onnx and onnxruntime; install the `onnx` extra"):
+                ONNXEmbeddingModel(model_info)
@@ -0,0 +1,70 @@
+import unittest
+
+import numpy as np
+
+from utils.embedding_models.request_packing import (
+    EmbeddingRequestPlan,
+    OversizedInputError,
+    bucket_by_length,
+    pack_requests,
+)
+
+
+def tokenize_by_characters(texts: list[str]) -> list[list[int]]:
+    return [[ord(character) for character in text] for text in texts]
+
+
+class RequestPackingTestCase(unittest.TestCase):
+
+    def test_pack_requests(self):
+        self.assertEqual(pack_requests([3, 3, 3, 1], max_tokens_per_request=6, max_inputs_per_request=10), [[0, 1], [2, 3]])
+        self.assertEqual(pack_requests([1] * 5, max_tokens_per_request=100, max_inputs_per_request=2), [[0, 1], [2, 3], [4]])
+        self.assertEqual(pack_requests([10, 1], max_tokens_per_request=5, max_inputs_per_request=10), [[0], [1]])
+        self.assertEqual(pack_requests([], max_tokens_per_request=5, max_inputs_per_request=10), [])
+
+    def test_bucket_by_length(self):
+        lengths = [10, 100, 12, 90, 11, 1]
+
+        batches = bucket_by_length(lengths, max_batch_size=3, max_tokens_per_batch=200)
+
+        self.assertEqual(batches, [[1, 3], [2, 4, 0], [5]])
+        self.assertEqual(bucket_by_length([], max_batch_size=3, max_tokens_per_batch=200), [])
+
+    def test_plan_sends_token_ids_within_limits(self):
+        texts = ["aaaa", "bb", "cccc", "d"]
+        plan = EmbeddingRequestPlan(
+            texts, tokenize_by_characters, max_tokens_per_input=4, max_tokens_per_request=6, max_inputs_per_request=10
+        )
+
+        self.assertEqual(plan.requests, [[0, 1], [2, 3]])
+        self.assertEqual(plan.request_inputs(plan.requests[0]), [[97] * 4, [98] * 2])
+
+        embeddings = [
+            np.array([[len(tokens), 0.0] for tokens in plan.request_inputs(request)]) for request in plan.requests
+        ]
+        self.assertEqual(plan.assemble(embeddings).tolist(), [[4.0, 0.0], [2.0, 0.0], [4.0, 0.0], [1.0, 0.0]])
+
+    def test_oversized_inputs_are_reported(self):
+        with self.assertRaises(OversizedInputError) as context:
+            EmbeddingRequestPlan(["ok", "too long", "also too long"], tokenize_by_characters, max_tokens_per_input=4)
+
+        self.assertEqual(context.exception.oversized, {1: 8, 2: 13})
+
+    def test_oversized_inputs_are_chunked_and_averaged(self):
+        plan = EmbeddingRequestPlan(
+            ["abcdef", "x"], tokenize_by_characters, oversized_inputs="chunk", max_tokens_per_input=4
+        )
+
+        self.assertEqual(plan.request_inputs(plan.requests[0]), [[97, 98, 99, 100], [101, 102], [120]])
+
+        merged = plan.assemble([np.array([[1.0, 0.0], [0.0, 1.0], [0.6, 0.8]])])
+        expected = np.array([4.0, 2.0]) / np.linalg.norm([4.0, 2.0])
+        np.testing.assert_allclose(merged[0], expected, rtol=1e-6)
+        np.testing.assert_allclose(merged[1], [0.6, 0.8])
+
+    def test_plan_without_tokenizer_limits_number_of_inputs(self):
+        plan = EmbeddingRequestPlan(["a", "b", "c"], tokenize=None, max_inputs_per_request=2)
+
+        self.assertEqual([plan.request_inputs(request) for request in plan.requests], [["a", "b"], ["c"]])
+        self.assertEqual(plan.assemble([np.array([[1.0], [2.0]]), np.array([[3.0]])]).tolist(), [[1.0], [2.0], [3.0]])
+        self.assertEqual(EmbeddingRequestPlan([], tokenize=None).assemble([]).shape, (0, 0))
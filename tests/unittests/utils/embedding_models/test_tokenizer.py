@@ -28,3 +28,14 @@ class TextTokenizerTestCase(unittest.TestCase):
             text, ENCODING_MODEL_NAME.TEXT_EMBEDDING_3_LARGE
         )
         self.assertEqual(number_of_tokens, 4)
+
+    def test_counting_many(self):
+        texts = ["This is a test", "", "Another test"]
+
+        number_of_tokens = tokenizer.count_tokens_many(texts, ENCODING_MODEL_NAME.TEXT_EMBEDDING_3_SMALL, num_threads=2)
+
+        self.assertEqual(number_of_tokens, [4, 0, 2])
+        self.assertIs(
+            tokenizer.get_encoding(ENCODING_MODEL_NAME.TEXT_EMBEDDING_3_SMALL),
+            tokenizer.get_encoding(ENCODING_MODEL_NAME.TEXT_EMBEDDING_3_SMALL),
+        )
@@ -0,0 +1,55 @@
+import shutil
+import tempfile
+import unittest
+from pathlib import Path
+
+from utils.llm_clients.cached_client import CachedLLMClient
+from utils.llm_clients.cost_monitoring import LLMClientWithCostMonitoring
+from utils.llm_clients.providers.fake_client import FakeLLMClient
+from utils.llm_clients.providers.supported_models import GPT_4O
+from utils.question_generation import BASE_PROMT_PL, GeneratedQuestions, generate_question_for_text
+from utils.simulation import FaultInjection, SimulatedRateLimitError
+
+
+class FakeLLMClientTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.path_to_cache = Path(tempfile.mkdtemp())
+
+    def tearDown(self):
+        shutil.rmtree(self.path_to_cache)
+
+    def test_generated_questions_are_deterministic(self):
+        client = FakeLLMClient[GeneratedQuestions](model_info=GPT_4O)
+
+        questions = generate_question_for_text(client, "Wisła jest najdłuższą rzeką Polski.", BASE_PROMT_PL)
+        other_client = FakeLLMClient[GeneratedQuestions](model_info=GPT_4O, seed=3)
+
+        self.assertIsInstance(questions, GeneratedQuestions)
+        self.assertEqual(len(questions.questions), 5)
+        self.assertEqual(
+            questions, generate_question_for_text(other_client, "Wisła jest najdłuższą rzeką Polski.", BASE_PROMT_PL)
+        )
+        self.assertGreater(client.promt_tokens, 0)
+        self.assertGreater(client.completion_tokens, 0)
+
+    def test_cached_and_monitored_client(self):
+        client = FakeLLMClient[GeneratedQuestions](model_info=GPT_4O)
+        cached_client = CachedLLMClient[GeneratedQuestions](client=client, path_to_cache=self.path_to_cache)
+        monitored_client = LLMClientWithCostMonitoring[GeneratedQuestions](client=cached_client)
+
+        first = generate_question_for_text(monitored_client, "Kraków leży nad Wisłą.")
+        second = generate_question_for_text(monitored_client, "Kraków leży nad Wisłą.")
+
+        self.assertEqual(first, second)
+        self.assertEqual(client.endpoint.requests, 1)
+        self.assertEqual(monitored_client.promt_tokens, 2 * client.promt_tokens)
+
+    def test_rate_limit(self):
+        client = FakeLLMClient[GeneratedQuestions](model_info=GPT_4O, faults=FaultInjection(requests_per_minute=1))
+
+        generate_question_for_text(client, "Pierwszy tekst.")
+        with self.assertRaises(SimulatedRateLimitError):
+            generate_question_for_text(client, "Drugi tekst.")
+
+        self.assertEqual(client.endpoint.rate_limited_requests, 1)
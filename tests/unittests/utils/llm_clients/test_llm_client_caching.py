@@ -4,6 +4,7 @@ import tempfile
 import unittest
 
 from pydantic import BaseModel
+from utils.caching import FileBasedTextCache
 from utils.llm_clients.cached_client import CachedLLMClient
 
 from utils.llm_clients.schema import ChatMessage, GenericLLMResponse, LLMModelInfo
@@ -56,4 +57,36 @@ class CachedLLMClientTestCase(unittest.TestCase):
 
         result = client.chat([ChatMessage(role="user", content="request")], _format=MockedResponse)
         self.assertEqual(underlying_client.number_of_calls, 3)
-        self.assertEqual(result.model_dump_json(), response.model_dump_json())
\ No newline at end of file
+        self.assertEqual(result.model_dump_json(), response.model_dump_json())
+
+    def test_cached_chat_many(self):
+        first_request = ChatMessage(role="user", content="request")
+        second_request = ChatMessage(role="user", content="request 2")
+        underlying_client = MockedLLMClient(request_to_responce={first_request: MockedResponse(response="response"),
+                                                                 second_request: MockedResponse(response="response 2")})
+        client = CachedLLMClient(client=underlying_client, path_to_cache=self.temp_dir_path)
+
+        client.chat([first_request], _format=MockedResponse)
+        self.assertEqual(underlying_client.number_of_calls, 1)
+
+        results = client.chat_many([[first_request], [second_request], [first_request]], _format=MockedResponse)
+        self.assertEqual(underlying_client.number_of_calls, 2)
+        self.assertEqual([result.response.response for result in results], ["response", "response 2", "response"])
+
+        results = client.chat_many([[second_request], [first_request]], _format=MockedResponse)
+        self.assertEqual(underlying_client.number_of_calls, 2)
+        self.assertEqual([result.response.response for result in results], ["response 2", "response"])
+
+    def test_responses_cached_in_files_are_reused(self):
+        request = ChatMessage(role="user", content="request")
+        underlying_client = MockedLLMClient(request_to_responce={request: MockedResponse(response="response")})
+        response = GenericLLMResponse[MockedResponse](response=MockedResponse(response="cached response"), promt_tokens=0, completion_tokens=0, time_to_generate=0)
+        FileBasedTextCache(prefix="test_model", path_to_cache=self.temp_dir_path).store(
+            request.model_dump_json(), response.model_dump_json()
+        )
+
+        client = CachedLLMClient(client=underlying_client, path_to_cache=self.temp_dir_path)
+
+        result = client.chat([request], _format=MockedResponse)
+        self.assertEqual(underlying_client.number_of_calls, 0)
+        self.assertEqual(result.response.response, "cached response")
@@ -35,4 +35,18 @@ class LLMCostMonitoringTestCase(unittest.TestCase):
         client.chat([ChatMessage(role="user", content="request")], _format=MockedResponse)
 
         self.assertEqual(client.promt_tokens, 4)
-        self.assertEqual(client.completion_tokens, 6)
\ No newline at end of file
+        self.assertEqual(client.completion_tokens, 6)
+
+    def test_llm_call_metrics(self):
+        underlying_response = MockedResponse(response="response")
+        client = MockedLLMClient(request_to_responce={ChatMessage(role="user", content="request"): underlying_response})
+        client = LLMClientWithCostMonitoring(client=client)
+
+        client.chat([ChatMessage(role="user", content="request")], _format=MockedResponse)
+        with self.assertRaises(KeyError):
+            client.chat([ChatMessage(role="user", content="unknown")], _format=MockedResponse)
+
+        snapshot = client.snapshot()
+        self.assertEqual((snapshot["calls"], snapshot["errors"], snapshot["tokens"]), (2, 1, 5))
+        self.assertAlmostEqual(snapshot["total_cost"], 5 * 0.1 / 1_000_000)
+        self.assertIn('llm_calls_total{model="test_model"} 2', client.to_prometheus())
@@ -0,0 +1,85 @@
+import multiprocessing
+import shutil
+import tempfile
+import unittest
+from pathlib import Path
+
+import numpy as np
+
+from utils.caching import FileBasedTextCache, SQLiteTextCache
+from utils.embedding_models.embedding_store import CachedEmbedding, MemmapEmbeddingStore
+
+NUMBER_OF_WORKERS = 4
+BATCHES_PER_WORKER = 20
+BATCH_SIZE = 10
+
+
+def _write_text_entries(cache_type: str, path_to_cache: Path, worker: int) -> None:
+    cache = (SQLiteTextCache if cache_type == "sqlite" else FileBasedTextCache)(prefix="test", path_to_cache=path_to_cache)
+    for batch in range(BATCHES_PER_WORKER):
+        # Every worker writes the same shared keys too, so writes to one entry interleave across processes.
+        cache.store_many({f"shared_{i}": "x" * 1000 for i in range(BATCH_SIZE)})
+        cache.store_many({f"{worker}_{batch}_{i}": f"value_{worker}_{batch}_{i}" for i in range(BATCH_SIZE)})
+        cache.retrieve_many([f"shared_{i}" for i in range(BATCH_SIZE)])
+
+
+def _write_embeddings(path_to_cache: Path, worker: int) -> None:
+    store = MemmapEmbeddingStore(prefix="test", path_to_cache=path_to_cache)
+    for batch in range(BATCHES_PER_WORKER):
+        store.store_many({
+            f"{worker}_{batch}_{i}": CachedEmbedding(
+                embedding=np.full(8, worker * 1000 + batch * 10 + i, dtype=np.float32), promt_tokens=i, time_to_generate=0
+            )
+            for i in range(BATCH_SIZE)
+        })
+        store.retrieve_many([f"{worker}_{batch}_{i}" for i in range(BATCH_SIZE)])
+
+
+class ConcurrentCacheAccessTestCase(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.temp_dir = tempfile.mkdtemp()
+        self.temp_dir_path = Path(self.temp_dir)
+        self.context = multiprocessing.get_context("spawn")
+
+    def tearDown(self) -> None:
+        shutil.rmtree(self.temp_dir)
+
+    def _run_workers(self, target, *args) -> None:
+        workers = [self.context.Process(target=target, args=(*args, worker)) for worker in range(NUMBER_OF_WORKERS)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+            self.assertEqual(worker.exitcode, 0)
+
+    def _assert_all_text_entries_readable(self, cache: SQLiteTextCache | FileBasedTextCache) -> None:
+        entries = cache.retrieve_all()
+        self.assertEqual(len(entries), NUMBER_OF_WORKERS * BATCHES_PER_WORKER * BATCH_SIZE + BATCH_SIZE)
+        self.assertEqual(entries["shared_0"], "x" * 1000)
+        self.assertEqual(entries["3_19_9"], "value_3_19_9")
+
+    def test_parallel_writers_to_sqlite_cache(self):
+        self._run_workers(_write_text_entries, "sqlite", self.temp_dir_path)
+
+        cache = SQLiteTextCache(prefix="test", path_to_cache=self.temp_dir_path)
+        self._assert_all_text_entries_readable(cache)
+        cache.close()
+
+    def test_parallel_writers_to_file_based_cache(self):
+        self._run_workers(_write_text_entries, "files", self.temp_dir_path)
+
+        self._assert_all_text_entries_readable(FileBasedTextCache(prefix="test", path_to_cache=self.temp_dir_path))
+        self.assertEqual(list(self.temp_dir_path.glob(".*")), [])
+
+    def test_parallel_writers_to_embedding_store(self):
+        self._run_workers(_write_embeddings, self.temp_dir_path)
+
+        store = MemmapEmbeddingStore(prefix="test", path_to_cache=self.temp_dir_path)
+        entries = store.retrieve_all()
+        self.assertEqual(len(entries), NUMBER_OF_WORKERS * BATCHES_PER_WORKER * BATCH_SIZE)
+        for key, entry in entries.items():
+            worker, batch, i = map(int, key.split("_"))
+            self.assertEqual(entry.embedding.tolist(), [worker * 1000 + batch * 10 + i] * 8)
+            self.assertEqual(entry.promt_tokens, i)
+        store.close()
@@ -0,0 +1,29 @@
+import os
+import subprocess
+import sys
+import unittest
+
+PROVIDER_MODULES = [
+    "utils.embedding_models.providers.hugging_face",
+    "utils.embedding_models.providers.onnx_runtime",
+    "utils.embedding_models.providers.open_ai",
+    "utils.llm_clients.providers.open_ai_client",
+    "utils.translation_models.hugging_face",
+    "utils.vectordb.vectordb",
+]
+HEAVY_MODULES = ["torch", "sentence_transformers", "transformers", "onnxruntime", "faiss", "openai", "tiktoken"]
+
+
+class LazyImportsTestCase(unittest.TestCase):
+
+    def test_heavy_dependencies_are_not_imported_with_providers(self):
+        code = "\n".join([
+            "import sys",
+            *(f"import {module}" for module in PROVIDER_MODULES),
+            f"print(','.join(module for module in {HEAVY_MODULES!r} if module in sys.modules))",
+        ])
+
+        env = {**os.environ, "PYTHONPATH": os.pathsep.join(sys.path)}
+        result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True, env=env)
+
+        self.assertEqual(result.stdout.strip(), "")
@@ -0,0 +1,91 @@
+import shutil
+import tempfile
+import time
+import unittest
+from pathlib import Path
+from unittest import mock
+
+from utils.caching import CachePolicy, LRUMemoryCache, SQLiteTextCache
+
+
+class LRUMemoryCacheTestCase(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.temp_dir = tempfile.mkdtemp()
+        self.temp_dir_path = Path(self.temp_dir)
+        self.backend = SQLiteTextCache(prefix="test", path_to_cache=self.temp_dir_path)
+
+    def tearDown(self) -> None:
+        self.backend.close()
+        shutil.rmtree(self.temp_dir)
+
+    def test_writes_go_through_to_backend(self):
+        cache = LRUMemoryCache(self.backend, max_entries=1)
+        cache.store("key", "value")
+        cache.store_many({"key2": "value2"})
+
+        self.assertEqual(self.backend.retrieve_all(), {"key": "value", "key2": "value2"})
+        self.assertTrue(cache.exists("key"))
+        self.assertEqual(cache.retrieve("key"), "value")
+
+    def test_hits_and_misses(self):
+        self.backend.store("key", "value")
+        cache = LRUMemoryCache(self.backend, max_entries=10)
+
+        self.assertEqual(cache.retrieve("key"), "value")
+        self.assertEqual(cache.retrieve("key"), "value")
+        self.assertEqual(cache.retrieve_many(["key", "missing"]), {"key": "value"})
+        self.assertIsNone(cache.retrieve("missing"))
+
+        stats = cache.stats()
+        self.assertEqual((stats.hits, stats.misses, stats.entries), (2, 3, 1))
+        self.assertEqual(stats.hit_ratio, 0.4)
+
+    def test_least_recently_used_entry_is_evicted(self):
+        cache = LRUMemoryCache(self.backend, max_entries=2)
+        cache.store("key1", "value1")
+        cache.store("key2", "value2")
+        cache.retrieve("key1")
+        cache.store("key3", "value3")
+
+        stats = cache.stats()
+        self.assertEqual((stats.entries, stats.evictions), (2, 1))
+
+        cache.retrieve_many(["key1", "key3"])
+        self.assertEqual(cache.stats().hits, 3)
+
+        self.assertEqual(cache.retrieve("key2"), "value2")
+        self.assertEqual(cache.stats().misses, 1)
+
+    def test_byte_budget(self):
+        cache = LRUMemoryCache(self.backend, max_bytes=10, size_of=len)
+        cache.store("key1", "12345")
+        cache.store("key2", "12345")
+        self.assertEqual(cache.stats().size_bytes, 10)
+
+        cache.store("key3", "1")
+        self.assertEqual(cache.stats().size_bytes, 6)
+        self.assertEqual(cache.stats().evictions, 1)
+
+        cache.store("key4", "too long to be kept in memory")
+        self.assertEqual(cache.stats().entries, 2)
+        self.assertEqual(cache.retrieve("key4"), "too long to be kept in memory")
+
+        cache.store("key3", "too long to be kept in memory")
+        self.assertEqual((cache.stats().entries, cache.stats().size_bytes), (1, 5))
+        self.assertEqual(cache.retrieve("key3"), "too long to be kept in memory")
+
+    def test_memory_hits_honour_backend_ttl(self):
+        backend = SQLiteTextCache(prefix="ttl", path_to_cache=self.temp_dir_path, policy=CachePolicy(ttl_seconds=60))
+        cache = LRUMemoryCache(backend, max_entries=10)
+        cache.store_many({"key": "value", "key2": "value2"})
+        self.assertEqual(cache.retrieve_many(["key", "key2"]), {"key": "value", "key2": "value2"})
+
+        with mock.patch("time.time", return_value=time.time() + 120):
+            self.assertFalse(cache.exists("key"))
+            self.assertIsNone(cache.retrieve("key"))
+            self.assertEqual(cache.retrieve_many(["key2"]), {})
+
+        stats = cache.stats()
+        self.assertEqual((stats.entries, stats.size_bytes), (0, 0))
+        backend.close()
@@ -0,0 +1,76 @@
+import threading
+import unittest
+
+from utils.metrics import CallMetrics, Histogram
+
+
+class HistogramTestCase(unittest.TestCase):
+
+    def test_quantiles_are_interpolated_within_buckets(self):
+        histogram = Histogram(buckets=[1, 2, 4])
+        for value in [0.5, 1.5, 1.5, 3, 10]:
+            histogram.observe(value)
+
+        self.assertEqual(histogram.quantile(0.5), 1.75)
+        self.assertEqual(histogram.quantile(0.2), 1.0)
+        self.assertEqual(histogram.quantile(0.99), 4)
+        self.assertEqual(histogram.cumulative_counts(), [("1", 1), ("2", 3), ("4", 4), ("+Inf", 5)])
+        self.assertEqual(Histogram(buckets=[1]).quantile(0.5), 0.0)
+
+
+class CallMetricsTestCase(unittest.TestCase):
+
+    def test_snapshot(self):
+        metrics = CallMetrics("test", latency_buckets=[0.1, 1], batch_size_buckets=[1, 10, 100])
+        metrics.record(0.05, items=10, tokens=100, cache_hits=5)
+        metrics.record(0.5, items=30, tokens=300, cache_hits=5)
+        metrics.record(0.2, items=1, error=True)
+
+        snapshot = metrics.snapshot()
+
+        self.assertEqual((snapshot["calls"], snapshot["errors"], snapshot["items"], snapshot["tokens"]), (3, 1, 40, 400))
+        self.assertEqual(snapshot["cache_hit_ratio"], 0.25)
+        self.assertAlmostEqual(snapshot["latency_p50_seconds"], 0.325)
+        self.assertAlmostEqual(snapshot["batch_size_p99"], 97.3)
+        self.assertGreater(snapshot["items_per_second"], 0)
+        self.assertAlmostEqual(snapshot["tokens_per_second"] / snapshot["items_per_second"], 10)
+
+    def test_prometheus_export(self):
+        metrics = CallMetrics("test", latency_buckets=[0.1, 1], batch_size_buckets=[1, 10])
+        metrics.record(0.05, items=3, tokens=7)
+
+        exported = metrics.to_prometheus(labels={"model": "m"}).splitlines()
+
+        self.assertIn("# TYPE test_calls_total counter", exported)
+        self.assertIn('test_tokens_total{model="m"} 7', exported)
+        self.assertIn("# TYPE test_latency_seconds histogram", exported)
+        self.assertIn('test_latency_seconds_bucket{model="m",le="0.1"} 1', exported)
+        self.assertIn('test_batch_size_bucket{model="m",le="1"} 0', exported)
+        self.assertIn('test_batch_size_bucket{model="m",le="+Inf"} 1', exported)
+        self.assertIn('test_batch_size_count{model="m"} 1', exported)
+        self.assertIn('test_batch_size_sum{model="m"} 3.0', exported)
+
+    def test_prometheus_export_keeps_large_values_exact(self):
+        metrics = CallMetrics("test")
+        metrics.record(1234567.891, items=1, tokens=12_345_678)
+
+        exported = metrics.to_prometheus().splitlines()
+
+        self.assertIn("test_tokens_total 12345678", exported)
+        self.assertIn("test_latency_seconds_sum 1234567.891", exported)
+
+    def test_concurrent_recording(self):
+        metrics = CallMetrics("test")
+
+        def record() -> None:
+            for _ in range(1000):
+                metrics.record(0.01, items=2, tokens=3)
+
+        threads = [threading.Thread(target=record) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        snapshot = metrics.snapshot()
+        self.assertEqual((snapshot["calls"], snapshot["items"], snapshot["tokens"]), (8000, 16000, 24000))
@@ -0,0 +1,84 @@
+import asyncio
+import random
+import unittest
+
+from utils.simulation import (
+    FaultInjection,
+    LatencyDistribution,
+    SimulatedEndpoint,
+    SimulatedProviderError,
+    SimulatedRateLimitError,
+)
+
+
+class MockedClock:
+    def __init__(self) -> None:
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class LatencyDistributionTestCase(unittest.TestCase):
+
+    def test_sampled_means(self):
+        for kind in ["uniform", "normal", "lognormal", "exponential"]:
+            latency = LatencyDistribution(kind=kind, mean_seconds=0.2, spread_seconds=0.05)
+            rng = random.Random(0)
+            samples = [latency.sample(rng) for _ in range(20_000)]
+
+            self.assertAlmostEqual(sum(samples) / len(samples), 0.2, delta=0.01, msg=kind)
+            self.assertGreaterEqual(min(samples), 0, msg=kind)
+
+    def test_latency_grows_with_tokens(self):
+        latency = LatencyDistribution(mean_seconds=0.1, seconds_per_mln_tokens=2)
+
+        self.assertAlmostEqual(latency.sample(random.Random(0), tokens=500_000), 1.1)
+
+
+class SimulatedEndpointTestCase(unittest.TestCase):
+
+    def test_failures_are_deterministic(self):
+        def outcomes(seed: int) -> list[bool]:
+            endpoint = SimulatedEndpoint(faults=FaultInjection(failure_rate=0.3), seed=seed)
+            result = []
+            for _ in range(200):
+                try:
+                    endpoint.call(tokens=1)
+                    result.append(True)
+                except SimulatedProviderError:
+                    result.append(False)
+            return result
+
+        self.assertEqual(outcomes(1), outcomes(1))
+        self.assertNotEqual(outcomes(1), outcomes(2))
+        self.assertAlmostEqual(outcomes(1).count(False) / 200, 0.3, delta=0.1)
+
+    def test_rate_limits(self):
+        clock = MockedClock()
+        endpoint = SimulatedEndpoint(faults=FaultInjection(requests_per_minute=2, tokens_per_minute=100), clock=clock)
+
+        endpoint.call(tokens=10)
+        clock.now = 20
+        endpoint.call(tokens=10)
+        with self.assertRaises(SimulatedRateLimitError) as error:
+            endpoint.call(tokens=10)
+        self.assertEqual(error.exception.retry_after, 40)
+
+        clock.now = 60
+        endpoint.call(tokens=80)
+        with self.assertRaises(SimulatedRateLimitError):
+            endpoint.call(tokens=11)
+
+        self.assertEqual((endpoint.requests, endpoint.rate_limited_requests, endpoint.tokens), (3, 2, 100))
+
+    def test_async_call(self):
+        endpoint = SimulatedEndpoint(latency=LatencyDistribution(mean_seconds=0.01))
+
+        async def call_all():
+            return await asyncio.gather(*(endpoint.acall(1) for _ in range(3)))
+
+        latencies = asyncio.run(call_all())
+
+        self.assertEqual(latencies, [0.01] * 3)
+        self.assertEqual(endpoint.requests, 3)
@@ -0,0 +1,138 @@
+import shutil
+import tempfile
+import unittest
+from pathlib import Path
+
+from utils.caching import CachePolicy, FileBasedTextCache, SQLiteTextCache, copy_cache, import_legacy_file_cache
+
+
+class SQLiteTextCacheTestCase(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.temp_dir = tempfile.mkdtemp()
+        self.temp_dir_path = Path(self.temp_dir)
+        self.cache = SQLiteTextCache(prefix="test", path_to_cache=self.temp_dir_path)
+
+    def tearDown(self) -> None:
+        self.cache.close()
+        shutil.rmtree(self.temp_dir)
+
+    def test_store_in_single_file(self):
+        self.cache.store("key", "value")
+        self.cache.store("key2", "value")
+
+        files_stored = [path.name for path in self.temp_dir_path.glob("*") if not path.name.endswith(("-wal", "-shm"))]
+        self.assertEqual(files_stored, [SQLiteTextCache.DATABASE_FILE_NAME])
+
+    def test_cached_text_exists(self):
+
+        self.assertFalse(self.cache.exists("key"))
+
+        self.cache.store("key", "value")
+        self.assertTrue(self.cache.exists("key"))
+
+        self.assertFalse(self.cache.exists("other key"))
+
+    def test_retrieve_existing_cached_test(self):
+
+        self.cache.store("key", "value")
+        self.assertEqual(self.cache.retrieve("key"), "value")
+
+        self.cache.store("key", "new value")
+        self.assertEqual(self.cache.retrieve("key"), "new value")
+
+    def test_retrieve_non_existing_cached_test(self):
+
+        self.assertEqual(self.cache.retrieve("key"), None)
+
+    def test_retrieve_all_cached_texts(self):
+
+        self.cache.store("key", "value")
+        self.cache.store("key2", "value")
+
+        cache2 = SQLiteTextCache(prefix="test", path_to_cache=self.temp_dir_path)
+        self.assertEqual(cache2.retrieve_all(), {"key": "value", "key2": "value"})
+
+        cache3 = SQLiteTextCache(prefix="other", path_to_cache=self.temp_dir_path)
+        self.assertEqual(cache3.retrieve_all(), {})
+        self.assertFalse(cache3.exists("key"))
+
+        cache2.close()
+        cache3.close()
+
+    def test_store_and_retrieve_many(self):
+
+        self.cache.store_many({f"key{i}": f"value{i}" for i in range(1200)})
+
+        keys = [f"key{i}" for i in range(1200)] + ["missing", "key0"]
+        retrieved = self.cache.retrieve_many(keys)
+
+        self.assertEqual(len(retrieved), 1200)
+        self.assertEqual(retrieved["key0"], "value0")
+        self.assertEqual(retrieved["key1199"], "value1199")
+        self.assertNotIn("missing", retrieved)
+
+    def test_copy_from_file_based_cache(self):
+        file_cache = FileBasedTextCache(prefix="test", path_to_cache=self.temp_dir_path / "files")
+        file_cache.store("key", "value")
+        file_cache.store("key2", "value2")
+
+        copied = copy_cache(file_cache, self.cache)
+
+        self.assertEqual(copied, 2)
+        self.assertEqual(self.cache.retrieve_all(), {"key": "value", "key2": "value2"})
+
+    def test_import_legacy_file_cache(self):
+        FileBasedTextCache(prefix="test", path_to_cache=self.temp_dir_path).store_many({"key": "value", "key2": "value2"})
+        FileBasedTextCache(prefix="test_256d", path_to_cache=self.temp_dir_path).store("key3", "value3")
+
+        self.assertEqual(import_legacy_file_cache(self.cache), 2)
+        self.assertEqual(self.cache.retrieve_all(), {"key": "value", "key2": "value2"})
+
+        # only a cache without entries of its own imports, so later opens do not overwrite newer entries
+        self.cache.store("key", "newer value")
+        self.assertEqual(import_legacy_file_cache(self.cache), 0)
+        self.assertEqual(self.cache.retrieve("key"), "newer value")
+
+    def _age_entry(self, cache: SQLiteTextCache, key: str, seconds: float):
+        cache.connection.execute(
+            "UPDATE cache SET created_at = created_at - ? WHERE prefix = ? AND key = ?", (seconds, cache.prefix, key)
+        )
+
+    def test_size_accounting(self):
+        self.cache.store("key", "value")
+        other = SQLiteTextCache(prefix="other", path_to_cache=self.temp_dir_path)
+        other.store("k", "v")
+
+        self.assertEqual(self.cache.size_bytes(), 8)
+        self.assertEqual(self.cache.size_by_prefix(), {"test": 8, "other": 2})
+        other.close()
+
+    def test_expired_entries_are_not_retrieved(self):
+        cache = SQLiteTextCache(prefix="test", path_to_cache=self.temp_dir_path, policy=CachePolicy(ttl_seconds=60))
+        cache.store_many({"key": "value", "key2": "value2"})
+        self._age_entry(cache, "key", 120)
+
+        self.assertFalse(cache.exists("key"))
+        self.assertIsNone(cache.retrieve("key"))
+        self.assertEqual(cache.retrieve_many(["key", "key2"]), {"key2": "value2"})
+        self.assertEqual(cache.retrieve_all(), {"key2": "value2"})
+
+        report = cache.compact()
+        self.assertEqual(report.removed_entries, 1)
+        self.assertEqual(self.cache.retrieve_all(), {"key2": "value2"})
+        cache.close()
+
+    def test_compaction_to_size_budget_removes_oldest_entries(self):
+        cache = SQLiteTextCache(prefix="test", path_to_cache=self.temp_dir_path, policy=CachePolicy(max_size_bytes=15))
+        cache.store_many({"key1": "value1", "key2": "value2", "key3": "value3"})
+        self._age_entry(cache, "key1", 30)
+        self._age_entry(cache, "key2", 20)
+
+        report = cache.compact()
+
+        self.assertEqual(report.removed_entries, 2)
+        self.assertEqual(report.size_before, 30)
+        self.assertEqual(report.size_after, 10)
+        self.assertEqual(cache.retrieve_all(), {"key3": "value3"})
+        cache.close()
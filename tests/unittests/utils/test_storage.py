@@ -39,4 +39,13 @@ class ArticleStorageTestCase(unittest.TestCase):
                                     'Section Title': ['Main', 'Main'],
                                     'Section Content': ['Test content', 'Test content 2']})
 
-        self.assertTrue(actual_df.equals(expected_df))
\ No newline at end of file
+        self.assertTrue(actual_df.equals(expected_df))
+
+    def test_sections_with_metadata(self):
+        storage = ArticleStorage()
+        storage.save_articles([SingleArticle(title="Test", sections=[ArticleSection(title="Section 1", content="Test content")])])
+
+        texts, metadata = storage.sections_with_metadata()
+
+        self.assertEqual(texts, ['Test content'])
+        self.assertEqual(metadata, [{'Article Title': 'Test', 'Section Title': 'Section 1'}])
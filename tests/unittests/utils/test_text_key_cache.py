@@ -1,9 +1,11 @@
+import os
 import shutil
 import tempfile
 import unittest
 from pathlib import Path
+from unittest import mock
 
-from utils.caching import FileBasedTextCache
+from utils.caching import CachePolicy, FileBasedTextCache
 
 
 class TextKeyCacheTestCase(unittest.TestCase):
@@ -54,3 +56,44 @@ class TextKeyCacheTestCase(unittest.TestCase):
 
         cache3 = FileBasedTextCache(prefix="other", path_to_cache=self.temp_dir_path)
         self.assertEqual(cache3.retrieve_all(), {})
+
+    def test_store_and_retrieve_many(self):
+
+        self.cache.store_many({"key": "value", "key2": "value2"})
+
+        self.assertEqual(len(list(self.temp_dir_path.glob("test_*"))), 2)
+        self.assertEqual(
+            self.cache.retrieve_many(["key", "missing", "key2", "key"]),
+            {"key": "value", "key2": "value2"},
+        )
+
+    def test_compaction_removes_expired_and_unreadable_entries(self):
+        cache = FileBasedTextCache(prefix="test", path_to_cache=self.temp_dir_path, policy=CachePolicy(ttl_seconds=60))
+        cache.store_many({"key": "value", "key2": "value2"})
+        expired_file = cache._get_cache_file_path("key")
+        os.utime(expired_file, (0, 0))
+        (self.temp_dir_path / "test_half_written").write_text('{"key": "ke')
+
+        self.assertIsNone(cache.retrieve("key"))
+
+        report = cache.compact()
+
+        self.assertEqual(report.removed_entries, 2)
+        self.assertEqual(cache.retrieve_all(), {"key2": "value2"})
+        self.assertEqual([file.name for file in self.temp_dir_path.glob("*")], [cache._get_cache_file_path("key2").name])
+        self.assertEqual(report.size_after, cache.size_bytes())
+
+    def test_compaction_skips_files_removed_while_it_runs(self):
+        self.cache.store("key", "value")
+        (self.temp_dir_path / ".test_temp").write_text("value")
+        glob = Path.glob
+
+        def glob_with_removed_files(path, pattern):
+            # entries listed by the directory scan but removed by another process before they are read
+            return [*glob(path, pattern), path / pattern.replace("*", "removed")]
+
+        with mock.patch.object(Path, "glob", glob_with_removed_files):
+            report = self.cache.compact()
+
+        self.assertEqual(report.removed_entries, 0)
+        self.assertEqual(self.cache.retrieve_all(), {"key": "value"})
@@ -0,0 +1,78 @@
+import unittest
+
+import numpy as np
+
+from utils.embedding_models.providers.fake import FakeEmbeddingModel
+from utils.embedding_models.schema import EmbeddingModelInfo
+from utils.vectordb.index_benchmark import clustered_vectors, compare_with_flat
+from utils.vectordb.index_spec import IndexSpec
+from utils.vectordb.vectordb import VectorDB, VectorIndex
+
+MODEL_INFO = EmbeddingModelInfo(model_name="test_model", dimension=8, cost_per_mln_tokens=0.1)
+TEXTS = [f"Test text {i}" for i in range(300)]
+
+
+class IndexSpecTestCase(unittest.TestCase):
+
+    def test_build(self):
+        self.assertEqual(IndexSpec().build(8).ntotal, 0)
+        self.assertFalse(IndexSpec(kind="ivf_flat", nlist=4).build(8).is_trained)
+        self.assertEqual(IndexSpec(kind="hnsw", ef_search=20).build(8).hnsw.efSearch, 20)
+        with self.assertRaises(ValueError):
+            IndexSpec(kind="ivf_pq", pq_m=3).build(8)
+
+    def test_training_sample_size(self):
+        self.assertEqual(IndexSpec(kind="ivf_flat", nlist=4).effective_training_sample_size, 156)
+        self.assertEqual(IndexSpec(kind="ivf_pq", nlist=4, training_sample_size=10).effective_training_sample_size, 256)
+
+    def test_ivf_index_is_trained_on_buffered_vectors(self):
+        index = VectorIndex(FakeEmbeddingModel(MODEL_INFO), IndexSpec(kind="ivf_flat", nlist=4, training_sample_size=100))
+
+        index.insert_texts(TEXTS[:50])
+        self.assertFalse(index.index.is_trained)
+        self.assertEqual(index.size(), 50)
+        self.assertEqual(index.find_text("Test text 7", top_k=1), ["Test text 7"])
+
+        index.insert_texts(TEXTS[50:], batch_size=64)
+        self.assertTrue(index.index.is_trained)
+        self.assertEqual((index.index.ntotal, index.training_buffer), (300, []))
+
+        index.tune(nprobe=4)
+        self.assertEqual((index.index_spec.nprobe, index.index.nprobe), (4, 4))
+        self.assertEqual(index.find_text("Test text 250", top_k=1), ["Test text 250"])
+
+    def test_training_needs_enough_vectors(self):
+        index = VectorIndex(FakeEmbeddingModel(MODEL_INFO), IndexSpec(kind="ivf_flat", nlist=16))
+        index.insert_texts(TEXTS[:10])
+
+        with self.assertRaises(ValueError):
+            index.train()
+
+        index.insert_texts(TEXTS[10:20])
+        index.train()
+        self.assertEqual(index.index.ntotal, 20)
+
+    def test_vector_db_with_hnsw_index(self):
+        vector_db = VectorDB()
+        vector_db.add_index("test_index", FakeEmbeddingModel(MODEL_INFO), IndexSpec(kind="hnsw", hnsw_m=8))
+        vector_db.insert_texts(TEXTS, "test_index")
+
+        self.assertEqual(vector_db.find_text("Test text 42", top_k=1, index_name="test_index"), ["Test text 42"])
+
+        index = vector_db.indices["test_index"]
+        index.tune(ef_search=128)
+        self.assertEqual((index.index_spec.ef_search, index.index.hnsw.efSearch), (128, 128))
+        with self.assertRaises(ValueError):
+            index.tune(ef_search=0)
+
+    def test_recall_against_flat(self):
+        data = clustered_vectors(2100, 16, number_of_clusters=20)
+
+        measurements = compare_with_flat(
+            [IndexSpec(), IndexSpec(kind="ivf_flat", nlist=8, nprobe=8)], data[100:], data[:100], top_k=5
+        )
+
+        self.assertEqual(measurements[0].recall_at_k, 1.0)
+        # scanning every cluster is exact as well
+        self.assertAlmostEqual(measurements[1].recall_at_k, 1.0)
+        self.assertTrue(np.isfinite(measurements[1].ms_per_query))
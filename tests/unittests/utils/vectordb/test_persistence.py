@@ -0,0 +1,114 @@
+import shutil
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+from utils.embedding_models.providers.fake import FakeEmbeddingModel
+from utils.embedding_models.schema import EmbeddingModelInfo
+from utils.vectordb.index_spec import IndexSpec
+from utils.vectordb.text_store import MemoryMappedTexts, write_texts
+from utils.vectordb.vectordb import VectorDB, VectorIndex
+
+MODEL_INFO = EmbeddingModelInfo(model_name="test_model", dimension=8, cost_per_mln_tokens=0.1)
+OTHER_MODEL_INFO = EmbeddingModelInfo(model_name="other_model", dimension=4, cost_per_mln_tokens=0.1)
+TEXTS = [f"Zażółć gęślą jaźń {i}" for i in range(200)]
+
+
+class VectorDBPersistenceTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.path = Path(tempfile.mkdtemp())
+        self.db = VectorDB()
+        self.db.add_index("flat", FakeEmbeddingModel(MODEL_INFO))
+        self.db.add_index("ivf", FakeEmbeddingModel(OTHER_MODEL_INFO), IndexSpec(kind="ivf_flat", nlist=4, nprobe=4))
+        self.db.insert_texts(TEXTS, "flat")
+        self.db.insert_texts(TEXTS[:100], "ivf")
+
+    def tearDown(self):
+        shutil.rmtree(self.path)
+
+    def test_text_store(self):
+        write_texts(self.path, ["Main", "", "gęś"])
+
+        texts = MemoryMappedTexts(self.path)
+
+        self.assertEqual(dict(texts), {0: "Main", 1: "", 2: "gęś"})
+        with self.assertRaises(KeyError):
+            texts[3]
+
+    def test_save_and_load(self):
+        self.db.save(self.path / "db")
+
+        for mmap in [False, True]:
+            loaded = VectorDB.load(self.path / "db", init_model=FakeEmbeddingModel, mmap=mmap)
+
+            self.assertEqual(loaded.list_indices(), ["flat", "ivf"])
+            self.assertEqual(loaded.indices["flat"].size(), 200)
+            self.assertEqual(loaded.indices["ivf"].index_spec.nprobe, 4)
+            for index_name in ["flat", "ivf"]:
+                self.assertEqual(
+                    loaded.find_text(TEXTS[42], top_k=3, index_name=index_name),
+                    self.db.find_text(TEXTS[42], top_k=3, index_name=index_name),
+                )
+
+    def test_tuned_search_parameters_are_saved(self):
+        self.db.add_index("hnsw", FakeEmbeddingModel(MODEL_INFO), IndexSpec(kind="hnsw", hnsw_m=8))
+        self.db.insert_texts(TEXTS, "hnsw")
+        self.db.indices["ivf"].tune(nprobe=2)
+        self.db.indices["hnsw"].tune(ef_search=100)
+        self.db.save(self.path / "db")
+
+        for mmap in [False, True]:
+            loaded = VectorDB.load(self.path / "db", init_model=FakeEmbeddingModel, mmap=mmap)
+
+            ivf, hnsw = loaded.indices["ivf"], loaded.indices["hnsw"]
+            self.assertEqual((ivf.index_spec.nprobe, ivf.index.nprobe), (2, 2))
+            self.assertEqual((hnsw.index_spec.ef_search, hnsw.index.hnsw.efSearch), (100, 100))
+
+    def test_memory_mapping_needs_recent_faiss(self):
+        import faiss  # type: ignore
+
+        self.db.save(self.path / "db")
+
+        with mock.patch.dict(faiss.__dict__):
+            del faiss.IO_FLAG_MMAP_IFC
+            with self.assertRaises(RuntimeError):
+                VectorDB.load(self.path / "db", init_model=FakeEmbeddingModel, mmap=True)
+
+    def test_memory_mapped_db_is_read_only(self):
+        self.db.save(self.path / "db")
+
+        loaded = VectorDB.load(self.path / "db", init_model=FakeEmbeddingModel, mmap=True)
+
+        self.assertIsInstance(loaded.indices["flat"].indexed_texts, MemoryMappedTexts)
+        with self.assertRaises(ValueError):
+            loaded.insert_texts(["Main"], "flat")
+
+    def test_loaded_db_can_grow(self):
+        self.db.save(self.path / "db")
+
+        loaded = VectorDB.load(self.path / "db", init_model=FakeEmbeddingModel)
+        loaded.insert_texts(TEXTS[100:], "ivf")
+
+        self.assertTrue(loaded.indices["ivf"].index.is_trained)
+        self.assertEqual(loaded.find_text(TEXTS[150], top_k=1, index_name="ivf"), [TEXTS[150]])
+
+    def test_model_info_is_validated(self):
+        self.db.indices["flat"].save(self.path / "flat")
+
+        with self.assertRaises(ValueError):
+            VectorIndex.load(self.path / "flat", FakeEmbeddingModel(MODEL_INFO.with_output_dimension(4)))
+
+    def test_save_replaces_previous_db_only(self):
+        self.db.save(self.path / "db")
+        self.db.insert_texts(["Main"], "flat")
+        self.db.save(self.path / "db")
+
+        loaded = VectorDB.load(self.path / "db", init_model=FakeEmbeddingModel)
+        self.assertEqual(loaded.indices["flat"].size(), 201)
+
+        (self.path / "other").mkdir()
+        (self.path / "other" / "notes.txt").write_text("Main")
+        with self.assertRaises(ValueError):
+            self.db.save(self.path / "other")
@@ -0,0 +1,85 @@
+import shutil
+import tempfile
+import unittest
+from pathlib import Path
+
+from utils.embedding_models.providers.fake import FakeEmbeddingModel
+from utils.embedding_models.schema import EmbeddingModelInfo
+from utils.vectordb.index_spec import IndexSpec
+from utils.vectordb.vectordb import VectorDB, VectorIndex
+
+MODEL_INFO = EmbeddingModelInfo(model_name="test_model", dimension=8, cost_per_mln_tokens=0.1)
+TEXTS = [f"Test text {i}" for i in range(400)]
+METADATA = [{"Article Title": f"Article {i % 4}", "Section Title": f"Section {i % 3}"} for i in range(400)]
+
+
+class VectorIndexSearchTestCase(unittest.TestCase):
+
+    def test_results_have_ids_distances_and_metadata(self):
+        index = VectorIndex(FakeEmbeddingModel(MODEL_INFO))
+        index.insert_texts(TEXTS[:2], metadata=METADATA[:2])
+        index.insert_text("Main")
+
+        results = index.search(["Test text 1"], top_k=3)[0]
+
+        self.assertEqual((results[0].id, results[0].text), (1, "Test text 1"))
+        self.assertAlmostEqual(results[0].distance, 0, places=5)
+        self.assertEqual(results[0].metadata, METADATA[1])
+        self.assertEqual([result.distance for result in results], sorted(result.distance for result in results))
+        self.assertEqual([result.metadata for result in results if result.id == 2], [{}])
+
+    def test_metadata_must_match_texts(self):
+        index = VectorIndex(FakeEmbeddingModel(MODEL_INFO))
+
+        with self.assertRaises(ValueError):
+            index.insert_texts(TEXTS[:2], metadata=METADATA[:1])
+
+    def test_filtered_search(self):
+        for index_spec in [
+            IndexSpec(),
+            IndexSpec(kind="ivf_flat", nlist=4, nprobe=4, training_sample_size=200),
+            IndexSpec(kind="hnsw", hnsw_m=8),
+        ]:
+            index = VectorIndex(FakeEmbeddingModel(MODEL_INFO), index_spec)
+            index.insert_texts(TEXTS[:100], metadata=METADATA[:100])
+            # filtered before and after the IVF index is trained on the first 200 vectors
+            for inserted in [100, 400]:
+                index.insert_texts(TEXTS[index.size() : inserted], metadata=METADATA[index.size() : inserted])
+                where = {"Article Title": "Article 1", "Section Title": "Section 2"}
+
+                results = index.search(["Test text 3", "Test text 5"], top_k=5, where=where)
+
+                self.assertEqual([len(query_results) for query_results in results], [5, 5], msg=index_spec.kind)
+                for result in results[0] + results[1]:
+                    self.assertEqual(result.id % 12, 5, msg=index_spec.kind)
+                    self.assertEqual(result.metadata, METADATA[result.id])
+                self.assertEqual(results[1][0].text, "Test text 5")
+
+    def test_filter_without_matches(self):
+        index = VectorIndex(FakeEmbeddingModel(MODEL_INFO))
+        index.insert_texts(TEXTS[:10], metadata=METADATA[:10])
+
+        self.assertEqual(index.search(["Test text 3"], top_k=5, where={"Article Title": "Unknown"}), [[]])
+
+
+class VectorDBSearchTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.path = Path(tempfile.mkdtemp())
+
+    def tearDown(self):
+        shutil.rmtree(self.path)
+
+    def test_metadata_is_saved(self):
+        vector_db = VectorDB()
+        vector_db.add_index("test_index", FakeEmbeddingModel(MODEL_INFO))
+        vector_db.insert_texts(TEXTS, "test_index", metadata=METADATA)
+        vector_db.save(self.path / "db")
+
+        for mmap in [False, True]:
+            loaded = VectorDB.load(self.path / "db", init_model=FakeEmbeddingModel, mmap=mmap)
+
+            results = loaded.search(["Test text 7"], top_k=2, index_name="test_index", where={"Section Title": "Section 1"})
+            self.assertEqual(results[0][0].text, "Test text 7")
+            self.assertEqual(results[0][0].metadata, METADATA[7])
+            self.assertTrue(all(result.metadata["Section Title"] == "Section 1" for result in results[0]))
@@ -9,9 +9,10 @@ class MockedEmbeddingModel:
         self.text_to_embedding = text_to_embedding
         self.dimension = dimension
         self.model_info = EmbeddingModelInfo(model_name="test_model", dimension=dimension, cost_per_mln_tokens=0.1)
+        self.embedded_texts: list[list[str]] = []
 
     def embed(self, texts: list[str]) -> GenericEmbeddingResponse:
-
+        self.embedded_texts.append(texts)
         embeddings = [self.text_to_embedding[text] for text in texts if text in self.text_to_embedding]
         return GenericEmbeddingResponse(embeddings=embeddings, promt_tokens=0, time_to_generate=0)
 
@@ -35,6 +36,40 @@ class VectorDBTestCase(unittest.TestCase):
         self.db.insert_text('Test text 2')
         self.assertEqual(self.db.size(), 2)
         
+    def test_insert_texts_embeds_duplicates_once(self):
+        self.db.insert_texts(['Test text 1', 'Test text 2', 'Test text 1'])
+
+        self.assertEqual(self.db.embedding_model.embedded_texts, [['Test text 1', 'Test text 2']])
+        self.assertEqual(self.db.size(), 3)
+        self.assertEqual(self.db.indexed_texts, {0: 'Test text 1', 1: 'Test text 2', 2: 'Test text 1'})
+
+        self.db.insert_texts([])
+        self.assertEqual(self.db.size(), 3)
+
+    def test_insert_texts_in_batches(self):
+        self.db.insert_texts(['Test text 1', 'Test text 2', 'Test text 3', 'Test text 1', 'Test text 1'], batch_size=2)
+
+        self.assertEqual(
+            self.db.embedding_model.embedded_texts,
+            [['Test text 1', 'Test text 2'], ['Test text 3', 'Test text 1'], ['Test text 1']],
+        )
+        self.assertEqual(self.db.size(), 5)
+        self.assertEqual(self.db.indexed_texts[2], 'Test text 3')
+        self.assertEqual(self.db.find_text('Test text 2', top_k=1), ['Test text 2'])
+
+        with self.assertRaises(ValueError):
+            self.db.insert_texts(['Test text 1'], batch_size=0)
+
+    def test_index_is_sized_for_shortened_embeddings(self):
+        embedding_model = MockedEmbeddingModel(text_to_embedding={'Test text 1': [1.0, 2.0]}, dimension=3)
+        embedding_model.model_info = embedding_model.model_info.with_output_dimension(2)
+
+        db = VectorIndex(embedding_model=embedding_model)
+        db.insert_texts(['Test text 1'])
+
+        self.assertEqual(db.index.d, 2)
+        self.assertEqual(db.find_text('Test text 1', top_k=1), ['Test text 1'])
+
     def test_find_text(self):
         text = 'Test text 1'
         text2 = 'Test text 2'
@@ -45,12 +80,26 @@ class VectorDBTestCase(unittest.TestCase):
         self.assertEqual(self.db.find_text('Test text 3', top_k = 2), [text, text2])
         self.assertEqual(self.db.find_text('Test text 3', top_k = 3), [text, text2])
 
+    def test_find_texts(self):
+        self.db.insert_texts(['Test text 1', 'Test text 2'])
+        self.db.embedding_model.embedded_texts.clear()
+
+        results = self.db.find_texts(['Test text 3', 'Test text 2', 'Test text 3'], top_k=2)
+
+        self.assertEqual(results, [['Test text 1', 'Test text 2'], ['Test text 2', 'Test text 1'], ['Test text 1', 'Test text 2']])
+        self.assertEqual(self.db.embedding_model.embedded_texts, [['Test text 3', 'Test text 2']])
+        self.assertEqual(self.db.find_texts([], top_k=1), [])
+
     def test_initalize_vector_db(self):
 
         vector_db = VectorDB()
         vector_db.add_index('test_index', self.db.embedding_model)
         vector_db.insert_texts(['Test text 1', 'Test text 2'], 'test_index')
         self.assertEqual(vector_db.find_text('Test text 3', top_k = 1, index_name = 'test_index'), ['Test text 1'])
+        self.assertEqual(
+            vector_db.find_texts(['Test text 3', 'Test text 2'], top_k=1, index_name='test_index'),
+            [['Test text 1'], ['Test text 2']],
+        )
 
     def test_initalize_vector_db_with_many_indices(self):
 